@@ -12,10 +12,21 @@ class ArchTextureWorkbench (FreeCADGui.Workbench):
         
 
     def Initialize(self):
-        pass
         # Initialize the module
+        # The commands load their modules on first use. Registering them should only take a few milliseconds
+        import time
+        start = time.time()
+
         import archtexture_toolbars
 
+        duration = (time.time() - start) * 1000
+        FreeCAD.Console.PrintLog('ArchTexture: registered commands in %.1f ms\n' % (duration, ))
+
+        loadedModules = archtexture_toolbars.toolbarManager.loadedCommandModules()
+
+        if duration > archtexture_toolbars.STARTUP_BUDGET or len(loadedModules) > 0:
+            FreeCAD.Console.PrintWarning('ArchTexture: slow workbench start (%.1f ms). Command modules imported on startup: %s\n' % (duration, ', '.join(loadedModules) or 'none'))
+
         for name,commands in archtexture_toolbars.toolbarManager.Toolbars.items():
             self.appendToolbar(name,[command.commandName for command in commands])
 
@@ -0,0 +1,19 @@
+import os
+import hashlib
+import FreeCAD
+
+def cacheRoot(name):
+    '''The directory for cached files of the given kind, e.g. tiles or thumbnails'''
+    if hasattr(FreeCAD, 'getUserCachePath'):
+        base = FreeCAD.getUserCachePath()
+    else:
+        base = FreeCAD.getUserAppDataDir()
+
+    return os.path.join(base, 'ArchTextures', name)
+
+def fileCacheKey(fileName, *parameters):
+    '''A key that changes whenever the file or one of the parameters changes'''
+    stat = os.stat(fileName)
+    key = '|'.join([os.path.abspath(fileName), str(stat.st_size), str(stat.st_mtime)] + [str(p) for p in parameters])
+
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
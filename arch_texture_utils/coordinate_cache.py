@@ -0,0 +1,101 @@
+import hashlib
+import json
+from collections import OrderedDict
+import numpy as np
+from pivy import coin
+
+# Texture coordinates of this many vertices are kept, about 40 MB
+MAXIMUM_POINTS = 5000000
+
+# Overrides farther away from every vertex of an object can't match one of its faces
+OVERRIDE_DISTANCE = 0.02
+
+def readVertices(vertexCoordinates):
+    return np.array([v.getValue() for v in vertexCoordinates.point.getValues()], dtype=np.float64).reshape(-1, 3)
+
+def findCandidateOverrides(vertices, localOverrides):
+    '''
+    Returns the overrides that may match a face of the object. All vertices of a face override are vertices of the face,
+    so an override whose first vertex is not a vertex of the object is skipped. This keeps the cache key stable
+    when overrides of other objects change.
+    '''
+    if localOverrides is None or len(vertices) == 0:
+        return []
+
+    candidates = []
+
+    for faceOverride in localOverrides:
+        if len(faceOverride['vertices']) == 0:
+            continue
+
+        firstVertex = faceOverride['vertices'][0]
+        distances = np.sum((vertices - (firstVertex.x, firstVertex.y, firstVertex.z)) ** 2, axis=1)
+
+        if distances.min() <= OVERRIDE_DISTANCE ** 2:
+            candidates.append(faceOverride)
+
+    return candidates
+
+def createKey(vertices, brep, textureConfig, overrides):
+    '''
+    The key covers everything the texture coordinates depend on: the vertices in the space of the scene graph,
+    the triangles, the mapping settings of the material and the overrides of the object. The placement is not part
+    of it. So moved and copied objects find the coordinates calculated before.
+    '''
+    key = hashlib.md5()
+
+    key.update(vertices.tobytes())
+    key.update(np.array(brep.coordIndex.getValues(), dtype=np.int64).tobytes())
+    key.update(np.array(brep.partIndex.getValues(), dtype=np.int64).tobytes())
+
+    mappingConfig = {
+        'realSize': textureConfig.get('realSize', None),
+        'mapping': textureConfig.get('mapping', None),
+        'overrides': [(faceOverride.get('rotation', None), [(v.x, v.y, v.z) for v in faceOverride['vertices']]) for faceOverride in overrides]
+    }
+
+    key.update(json.dumps(mappingConfig, sort_keys=True).encode('utf-8'))
+
+    return key.hexdigest()
+
+class CoordinateCache():
+    '''
+    Keeps calculated texture coordinates by the geometry they were calculated for. Every textured object gets a copy,
+    so changing the coordinates of one object, e.g. for a face preview, does not affect the others.
+    '''
+
+    def __init__(self, maximumPoints=MAXIMUM_POINTS):
+        self.maximumPoints = maximumPoints
+        self.points = 0
+        self.coordinates = OrderedDict()
+
+    def findTextureCoordinates(self, key):
+        if key not in self.coordinates:
+            return None
+
+        # Move the entry to the end, so the least recently used entries are dropped first
+        points = self.coordinates.pop(key)
+        self.coordinates[key] = points
+
+        textureCoords = coin.SoTextureCoordinate2()
+        textureCoords.point.copyFrom(points)
+
+        return textureCoords
+
+    def store(self, key, textureCoords):
+        if key in self.coordinates:
+            return
+
+        points = coin.SoMFVec2f()
+        points.copyFrom(textureCoords.point)
+
+        self.coordinates[key] = points
+        self.points += points.getNum()
+
+        while self.points > self.maximumPoints and len(self.coordinates) > 1:
+            droppedKey, droppedPoints = self.coordinates.popitem(last=False)
+            self.points -= droppedPoints.getNum()
+
+    def clear(self):
+        self.coordinates.clear()
+        self.points = 0
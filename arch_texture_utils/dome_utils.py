@@ -0,0 +1,74 @@
+import math
+import numpy as np
+from functools import lru_cache
+
+# The dome uses a quarter of the segments as rings from the horizon to the zenith
+MIN_RINGS = 2
+
+class Tessellation():
+    '''Vertices and equirectangular texture coordinates of a unit mesh, laid out for a SoQuadMesh'''
+
+    def __init__(self, vertices, textureCoordinates, rows, columns):
+        self.vertices = vertices
+        self.textureCoordinates = textureCoordinates
+        self.rows = rows
+        self.columns = columns
+
+    def boundingSphere(self):
+        '''Returns the center and the radius of a sphere enclosing all vertices'''
+        vertices = np.array(self.vertices)
+        center = vertices.mean(axis=0)
+        radius = np.linalg.norm(vertices - center, axis=1).max()
+
+        return (center.tolist(), float(radius))
+
+def segmentCount(segments, start, end):
+    '''Returns the number of vertices needed for the part of the full range between start and end'''
+    return max(1, int(math.ceil(segments * (end - start) - 1e-9))) + 1
+
+def azimuthGrid(segments, rings, u0, u1, v0, v1):
+    '''
+    Returns the u and v coordinates for each vertex of the grid. The u coordinate maps to the azimuth.
+    The image starts in the north (positive y axis) and runs clockwise through the east (positive x axis).
+    The seam gets its own column so that the last column can use u = 1.
+    '''
+    u = np.linspace(u0, u1, segmentCount(segments, u0, u1))
+    v = np.linspace(v0, v1, segmentCount(rings, v0, v1))
+
+    return np.meshgrid(u, v)
+
+def localTextureCoordinates(u, v, u0, u1, v0, v1):
+    '''Maps the part of the image between (u0, v0) and (u1, v1) to the full texture'''
+    return np.stack(((u - u0) / (u1 - u0), (v - v0) / (v1 - v0)), axis=-1)
+
+@lru_cache(maxsize=64)
+def buildCylinder(segments, u0=0.0, u1=1.0, v0=0.0, v1=1.0):
+    '''
+    Builds an open cylinder with radius 1 and height 1 standing on the XY plane.
+    With u0, u1, v0 and v1 only the part of the cylinder showing this part of the image is built.
+    '''
+    u, v = azimuthGrid(segments, 1, u0, u1, v0, v1)
+    azimuth = u * 2 * math.pi
+
+    vertices = np.stack((np.sin(azimuth), np.cos(azimuth), v), axis=-1)
+    textureCoordinates = localTextureCoordinates(u, v, u0, u1, v0, v1)
+
+    return Tessellation(vertices.reshape(-1, 3).tolist(), textureCoordinates.reshape(-1, 2).tolist(), u.shape[0], u.shape[1])
+
+@lru_cache(maxsize=64)
+def buildHemisphere(segments, u0=0.0, u1=1.0, v0=0.0, v1=1.0):
+    '''
+    Builds the upper half of a sphere with radius 1 centered at the origin.
+    With u0, u1, v0 and v1 only the part of the hemisphere showing this part of the image is built.
+    '''
+    rings = max(MIN_RINGS, segments // 4)
+    u, v = azimuthGrid(segments, rings, u0, u1, v0, v1)
+    azimuth = u * 2 * math.pi
+    elevation = v * math.pi / 2
+
+    horizontal = np.cos(elevation)
+
+    vertices = np.stack((np.sin(azimuth) * horizontal, np.cos(azimuth) * horizontal, np.sin(elevation)), axis=-1)
+    textureCoordinates = localTextureCoordinates(u, v, u0, u1, v0, v1)
+
+    return Tessellation(vertices.reshape(-1, 3).tolist(), textureCoordinates.reshape(-1, 2).tolist(), u.shape[0], u.shape[1])
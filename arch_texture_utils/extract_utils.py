@@ -0,0 +1,170 @@
+from collections import OrderedDict
+
+import Part
+
+from arch_texture_utils.face_merge_utils import FACE_THICKNESS, extrudeFaces, faceNormal
+from arch_texture_utils.faceset_utils import vectorListEquals
+from arch_texture_utils.selection_utils import FACE_NAME_REGEX
+
+# Extracted objects store the origin of each of their extruded faces, e.g. ['Wall.Face3', 'Wall.Face4'].
+# So faces extracted before are skipped
+SOURCE_FACES_PROPERTY = 'SourceFaces'
+
+# The name of the material the faces had when they were extracted. The Material of the object may be changed later
+SOURCE_MATERIAL_PROPERTY = 'SourceMaterial'
+
+def isExtractedFaces(o):
+    return hasattr(o, SOURCE_FACES_PROPERTY) and hasattr(o, SOURCE_MATERIAL_PROPERTY)
+
+def sourceFaceName(objectName, subElementName):
+    return '%s.%s' % (objectName, subElementName)
+
+def findSourceFace(o, faceIndex):
+    '''
+    Maps a face of an extracted object to the face it was copied from, e.g. the zero based index of Face7 to
+    'Wall.Face3'. Every solid of the object is the copy of one source face, in the order of SourceFaces.
+    Returns None for faces of other objects.
+    '''
+    if not isExtractedFaces(o):
+        return None
+
+    lastFace = 0
+
+    for name, solid in zip(getattr(o, SOURCE_FACES_PROPERTY), o.Shape.Solids):
+        lastFace += len(solid.Faces)
+
+        if faceIndex < lastFace:
+            return name
+
+    return None
+
+def resolveSourceFace(document, name):
+    '''Returns (objectName, faceIndex, vectors) of a source face like 'Wall.Face3', or None when it does not exist anymore'''
+    objectName, subElementName = name.rsplit('.', 1)
+    o = document.getObject(objectName)
+
+    if o is None or not FACE_NAME_REGEX.match(subElementName):
+        return None
+
+    faceIndex = int(subElementName[len('Face'):]) - 1
+
+    if faceIndex >= len(o.Shape.Faces):
+        return None
+
+    return (objectName, faceIndex, [vertex.Point for vertex in o.Shape.Faces[faceIndex].Vertexes])
+
+def findTextureManagers(document):
+    return [o.Proxy.textureManager for o in document.Objects if hasattr(o, 'Proxy') and getattr(o.Proxy, 'isTextureConfig', False)]
+
+def copyFaceOverrides(document, o, faces):
+    '''
+    Copies the face overrides of the source faces onto the front faces of their extruded copies in o, for every
+    TextureConfig of the document. faces is a list of (sourceFaceName, face, globalFace).
+    '''
+    for textureManager in findTextureManagers(document):
+        faceOverrides = textureManager.getFaceOverrides()
+
+        if not faceOverrides:
+            continue
+
+        copiedOverrides = []
+
+        for name, face, globalFace in faces:
+            objectName = name.rsplit('.', 1)[0]
+            vectors = [vertex.Point for vertex in face.Vertexes]
+
+            for faceOverride in faceOverrides:
+                if faceOverride['objectName'] != objectName or not vectorListEquals(faceOverride['vertices'], vectors):
+                    continue
+
+                # The front face is the source face moved along its normal, see extrudeFaces
+                offset = faceNormal(globalFace) * FACE_THICKNESS
+
+                copiedOverride = dict(faceOverride)
+                copiedOverride['objectName'] = o.Name
+                copiedOverride['vertices'] = [vertex.Point + offset for vertex in globalFace.Vertexes]
+                copiedOverrides.append(copiedOverride)
+
+                break
+
+        if len(copiedOverrides) > 0:
+            faceOverrides.extend(copiedOverrides)
+            textureManager.markChanged(faceOverrides=True)
+
+def toGlobalFace(o, face):
+    '''Faces of objects inside of parts are relative to the part. Extracted faces of several objects need the same space.'''
+    face = face.copy()
+    parent = o.getParentGeoFeatureGroup() if hasattr(o, 'getParentGeoFeatureGroup') else None
+
+    if parent is not None:
+        face.transformShape(parent.getGlobalPlacement().toMatrix())
+
+    return face
+
+def groupFacesByMaterial(selectedFaces):
+    '''
+    Groups the selected faces by the material of the object they belong to. selectedFaces is a list of
+    (object, subElementName, face). Returns an OrderedDict {materialName or None: [(sourceFaceName, face, globalFace)]}.
+    '''
+    groups = OrderedDict()
+
+    for o, subElementName, face in selectedFaces:
+        material = getattr(o, 'Material', None)
+        materialName = material.Name if material is not None else None
+
+        groups.setdefault(materialName, []).append((sourceFaceName(o.Name, subElementName), face, toGlobalFace(o, face)))
+
+    return groups
+
+def findExtractedObject(document, materialName):
+    '''
+    Faces are added to the object their material was extracted into before, so there is one object per material.
+    The object is found by the material of the source faces, not by its current Material. Otherwise faces would be
+    added to an object that only got the same material assigned to texture it differently.
+    '''
+    sourceMaterial = materialName if materialName is not None else ''
+
+    for o in document.Objects:
+        if isExtractedFaces(o) and getattr(o, SOURCE_MATERIAL_PROPERTY) == sourceMaterial:
+            return o
+
+    return None
+
+def extractFaces(document, selectedFaces):
+    '''
+    Copies the selected faces into one compound object per material. Faces that were extracted before are skipped.
+    The copies are extruded along their normal, so they are drawn in front of the source faces. The face overrides
+    of the source faces are copied to the front faces of the copies. Returns the created or updated objects. The document is not recomputed.
+    '''
+    extractedObjects = []
+
+    for materialName, faces in groupFacesByMaterial(selectedFaces).items():
+        o = findExtractedObject(document, materialName)
+
+        if o is None:
+            o = document.addObject('Part::Feature', 'ExtractedFaces')
+            o.addProperty('App::PropertyLink', 'Material', 'Base', 'Material for the object')
+            o.addProperty('App::PropertyStringList', SOURCE_FACES_PROPERTY, 'Base', 'The source of every extruded face, in the order of the solids')
+            o.addProperty('App::PropertyString', SOURCE_MATERIAL_PROPERTY, 'Base', 'The material of the source faces')
+            o.Material = document.getObject(materialName) if materialName is not None else None
+            setattr(o, SOURCE_MATERIAL_PROPERTY, materialName if materialName is not None else '')
+
+            existingShapes = []
+            sourceFaces = []
+        else:
+            existingShapes = o.Shape.childShapes()
+            sourceFaces = list(getattr(o, SOURCE_FACES_PROPERTY))
+
+        newFaces = [(name, face, globalFace) for name, face, globalFace in faces if name not in sourceFaces]
+
+        if len(newFaces) == 0:
+            continue
+
+        o.Shape = Part.makeCompound(existingShapes + [extrudeFaces(globalFace) for name, face, globalFace in newFaces])
+        setattr(o, SOURCE_FACES_PROPERTY, sourceFaces + [name for name, face, globalFace in newFaces])
+
+        copyFaceOverrides(document, o, newFaces)
+
+        extractedObjects.append(o)
+
+    return extractedObjects
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+
+import Part
+
+# Normals and distances are rounded to these digits to find coplanar faces
+NORMAL_DIGITS = 4
+DISTANCE_DIGITS = 3
+
+# Copied faces are extruded by this length in mm along their normal, like the FaceBuilder macro does.
+# A copy lying exactly on the original face would fight with it for the same depth and flicker
+FACE_THICKNESS = 1.0
+
+def faceNormal(face):
+    uMin, uMax, vMin, vMax = face.ParameterRange
+
+    return face.normalAt((uMin + uMax) / 2.0, (vMin + vMax) / 2.0)
+
+def extrudeFaces(shape):
+    '''Extrudes every face of the shape along its normal. So the copy is drawn in front of the faces it was copied from.'''
+    solids = [face.extrude(faceNormal(face) * FACE_THICKNESS) for face in shape.Faces]
+
+    if len(solids) == 1:
+        return solids[0]
+
+    return Part.makeCompound(solids)
+
+def findPlane(face):
+    '''
+    Returns (normal, distance) of a planar face, or None for curved faces.
+    The normal respects the orientation of the face, so the front and back side of a thin wall are not merged.
+    '''
+    if not isinstance(face.Surface, Part.Plane):
+        return None
+
+    normal = faceNormal(face)
+    distance = normal.dot(face.Vertexes[0].Point)
+
+    return (normal, distance)
+
+def planeKey(face):
+    plane = findPlane(face)
+
+    if plane is None:
+        return None
+
+    normal, distance = plane
+
+    return (round(normal.x, NORMAL_DIGITS), round(normal.y, NORMAL_DIGITS), round(normal.z, NORMAL_DIGITS), round(distance, DISTANCE_DIGITS))
+
+def groupCoplanarFaces(selectedFaces):
+    '''
+    Groups the faces by owning object and plane. selectedFaces is a list of (objectName, face).
+    Returns an OrderedDict {(objectName, planeKey): [face]}. Curved faces can't be merged, so they get a group of their own.
+    '''
+    groups = OrderedDict()
+
+    for index, (objectName, face) in enumerate(selectedFaces):
+        key = planeKey(face)
+
+        if key is None:
+            key = ('curved', index)
+
+        groups.setdefault((objectName, key), []).append(face)
+
+    return groups
+
+def mergeFaces(faces):
+    '''
+    Merges the faces with a single boolean operation. Fusing the faces one after another gets slower
+    with every face, as each fuse has to process the growing result again.
+    '''
+    if len(faces) == 1:
+        return faces[0].copy()
+
+    fused = faces[0].multiFuse(faces[1:])
+
+    return fused.removeSplitter()
+
+def mergeFaceGroups(groups):
+    '''
+    Merges every group of faces. Returns a list of (groupKey, shape, error). When merging a group fails,
+    shape is a compound of its faces. The groups are merged one after another in the calling thread,
+    as OCC booleans must not run on other threads and the Part bindings keep the GIL anyway.
+    '''
+    results = []
+
+    for key, faces in groups.items():
+        try:
+            results.append((key, mergeFaces(faces), None))
+        except Exception as e:
+            results.append((key, Part.makeCompound(faces), e))
+
+    return results
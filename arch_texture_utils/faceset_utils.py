@@ -2,9 +2,9 @@ import FreeCAD, Part
 import math
 from functools import cmp_to_key
 from pivy import coin
-from itertools import groupby
 
-DEBUG = True
+# Keep the intermediate vertices of every face for printData. Costs a lot of memory on large models
+DEBUG = False
 
 globalX = FreeCAD.Vector(1, 0, 0)
 globalY = FreeCAD.Vector(0, 1, 0)
@@ -13,10 +13,10 @@ globalZ = FreeCAD.Vector(0, 0, 1)
 def toFreeCADVector(vector):
     return FreeCAD.Vector(vector[0], vector[1], vector[2])
 
-def buildTriangle(vertices):
-    v1 = vertices[0]['vector']
-    v2 = vertices[1]['vector']
-    v3 = vertices[2]['vector']
+def buildTriangle(vectors):
+    v1 = vectors[0]
+    v2 = vectors[1]
+    v3 = vectors[2]
 
     e1 = Part.LineSegment(v1, v2)
     e2 = Part.LineSegment(v2, v3)
@@ -84,47 +84,67 @@ def vectorListEquals(vectors1, vectors2):
     
     return True
 
-class Face():
+class FaceDebugData():
+    '''Intermediate results of the face transformation. Only recorded when debugging.'''
+    __slots__ = ('atOriginVertices', 'rotatedVertices', 'positiveAxisVertices', 'positiveTransform', 'overrides')
+
     def __init__(self):
+        self.atOriginVertices = []
+        self.rotatedVertices = []
+        self.positiveAxisVertices = []
+        self.positiveTransform = None
+        self.overrides = None
+
+class Face():
+    '''
+    A face of a brep faceset. indices contains the coin vertex index of every vertex of the face and
+    vectors the matching positions, which are transformed into the texture plane by finishFace.
+    originalVectors is only needed to match face overrides and is released when the face is finished.
+    '''
+    __slots__ = ('indices', 'vectors', 'originalVectors', 'boundingBox', 'length', 'height', 'debugData')
+
+    def __init__(self, debug=False):
         self.indices = []
-        self.vertices = []
-        self.originalVertices = []
-
-        if DEBUG:
-            self.atOriginVertices = []
-            self.rotatedVertices = []
-            self.positiveAxisVertices = []
-            self.positiveTransform = None
-    
+        self.vectors = []
+        self.originalVectors = []
+        self.boundingBox = None
+        self.length = 0
+        self.height = 0
+        self.debugData = FaceDebugData() if debug or DEBUG else None
+
     def addVertex(self, index, vect):
-        if index not in self.indices:
-            self.indices.append(index)
+        '''Adds a vertex without checking for duplicates. Use addTriangles to add the triangles of a face.'''
+        vector = toFreeCADVector(vect.getValue())
 
-            self.originalVertices.append({
-                'index': index,
-                'vector': toFreeCADVector(vect.getValue())
-            })
-            
-            self.vertices.append({
-                'index': index,
-                'vector': toFreeCADVector(vect.getValue())
-            })
+        self.indices.append(index)
+        self.originalVectors.append(vector)
+        self.vectors.append(FreeCAD.Vector(vector))
 
-            self.length = 0
-            self.height = 0
-    
-    def matches(self, vectors):
-        ownVectors = [ownVertex['vector'] for ownVertex in self.originalVertices]
+    def addTriangles(self, triangles, vertices):
+        seen = set()
 
-        return vectorListEquals(ownVectors, vectors)
+        for triangle in triangles:
+            for index in triangle:
+                if index not in seen:
+                    seen.add(index)
+                    self.addVertex(index, vertices[index])
 
-    def appendTextureCoordinates(self, textureCoords, realSize):
+    def matches(self, vectors):
+        return vectorListEquals(self.originalVectors, vectors)
+
+    def textureCoordinates(self, realSize):
+        '''Yields (index, s, t) for every vertex of the face'''
         axisSwapped = self.shouldSwapAxis(realSize)
         scaleFactor = self.calculateScaleFactor(realSize, axisSwapped)
 
-        for vertex in self.vertices:
-            s, t = calculateTextureCoordinate(vertex['vector'], self.boundingBox, scaleFactor, axisSwapped)
-            appendCoordinate(textureCoords, vertex['index'], s, t)
+        for index, vector in zip(self.indices, self.vectors):
+            s, t = calculateTextureCoordinate(vector, self.boundingBox, scaleFactor, axisSwapped)
+
+            yield (index, s, t)
+
+    def appendTextureCoordinates(self, textureCoords, realSize):
+        for index, s, t in self.textureCoordinates(realSize):
+            appendCoordinate(textureCoords, index, s, t)
     
     def calculateScaleFactor(self, realSize, axisSwapped=False):
         tScale = 1
@@ -170,16 +190,19 @@ class Face():
         # We use this information to get the normal and the offset from the origin
         # of the whole face
 
-        if DEBUG:
-            self.overrides = overrides
+        if self.debugData is not None:
+            self.debugData.overrides = overrides
+        else:
+            # The original positions were only needed to find the overrides
+            self.originalVectors = None
 
         # Calculations based on http://www.meshola.com/Articles/converting-between-coordinate-systems
         textureRotation, = extractOverrides(overrides)
 
-        offsetVector = self.vertices[0]['vector']
+        offsetVector = self.vectors[0]
         self.moveToOrigin(offsetVector)
 
-        originTriangle = buildTriangle(self.vertices)
+        originTriangle = buildTriangle(self.vectors)
         matrix = self.calculateRotationMatrix(originTriangle)
 
         self.rotate(matrix)
@@ -192,46 +215,22 @@ class Face():
         if textureRotation is not None:
             self.rotateAroundYAxis(textureRotation)
 
-    def normalizeTransform(self, transform):
-        '''
-        Lets say we have a object with a Vertex at (0,0,0) and a Placement of x=0,y=0,z=1000.
-        Now when we select a face and check the vertices we get a point at (0,0,1000) because there is a placement applied.
-        But in the Coin3D scene graph the vertex is still at (0,0,0) because FreeCAD applies a transform node with the translation of (0,0,1000). So the vertices are rendered at the right place, but we can't map selected faces to scene graph faces for face overrides anymore.
-        To account for that we add the transform node to each vertex so we have the same values as FreeCAD.
-        '''
-        if transform is None:
-            return
-        
-        translation = transform.translation.getValue().getValue()
-        translationVector = FreeCAD.Vector(translation[0], translation[1], translation[2])
-
-        for vertex in self.originalVertices:
-            if DEBUG:
-                self.positiveAxisVertices.append({
-                    'index': vertex['index'],
-                    'vector': vertex['vector']
-                })
-
-            v = vertex['vector']
-            vertex['vector'] = v.add(translationVector)
+    def recordVertices(self, vertexList, vectors):
+        if self.debugData is not None:
+            vertexList.extend(zip(self.indices, vectors))
 
     def rotateAroundYAxis(self, angle):
         rotation = FreeCAD.Rotation(globalY, angle)
 
-        for vertex in self.vertices:
-            if DEBUG:
-                self.positiveAxisVertices.append({
-                    'index': vertex['index'],
-                    'vector': vertex['vector']
-                })
+        if self.debugData is not None:
+            self.recordVertices(self.debugData.positiveAxisVertices, self.vectors)
 
-            v = vertex['vector']
-            vertex['vector'] = rotation.multVec(v)
+        self.vectors = [rotation.multVec(v) for v in self.vectors]
 
     def calculateBoundBox(self):
-        xValues = [vertex['vector'][0] for vertex in self.vertices]
-        yValues = [vertex['vector'][1] for vertex in self.vertices]
-        zValues = [vertex['vector'][2] for vertex in self.vertices]
+        xValues = [vector[0] for vector in self.vectors]
+        yValues = [vector[1] for vector in self.vectors]
+        zValues = [vector[2] for vector in self.vectors]
 
         xMin = min(xValues)
         yMin = min(yValues)
@@ -262,18 +261,11 @@ class Face():
             # No transformations needed
             return
 
-        if DEBUG:
-            self.positiveTransform = (xMin, zMin, transformVector)
-
-        for vertex in self.vertices:
-            if DEBUG:
-                self.rotatedVertices.append({
-                    'index': vertex['index'],
-                    'vector': vertex['vector']
-                })
+        if self.debugData is not None:
+            self.debugData.positiveTransform = (xMin, zMin, transformVector)
+            self.recordVertices(self.debugData.rotatedVertices, self.vectors)
 
-            v = vertex['vector']
-            vertex['vector'] = v.add(transformVector)
+        self.vectors = [v.add(transformVector) for v in self.vectors]
 
     def calculateRotationMatrix(self, triangle):
          # The face normal should point toward the front view
@@ -297,25 +289,18 @@ class Face():
 
     def moveToOrigin(self, offsetVector):
         '''To move the face to the origin we simply subtract the first vertex from every vertex.'''
-        for vertex in self.vertices:
-            v = vertex['vector']
-            vertex['vector'] = v.sub(offsetVector)
+        self.vectors = [v.sub(offsetVector) for v in self.vectors]
     
     def rotate(self, matrix):
-        for vertex in self.vertices:
-            if DEBUG:
-                self.atOriginVertices.append({
-                    'index': vertex['index'],
-                    'vector': vertex['vector']
-                })
-
-            v = vertex['vector']
-            vertex['vector'] = matrix.multiply(v)
+        if self.debugData is not None:
+            self.recordVertices(self.debugData.atOriginVertices, self.vectors)
+
+        self.vectors = [matrix.multiply(v) for v in self.vectors]
     
     def findLocalXAxis(self):
-        origin = self.vertices[0]['vector']
-        v1 = self.vertices[1]['vector']
-        v2 = self.vertices[2]['vector']
+        origin = self.vectors[0]
+        v1 = self.vectors[1]
+        v2 = self.vectors[2]
 
         distanceToV1 = origin.distanceToPoint(v1)
         distanceToV2 = origin.distanceToPoint(v2)
@@ -326,43 +311,42 @@ class Face():
         return v2
 
     def printData(self, realSize=None):
-        if DEBUG:
-            print('   atOriginVertices:')
-            for vertex in self.atOriginVertices:
-                print('    %s' % (vertex, ))
-
-            print('   rotatedVertices:')
-            for vertex in self.rotatedVertices:
-                print('    %s' % (vertex, ))
-            
-            print('   positiveAxisVertices:')
-            for vertex in self.positiveAxisVertices:
-                print('    %s' % (vertex, ))
+        debugData = self.debugData
 
-            print('   vertices:')
-            for vertex in self.vertices:
-                print('    %s' % (vertex, ))
-            
-            print('    positiveTransform: %s' % (self.positiveTransform, ))
-            print('    swapAxis: %s' % (self.shouldSwapAxis(realSize), ))
-            print('    overrides: %s' % (self.overrides, ))
+        if debugData is None:
+            print('   Face was built without debug data')
+            return
 
-        textureCoords = coin.SoTextureCoordinate2()
-        self.appendTextureCoordinates(textureCoords, realSize)
+        print('   atOriginVertices:')
+        for vertex in debugData.atOriginVertices:
+            print('    %s' % (vertex, ))
 
-        normalizedCoords = coin.SoTextureCoordinate2()
-        self.appendTextureCoordinates(normalizedCoords, None)
+        print('   rotatedVertices:')
+        for vertex in debugData.rotatedVertices:
+            print('    %s' % (vertex, ))
+        
+        print('   positiveAxisVertices:')
+        for vertex in debugData.positiveAxisVertices:
+            print('    %s' % (vertex, ))
 
-        print('   originalVertices:')
-        for vertex in self.originalVertices:
-            normalizedIndexCoords = normalizedCoords.point.getValues()[vertex['index']].getValue()
-            indexCoords = textureCoords.point.getValues()[vertex['index']].getValue()
+        print('   vertices:')
+        for vertex in zip(self.indices, self.vectors):
+            print('    %s' % (vertex, ))
+        
+        print('    positiveTransform: %s' % (debugData.positiveTransform, ))
+        print('    swapAxis: %s' % (self.shouldSwapAxis(realSize), ))
+        print('    overrides: %s' % (debugData.overrides, ))
+
+        coords = dict((index, (s, t)) for index, s, t in self.textureCoordinates(realSize))
+        normalizedCoords = dict((index, (s, t)) for index, s, t in self.textureCoordinates(None))
 
+        print('   originalVertices:')
+        for index, vector in zip(self.indices, self.originalVectors):
             print('    %s' % ({
-                'index': vertex['index'],
-                'vector': vertex['vector'],
-                'normalizedCoords': normalizedIndexCoords,
-                'coords': indexCoords
+                'index': index,
+                'vector': vector,
+                'normalizedCoords': normalizedCoords[index],
+                'coords': coords[index]
             }, ))
  
         print('    length: %s, height: %s' % (self.length, self.height))
@@ -370,34 +354,42 @@ class Face():
         print('    textureRotation: %s' % (self.calculateScaleFactor(realSize), ))
 
 class FaceSet():
-    def __init__(self):
+    '''
+    Calculates the texture coordinates of a brep faceset chart by chart. Charts are built lazily and dropped
+    as soon as their coordinates are written, so memory does not grow with the number of faces.
+    Only when debugging the faces are kept for printData.
+    '''
+
+    def __init__(self, brep, vertexCoordinates, faceOverrides=None, transform=None, debug=False):
+        self.brep = brep
+        self.vertexCoordinates = vertexCoordinates
+        self.faceOverrides = faceOverrides
+        self.transform = transform
+        self.debug = debug or DEBUG
         self.faces = []
-    
-    def addFace(self, faceCoordinates, vertices, faceOverrides=None, transform=None):
-        face = Face()
-
-        for coordinate in faceCoordinates:
-            for index in coordinate:
-                face.addVertex(index, vertices[index])
-        
 
-        face.normalizeTransform(transform)
-        face.finishFace(findOverridesForFace(face, faceOverrides))
+    def iterFaces(self):
+        for face in iterFaces(self.brep, self.vertexCoordinates, self.faceOverrides, self.transform, self.debug):
+            if self.debug:
+                self.faces.append(face)
 
-        self.faces.append(face)
+            yield face
     
     def calculateTextureCoordinates(self, realSize):
         textureCoords = coin.SoTextureCoordinate2()
+        # Allocate all coordinates at once instead of growing the field vertex by vertex
+        textureCoords.point.setNum(self.vertexCoordinates.point.getNum())
 
-        for face in self.faces:
+        for face in self.iterFaces():
             face.appendTextureCoordinates(textureCoords, realSize)
 
         return textureCoords
     
     def printData(self, realSize=None, faceNumber=None):
         if faceNumber is not None:
-            print('Face:')
-            self.faces[faceNumber].printData(realSize)
+            if faceNumber < len(self.faces):
+                print('Face:')
+                self.faces[faceNumber].printData(realSize)
         else:
             for face in self.faces:
                 print('Face:')
@@ -452,20 +444,79 @@ def findMaterial(node):
     
     return None
 
-def buildFaceCoordinates(brep):
+def findFaceRanges(brep):
+    '''
+    Returns the range (start, end) of every face in coordIndex. partIndex contains the number of triangles of each face.
+    FreeCAD writes every triangle as three indices followed by -1. In that case the ranges follow directly
+    from partIndex, otherwise coordIndex is scanned.
+    '''
+    partIndex = brep.partIndex.getValues()
+    coordIndex = brep.coordIndex.getValues()
+    coordCount = len(coordIndex)
+    faceRanges = []
+    position = 0
+
+    if 4 * sum(partIndex) == coordCount:
+        for triangleCount in partIndex:
+            faceRanges.append((position, position + triangleCount * 4))
+            position += triangleCount * 4
+
+        return faceRanges
+
+    for triangleCount in partIndex:
+        start = position
+        triangles = 0
+
+        while triangles < triangleCount and position < coordCount:
+            try:
+                end = coordIndex.index(-1, position)
+            except ValueError:
+                end = coordCount
+
+            if end > position:
+                triangles += 1
+
+            position = end + 1
+
+        faceRanges.append((start, min(position, coordCount)))
+
+    return faceRanges
+
+def readTriangles(coordIndex, faceRange):
+    '''The triangles of a face, see findFaceRanges'''
+    start, end = faceRange
     triangles = []
-    faces = []
+    position = start
+
+    while position < end:
+        try:
+            stop = coordIndex.index(-1, position, end)
+        except ValueError:
+            stop = end
+
+        if stop > position:
+            triangles.append(tuple(coordIndex[position:stop]))
+
+        position = stop + 1
 
-    groups = groupby(brep.coordIndex, lambda coord: coord == -1)
-    triangles = [tuple(group) for k, group in groups if not k]
+    return triangles
 
-    nextTriangle = 0
+def iterFaceCoordinates(brep):
+    '''Yields the triangles of one face after the other'''
+    coordIndex = brep.coordIndex.getValues()
 
-    for triangleCount in brep.partIndex:
-        faces.append(triangles[nextTriangle:nextTriangle + triangleCount])
-        nextTriangle += triangleCount
+    for faceRange in findFaceRanges(brep):
+        yield readTriangles(coordIndex, faceRange)
 
-    return faces
+def buildFaceCoordinates(brep):
+    return list(iterFaceCoordinates(brep))
+
+def findFaceTriangles(brep, faceIndices):
+    '''Returns a dict mapping the given zero based face indices to their triangles. Face1 of the shape has the index 0.'''
+    coordIndex = brep.coordIndex.getValues()
+    faceRanges = findFaceRanges(brep)
+
+    return dict((faceIndex, readTriangles(coordIndex, faceRanges[faceIndex])) for faceIndex in faceIndices if faceIndex < len(faceRanges))
 
 def findOverridesForFace(face, faceOverrides=None):
     if faceOverrides is None:
@@ -477,16 +528,224 @@ def findOverridesForFace(face, faceOverrides=None):
     
     return None
 
-def buildFaceSet(brep, vertexCoordinates, faceOverrides=None, transform=None):
-    faceSet = FaceSet()
-    
-    faceCoordinateList = buildFaceCoordinates(brep)
+# Faces are connected when they share a vertex position within this distance in mm
+CHART_VERTEX_TOLERANCE = 0.01
+# Connected faces are coplanar when their normals and their distances to the origin differ less than this
+CHART_NORMAL_TOLERANCE = 1e-4
+CHART_PLANE_TOLERANCE = 0.01
+
+class UnionFind():
+    def __init__(self, items):
+        self.parents = dict((item, item) for item in items)
+
+    def find(self, item):
+        root = item
+
+        while self.parents[root] != root:
+            root = self.parents[root]
+
+        # Path compression. The next lookups of these items take a single step
+        while self.parents[item] != root:
+            self.parents[item], item = root, self.parents[item]
+
+        return root
+
+    def union(self, item1, item2):
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+
+        if root1 != root2:
+            self.parents[max(root1, root2)] = min(root1, root2)
+
+    def groups(self):
+        groups = {}
+
+        for item in self.parents.keys():
+            groups.setdefault(self.find(item), []).append(item)
+
+        return [sorted(group) for root, group in sorted(groups.items())]
+
+def toLocalOverrides(faceOverrides, transform):
+    '''
+    Lets say we have a object with a Vertex at (0,0,0) and a Placement of x=0,y=0,z=1000.
+    Now when we select a face and check the vertices we get a point at (0,0,1000) because there is a placement applied.
+    But in the Coin3D scene graph the vertex is still at (0,0,0) because FreeCAD applies a transform node with the translation of (0,0,1000).
+    To match selected faces to scene graph faces, the override vertices are moved into the space of the scene graph.
+    So the faces and their texture coordinates stay independent of the placement, and only the few override vertices are transformed.
+    '''
+    if transform is None or faceOverrides is None or len(faceOverrides) == 0:
+        return faceOverrides
+
+    translation = toFreeCADVector(transform.translation.getValue().getValue())
+    rotation = FreeCAD.Rotation(*transform.rotation.getValue().getValue())
+    inverse = FreeCAD.Placement(translation, rotation).inverse()
+
+    localOverrides = []
+
+    for faceOverride in faceOverrides:
+        localOverride = dict(faceOverride)
+        localOverride['vertices'] = [inverse.multVec(vertex) for vertex in faceOverride['vertices']]
+
+        localOverrides.append(localOverride)
+
+    return localOverrides
+
+def findTrianglePlane(triangle, positions):
+    p1, p2, p3 = [positions[index] for index in triangle]
+    normal = (p2 - p1).cross(p3 - p1)
+
+    if normal.Length < 1e-9:
+        return None
+
+    normal.normalize()
+
+    return (normal, normal.dot(p1))
+
+def findFacePlane(triangles, positions):
+    '''Returns the unit normal and the distance to the origin of a planar face, or None for curved faces'''
+    facePlane = None
+
+    for triangle in triangles:
+        plane = findTrianglePlane(triangle, positions)
+
+        if plane is None:
+            continue
+
+        if facePlane is None:
+            facePlane = plane
+        elif not isCoplanar(facePlane, plane):
+            return None
+
+    return facePlane
+
+def isCoplanar(plane1, plane2):
+    normal1, distance1 = plane1
+    normal2, distance2 = plane2
+
+    return normal1.dot(normal2) > 1 - CHART_NORMAL_TOLERANCE and abs(distance1 - distance2) < CHART_PLANE_TOLERANCE
+
+def buildCharts(facesTriangles, vertexValues, faceOverrides=None):
+    '''
+    Groups connected coplanar faces into charts. A wall split into several faces by openings then gets one frame and
+    one bounding box for all of them, so the texture runs across the faces without seams.
+    FreeCAD does not share vertices between faces, so faces are connected by the positions of their vertices.
+    Faces with an override keep a chart of their own, so their override still applies.
+    facesTriangles is an iterable of (faceIndex, triangles). Only the planes and vertex positions of the faces are kept,
+    not their triangles. Returns lists of face indices.
+    '''
+    faceIndices = []
+    facesByPosition = {}
+    planes = {}
+
+    for faceIndex, triangles in facesTriangles:
+        faceIndices.append(faceIndex)
+
+        indices = set(index for triangle in triangles for index in triangle)
+        positions = dict((index, toFreeCADVector(vertexValues[index].getValue())) for index in indices)
+
+        if faceOverrides is not None and len(faceOverrides) > 0:
+            vectors = list(positions.values())
+
+            if any(vectorListEquals(vectors, faceOverride['vertices']) for faceOverride in faceOverrides):
+                continue
+
+        plane = findFacePlane(triangles, positions)
+
+        if plane is None:
+            continue
+
+        planes[faceIndex] = plane
+
+        for position in positions.values():
+            key = tuple(int(round(value / CHART_VERTEX_TOLERANCE)) for value in position)
+            facesByPosition.setdefault(key, []).append(faceIndex)
+
+    unionFind = UnionFind(faceIndices)
+
+    for connectedFaces in facesByPosition.values():
+        for i, faceIndex1 in enumerate(connectedFaces):
+            for faceIndex2 in connectedFaces[i + 1:]:
+                if faceIndex1 != faceIndex2 and isCoplanar(planes[faceIndex1], planes[faceIndex2]):
+                    unionFind.union(faceIndex1, faceIndex2)
+
+    return unionFind.groups()
+
+def iterCharts(charts, readFaceTriangles, vertexValues, faceOverrides=None, debug=False):
+    '''
+    Yields one finished face per chart. The triangles are read per chart with readFaceTriangles(faceIndex), so only
+    the triangles of the current chart are in memory.
+    '''
+    for chart in charts:
+        triangles = [triangle for faceIndex in chart for triangle in readFaceTriangles(faceIndex)]
+
+        yield buildFace(triangles, vertexValues, faceOverrides, debug)
+
+def createTriangleReader(brep):
+    '''Returns readFaceTriangles(faceIndex) for iterCharts'''
+    coordIndex = brep.coordIndex.getValues()
+    faceRanges = findFaceRanges(brep)
+
+    return (lambda faceIndex: readTriangles(coordIndex, faceRanges[faceIndex]), len(faceRanges))
+
+def buildFace(triangles, vertexValues, faceOverrides=None, debug=False):
+    '''faceOverrides have to be in the space of the scene graph, see toLocalOverrides'''
+    face = Face(debug)
+    face.addTriangles(triangles, vertexValues)
+
+    face.finishFace(findOverridesForFace(face, faceOverrides))
+
+    return face
+
+def iterFaces(brep, vertexCoordinates, faceOverrides=None, transform=None, debug=False):
+    '''Yields the finished charts of the brep faceset one by one. Connected coplanar faces form one chart.'''
+    vertexValues = vertexCoordinates.point.getValues()
+    localOverrides = toLocalOverrides(faceOverrides, transform)
+    readFaceTriangles, faceCount = createTriangleReader(brep)
+
+    # The chart index is built face by face. The triangles are read again for each chart when it is yielded
+    charts = buildCharts(((faceIndex, readFaceTriangles(faceIndex)) for faceIndex in range(faceCount)), vertexValues, localOverrides)
+
+    return iterCharts(charts, readFaceTriangles, vertexValues, localOverrides, debug)
+
+def buildBaseCharts(brep, vertexCoordinates):
+    '''
+    The charts of all faces without overrides, as dict {faceIndex: chart}. Overrides only split charts,
+    so the charts of single faces can be updated from their base chart, see iterFacesByIndex.
+    '''
+    vertexValues = vertexCoordinates.point.getValues()
+    readFaceTriangles, faceCount = createTriangleReader(brep)
+    baseCharts = {}
+
+    for chart in buildCharts(((faceIndex, readFaceTriangles(faceIndex)) for faceIndex in range(faceCount)), vertexValues):
+        chart = tuple(chart)
+
+        for faceIndex in chart:
+            baseCharts[faceIndex] = chart
+
+    return baseCharts
+
+def iterFacesByIndex(brep, vertexCoordinates, faceIndices, faceOverrides=None, transform=None, baseCharts=None):
+    '''
+    Yields the charts containing the faces with the given zero based indices. Without baseCharts, the charts are built
+    from the given faces only. With the baseCharts of the object, see buildBaseCharts, the base charts containing
+    one of the faces are split by the overrides again and all of their charts are yielded. So a face taken out of
+    a chart by an override also updates the rest of the chart, and the result matches texturing the whole object.
+    '''
     vertexValues = vertexCoordinates.point.getValues()
+    localOverrides = toLocalOverrides(faceOverrides, transform)
+    readFaceTriangles, faceCount = createTriangleReader(brep)
+
+    chartFaceIndices = set(faceIndex for faceIndex in faceIndices if faceIndex < faceCount)
+
+    if baseCharts is not None:
+        chartFaceIndices = set(chartFace for faceIndex in chartFaceIndices for chartFace in baseCharts.get(faceIndex, (faceIndex, )))
+
+    charts = buildCharts(((faceIndex, readFaceTriangles(faceIndex)) for faceIndex in sorted(chartFaceIndices)), vertexValues, localOverrides)
 
-    for faceCoordinates in faceCoordinateList:
-        faceSet.addFace(faceCoordinates, vertexValues, faceOverrides, transform)
+    return iterCharts(charts, readFaceTriangles, vertexValues, localOverrides)
 
-    return faceSet
+def buildFaceSet(brep, vertexCoordinates, faceOverrides=None, transform=None, debug=False):
+    return FaceSet(brep, vertexCoordinates, faceOverrides, transform, debug)
 
 def findTransform(node):
     children = node.getChildren()
@@ -538,6 +797,7 @@ if __name__ == "__main__":
     vertexCoordinates = findVertexCoordinates(rootNode)
     transform = findTransform(rootNode)
 
-    faceSet = buildFaceSet(brep, vertexCoordinates, testOverrides, transform)
+    faceSet = buildFaceSet(brep, vertexCoordinates, testOverrides, transform, debug=True)
+    faceSet.calculateTextureCoordinates({'s': 1680, 't': 1440})
     faceSet.printData({'s': 1680, 't': 1440})
     # printValues(textureCoords.point.getValues())
\ No newline at end of file
@@ -0,0 +1,84 @@
+import os
+from arch_texture_utils.qtutils import QtCore
+from arch_texture_utils.texture_files import getContentHashCache, normalizePath
+import arch_texture_utils.thumbnail_utils as thumbnail_utils
+
+# Image editors write a file in several steps. Changes within this window are reported together
+RELOAD_DELAY = 500
+
+def reloadTextureNode(node):
+    '''Coin reads the image again when the filename is set. Setting the same name again is not enough.'''
+    fileName = node.filename.getValue()
+
+    node.filename.setValue('')
+    node.filename.setValue(fileName)
+
+class TextureFileWatcher():
+    '''
+    Watches texture files and calls onFilesChanged(fileNames) once a burst of writes has ended.
+    The hashes and thumbnails of changed files are dropped before, so they are calculated again.
+    '''
+
+    def __init__(self, onFilesChanged):
+        self.onFilesChanged = onFilesChanged
+        self.files = set()
+        self.pendingFiles = set()
+
+        self.watcher = QtCore.QFileSystemWatcher()
+        self.watcher.fileChanged.connect(self.fileChanged)
+
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(RELOAD_DELAY)
+        self.timer.timeout.connect(self.reportChanges)
+
+    def watch(self, fileNames):
+        '''Watches exactly the given files. Files that don't exist are skipped.'''
+        fileNames = set(normalizePath(f) for f in fileNames if f and os.path.isfile(f))
+
+        removedFiles = self.files - fileNames
+        addedFiles = fileNames - self.files
+
+        if len(removedFiles) > 0:
+            self.watcher.removePaths(list(removedFiles))
+
+        if len(addedFiles) > 0:
+            self.watcher.addPaths(list(addedFiles))
+
+        self.files = fileNames
+
+    def stop(self):
+        self.timer.stop()
+        self.pendingFiles.clear()
+
+        if len(self.files) > 0:
+            self.watcher.removePaths(list(self.files))
+
+        self.files = set()
+
+    def fileChanged(self, fileName):
+        self.pendingFiles.add(fileName)
+
+        # restart the timer so a burst of writes is handled at once
+        self.timer.start()
+
+    def reportChanges(self):
+        changedFiles = sorted(self.pendingFiles)
+        self.pendingFiles.clear()
+
+        watchedFiles = set(self.watcher.files())
+
+        for fileName in changedFiles:
+            getContentHashCache().forget(fileName)
+
+            if thumbnail_utils.thumbnailStore is not None:
+                thumbnail_utils.thumbnailStore.forget(fileName)
+
+            # Editors that replace the file instead of writing it remove it from the watcher
+            if fileName in self.files and fileName not in watchedFiles and os.path.isfile(fileName):
+                self.watcher.addPath(fileName)
+
+        changedFiles = [fileName for fileName in changedFiles if os.path.isfile(fileName)]
+
+        if len(changedFiles) > 0:
+            self.onFilesChanged(changedFiles)
@@ -0,0 +1,272 @@
+import time
+import FreeCADGui
+from pivy import coin
+from arch_texture_utils.qtutils import QtCore
+
+# The view is checked when the camera stopped moving for this amount of milliseconds
+VIEW_UPDATE_INTERVAL = 100
+# Off screen objects are textured one by one with this interval while the camera is idle
+LOW_PRIORITY_INTERVAL = 50
+
+DEFAULT_MINIMUM_SCREEN_SIZE = 16
+DEFAULT_RELEASE_DELAY = 60
+
+class LazyTexturingSettings():
+    def __init__(self, minimumScreenSize=DEFAULT_MINIMUM_SCREEN_SIZE, releaseOffscreen=False, releaseDelay=DEFAULT_RELEASE_DELAY):
+        self.minimumScreenSize = minimumScreenSize
+        self.releaseOffscreen = releaseOffscreen
+        self.releaseDelay = releaseDelay
+
+def toSbBox(boundBox):
+    return coin.SbBox3f(boundBox.XMin, boundBox.YMin, boundBox.ZMin, boundBox.XMax, boundBox.YMax, boundBox.ZMax)
+
+def findGlobalBoundBox(o, shape):
+    '''The bounding box in world coordinates. Shapes of objects inside of parts are relative to the part.'''
+    boundBox = shape.BoundBox
+
+    if hasattr(o, 'getParentGeoFeatureGroup'):
+        parent = o.getParentGeoFeatureGroup()
+
+        if parent is not None:
+            boundBox = boundBox.transformed(parent.getGlobalPlacement().toMatrix())
+
+    return toSbBox(boundBox)
+
+def projectedSize(viewVolume, box, width, height):
+    '''The size of the box on screen in pixels. Boxes reaching behind the camera count as infinitely large.'''
+    boxMin = box.getMin().getValue()
+    boxMax = box.getMax().getValue()
+
+    xValues = []
+    yValues = []
+
+    for x in (boxMin[0], boxMax[0]):
+        for y in (boxMin[1], boxMax[1]):
+            for z in (boxMin[2], boxMax[2]):
+                point = coin.SbVec3f(x, y, z)
+
+                if viewVolume.getPlane(0.0).isInHalfSpace(point):
+                    return float('inf')
+
+                screenPoint = coin.SbVec3f()
+                viewVolume.projectToScreen(point, screenPoint)
+                screenX, screenY, screenZ = screenPoint.getValue()
+
+                xValues.append(screenX)
+                yValues.append(screenY)
+
+    return max((max(xValues) - min(xValues)) * width, (max(yValues) - min(yValues)) * height)
+
+class LazyTexturer():
+    '''
+    Textures objects when they first become visible instead of texturing the whole document up front.
+    Objects whose bounding box intersects the view volume and covers at least minimumScreenSize pixels are textured
+    right away, the largest first. All other objects are queued and textured one by one while the camera is idle.
+    When releaseOffscreen is set, objects that stayed out of view for releaseDelay seconds lose their textures
+    again and are not textured in the background.
+    '''
+
+    def __init__(self, textureManager, settings):
+        self.textureManager = textureManager
+        self.settings = settings
+
+        self.pendingObjects = set()
+        self.paused = False
+        self.boundingBoxes = {
+            # '<object_name>': SbBox3f
+        }
+        self.offscreenSince = {
+            # '<object_name>': <time the textured object left the view>
+        }
+
+        self.camera = None
+        self.cameraSensor = coin.SoNodeSensor(self.cameraChanged, None)
+
+        self.viewTimer = QtCore.QTimer()
+        self.viewTimer.setSingleShot(True)
+        self.viewTimer.setInterval(VIEW_UPDATE_INTERVAL)
+        self.viewTimer.timeout.connect(self.updateView)
+
+        self.lowPriorityTimer = QtCore.QTimer()
+        self.lowPriorityTimer.setInterval(LOW_PRIORITY_INTERVAL)
+        self.lowPriorityTimer.timeout.connect(self.textureNextObject)
+
+        self.releaseTimer = QtCore.QTimer()
+        self.releaseTimer.setInterval(max(1, settings.releaseDelay) * 500)
+        self.releaseTimer.timeout.connect(self.updateView)
+
+    def start(self, objectNames):
+        self.pendingObjects.update(objectNames)
+
+        if self.settings.releaseOffscreen:
+            self.releaseTimer.start()
+
+        self.updateView()
+
+    def stop(self):
+        self.viewTimer.stop()
+        self.lowPriorityTimer.stop()
+        self.releaseTimer.stop()
+
+        if self.camera is not None:
+            self.cameraSensor.detach()
+            self.camera = None
+
+        self.pendingObjects.clear()
+        self.offscreenSince.clear()
+
+    def pause(self):
+        '''Stops texturing until resume is called, e.g. while the textures are hidden'''
+        self.paused = True
+
+        self.viewTimer.stop()
+        self.lowPriorityTimer.stop()
+        self.releaseTimer.stop()
+
+    def resume(self):
+        self.paused = False
+
+        if self.settings.releaseOffscreen:
+            self.releaseTimer.start()
+
+        self.updateView()
+
+    def queueObject(self, objectName):
+        self.pendingObjects.add(objectName)
+        self.viewTimer.start()
+
+    def invalidate(self, objectName):
+        '''The geometry of the object changed, so its bounding box has to be calculated again'''
+        self.boundingBoxes.pop(objectName, None)
+
+    def forgetObject(self, objectName):
+        self.invalidate(objectName)
+        self.pendingObjects.discard(objectName)
+        self.offscreenSince.pop(objectName, None)
+
+    def findView(self):
+        document = self.textureManager.document
+
+        if document is None:
+            return None
+
+        guiDocument = FreeCADGui.getDocument(document.Name)
+
+        if guiDocument is None or guiDocument.ActiveView is None or not hasattr(guiDocument.ActiveView, 'getCameraNode'):
+            return None
+
+        return guiDocument.ActiveView
+
+    def attachCamera(self, camera):
+        # The camera gets replaced when switching between perspective and orthographic view
+        if camera == self.camera:
+            return
+
+        if self.camera is not None:
+            self.cameraSensor.detach()
+
+        self.camera = camera
+        self.cameraSensor.attach(camera)
+
+    def cameraChanged(self, data, sensor):
+        if self.paused:
+            return
+
+        # Wait until the camera stops moving. Texturing while navigating would make the view stutter
+        self.lowPriorityTimer.stop()
+        self.viewTimer.start()
+
+    def findBoundingBox(self, o):
+        '''The bounding boxes are cached. Accessing the shape creates a copy of it'''
+        if o.Name not in self.boundingBoxes:
+            shape = getattr(o, 'Shape', None)
+
+            if shape is None or shape.isNull():
+                return None
+
+            self.boundingBoxes[o.Name] = findGlobalBoundBox(o, shape)
+
+        return self.boundingBoxes[o.Name]
+
+    def createViewTest(self, view):
+        '''Returns a function that returns the size on screen of objects in view and None for all others'''
+        width, height = view.getSize()
+        viewVolume = self.camera.getViewVolume(float(width) / max(1, height))
+
+        def screenSize(o):
+            box = self.findBoundingBox(o)
+
+            if not viewVolume.intersect(box):
+                return None
+
+            return projectedSize(viewVolume, box, width, height)
+
+        return screenSize
+
+    def updateView(self):
+        if self.paused:
+            return
+
+        view = self.findView()
+
+        if view is None:
+            # Without a 3D view there is nothing to look at. So everything gets textured in the background
+            self.lowPriorityTimer.start()
+
+            return
+
+        self.attachCamera(view.getCameraNode())
+
+        screenSize = self.createViewTest(view)
+        document = self.textureManager.document
+        visibleObjects = []
+
+        for objectName in list(self.pendingObjects):
+            o = document.getObject(objectName)
+
+            if o is None or self.findBoundingBox(o) is None:
+                self.forgetObject(objectName)
+                continue
+
+            size = screenSize(o)
+
+            if size is not None and size >= self.settings.minimumScreenSize:
+                visibleObjects.append((size, objectName))
+
+        for size, objectName in sorted(visibleObjects, reverse=True):
+            self.pendingObjects.discard(objectName)
+            self.textureManager.textureObjectByName(objectName)
+
+        if self.settings.releaseOffscreen:
+            self.releaseOffscreenObjects(screenSize)
+
+        if len(self.pendingObjects) > 0 and not self.settings.releaseOffscreen:
+            self.lowPriorityTimer.start()
+
+    def releaseOffscreenObjects(self, screenSize):
+        now = time.time()
+        document = self.textureManager.document
+
+        for objectName in list(self.textureManager.texturedObjects.keys()):
+            o = document.getObject(objectName)
+
+            if o is not None and self.findBoundingBox(o) is not None and screenSize(o) is not None:
+                self.offscreenSince.pop(objectName, None)
+                continue
+
+            offscreenSince = self.offscreenSince.setdefault(objectName, now)
+
+            if now - offscreenSince >= self.settings.releaseDelay:
+                self.offscreenSince.pop(objectName)
+                self.textureManager.removeTexture(objectName)
+                self.pendingObjects.add(objectName)
+
+    def textureNextObject(self):
+        '''Textures one queued object. Called repeatedly by the low priority timer while the camera is idle.'''
+        if len(self.pendingObjects) == 0 or self.viewTimer.isActive():
+            self.lowPriorityTimer.stop()
+
+            return
+
+        objectName = self.pendingObjects.pop()
+        self.textureManager.textureObjectByName(objectName)
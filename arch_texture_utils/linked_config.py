@@ -0,0 +1,51 @@
+import os
+import json
+from arch_texture_utils.texture_files import normalizePath
+
+class LinkedConfig():
+    '''The materials of a parsed config file. Shared by all documents linking the file, so it must not be changed.'''
+
+    def __init__(self, fileName, key, materials):
+        self.fileName = fileName
+        self.key = key
+
+        # '<material_name>': {'file': ..., 'bumpMap': ..., 'realSize': ...}, see TextureManager.textureData
+        self.materials = materials
+
+class LinkedConfigCache():
+    '''
+    Keeps the parsed linked config files of the session by path. Documents linking the same material library share
+    one parsed copy. A file is only parsed again when its size or mtime changed.
+    '''
+
+    def __init__(self):
+        self.configs = {
+            # '<normalized_path>': LinkedConfig
+        }
+
+    def findConfig(self, fileName):
+        fileName = normalizePath(fileName)
+        stat = os.stat(fileName)
+        key = (stat.st_size, stat.st_mtime)
+
+        config = self.configs.get(fileName, None)
+
+        if config is None or config.key != key:
+            with open(fileName, 'r') as f:
+                textureData = json.load(f)
+
+            # Face overrides belong to the objects of one document. Only the materials are shared
+            config = LinkedConfig(fileName, key, textureData.get('materials', {}))
+            self.configs[fileName] = config
+
+        return config
+
+linkedConfigCache = None
+
+def getLinkedConfigCache():
+    global linkedConfigCache
+
+    if linkedConfigCache is None:
+        linkedConfigCache = LinkedConfigCache()
+
+    return linkedConfigCache
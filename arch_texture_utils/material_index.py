@@ -0,0 +1,118 @@
+import FreeCAD
+
+def getMaterialName(o):
+    '''Returns the name of the material assigned to the object or None. Only cheap properties are accessed here.'''
+    if not hasattr(o, 'Material') or o.Material is None:
+        return None
+
+    return o.Material.Name
+
+class MaterialIndex():
+    '''
+    Maps material names to the names of the objects using this material.
+    The index is built once per document and then kept up to date by the MaterialIndexObserver.
+    So texturing only has to visit objects whose material is actually configured.
+    '''
+
+    def __init__(self, document):
+        self.documentName = document.Name
+
+        self.objectsByMaterial = {
+            # '<material_name>': set(['<object_name>'])
+        }
+
+        self.materialByObject = {
+            # '<object_name>': '<material_name>'
+        }
+
+        for o in document.Objects:
+            self.addObject(o)
+
+    def addObject(self, o):
+        materialName = getMaterialName(o)
+
+        if materialName is None:
+            return
+
+        self.materialByObject[o.Name] = materialName
+        self.objectsByMaterial.setdefault(materialName, set()).add(o.Name)
+
+    def removeObject(self, objectName):
+        materialName = self.materialByObject.pop(objectName, None)
+
+        if materialName is None:
+            return
+
+        objectNames = self.objectsByMaterial[materialName]
+        objectNames.discard(objectName)
+
+        if len(objectNames) == 0:
+            del self.objectsByMaterial[materialName]
+
+    def updateObject(self, o):
+        self.removeObject(o.Name)
+        self.addObject(o)
+
+    def findObjects(self, materialNames):
+        '''Returns all objects of the document that use one of the given materials'''
+        document = FreeCAD.getDocument(self.documentName)
+        objects = []
+
+        for materialName in materialNames:
+            for objectName in sorted(self.objectsByMaterial.get(materialName, ())):
+                o = document.getObject(objectName)
+
+                if o is not None:
+                    objects.append(o)
+
+        return objects
+
+class MaterialIndexObserver():
+    '''Document observer that updates the material indices when objects are created, deleted or get another material'''
+
+    def __init__(self):
+        self.indices = {
+            # '<document_name>': MaterialIndex
+        }
+
+    def findIndex(self, o):
+        return self.indices.get(o.Document.Name, None)
+
+    def slotCreatedObject(self, o):
+        index = self.findIndex(o)
+
+        if index is not None:
+            index.addObject(o)
+
+    def slotDeletedObject(self, o):
+        index = self.findIndex(o)
+
+        if index is not None:
+            index.removeObject(o.Name)
+
+    def slotChangedObject(self, o, prop):
+        if prop != 'Material':
+            return
+
+        index = self.findIndex(o)
+
+        if index is not None:
+            index.updateObject(o)
+
+    def slotDeletedDocument(self, document):
+        self.indices.pop(document.Name, None)
+
+observer = None
+
+def getMaterialIndex(document):
+    '''Returns the material index for the given document. The index and the observer are created on first use.'''
+    global observer
+
+    if observer is None:
+        observer = MaterialIndexObserver()
+        FreeCAD.addDocumentObserver(observer)
+
+    if document.Name not in observer.indices:
+        observer.indices[document.Name] = MaterialIndex(document)
+
+    return observer.indices[document.Name]
@@ -0,0 +1,238 @@
+from arch_texture_utils.qtutils import QtCore, QtWidgets, userSelectedFile, IMAGE_FILES
+from arch_texture_utils.thumbnail_utils import getThumbnailStore, THUMBNAIL_SIZE
+from arch_texture_utils.projection_utils import MAPPINGS, MAPPING_FACE
+
+COLUMN_MATERIAL = 0
+COLUMN_TEXTURE = 1
+COLUMN_BUMP_MAP = 2
+COLUMN_LENGTH = 3
+COLUMN_HEIGHT = 4
+COLUMN_MAPPING = 5
+
+COLUMN_TITLES = ['Material', 'Texture', 'BumpMap', 'Length', 'Height', 'Mapping']
+FILE_COLUMNS = [COLUMN_TEXTURE, COLUMN_BUMP_MAP]
+SIZE_COLUMNS = [COLUMN_LENGTH, COLUMN_HEIGHT]
+
+MAXIMUM_SIZE = 100000
+
+def noneWhenEmpty(value):
+    if value == None or value.strip() == '':
+        return None
+
+    return value
+
+class MaterialRow():
+    def __init__(self, materialName=None, textureFile=None, bumpMapFile=None, realSize=None, entryConfig=None):
+        self.materialName = materialName
+        self.textureFile = textureFile
+        self.bumpMapFile = bumpMapFile
+        self.length = realSize['s'] if realSize is not None else 0
+        self.height = realSize['t'] if realSize is not None else 0
+
+        # Keeps settings that are not shown in the table, e.g. the axis of a projection
+        self.entryConfig = dict(entryConfig) if entryConfig is not None else {}
+        self.mapping = self.entryConfig.get('mapping', MAPPING_FACE)
+
+    def toConfig(self):
+        config = dict(self.entryConfig)
+
+        config.update({
+            'file': self.textureFile,
+            'bumpMap': self.bumpMapFile,
+            'realSize': {
+                's': self.length,
+                't': self.height
+            },
+            'mapping': self.mapping
+        })
+
+        return config
+
+class MaterialTableModel(QtCore.QAbstractTableModel):
+    '''
+    The material config of a TextureConfig as table. The materials of the document are passed in once and shared
+    by all rows. Thumbnails of the textures are requested only for rows that are actually painted.
+    '''
+
+    def __init__(self, materials, rows):
+        super(MaterialTableModel, self).__init__()
+
+        # [('<material_name>', '<label (name)>')]
+        self.materials = materials
+        self.materialLabels = dict(materials)
+        self.rows = rows
+
+        self.thumbnailStore = getThumbnailStore()
+        self.thumbnailStore.thumbnailLoaded.connect(self.thumbnailLoaded)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMN_TITLES)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return COLUMN_TITLES[section]
+
+        return None
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEditable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = self.rows[index.row()]
+        column = index.column()
+
+        if role == QtCore.Qt.DisplayRole:
+            if column == COLUMN_MATERIAL:
+                return self.materialLabels.get(row.materialName, row.materialName)
+            elif column in SIZE_COLUMNS:
+                return '%s mm' % (self.sizeValue(row, column), )
+            elif column == COLUMN_MAPPING:
+                return row.mapping.capitalize()
+            else:
+                return self.fileValue(row, column)
+        elif role == QtCore.Qt.EditRole:
+            if column == COLUMN_MATERIAL:
+                return row.materialName
+            elif column in SIZE_COLUMNS:
+                return self.sizeValue(row, column)
+            elif column == COLUMN_MAPPING:
+                return row.mapping
+            else:
+                return self.fileValue(row, column) or ''
+        elif role == QtCore.Qt.DecorationRole and column in FILE_COLUMNS:
+            return self.thumbnailStore.thumbnail(self.fileValue(row, column))
+        elif role == QtCore.Qt.ToolTipRole and column in FILE_COLUMNS:
+            return self.fileValue(row, column)
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.EditRole:
+            return False
+
+        row = self.rows[index.row()]
+        column = index.column()
+
+        if column == COLUMN_MATERIAL:
+            row.materialName = value
+        elif column == COLUMN_TEXTURE:
+            row.textureFile = noneWhenEmpty(value)
+        elif column == COLUMN_BUMP_MAP:
+            row.bumpMapFile = noneWhenEmpty(value)
+        elif column == COLUMN_LENGTH:
+            row.length = float(value)
+        elif column == COLUMN_HEIGHT:
+            row.height = float(value)
+        elif column == COLUMN_MAPPING:
+            row.mapping = value
+
+        self.dataChanged.emit(index, index)
+
+        return True
+
+    def sizeValue(self, row, column):
+        return row.length if column == COLUMN_LENGTH else row.height
+
+    def fileValue(self, row, column):
+        return row.textureFile if column == COLUMN_TEXTURE else row.bumpMapFile
+
+    def addRow(self):
+        materialName = self.materials[0][0] if len(self.materials) > 0 else None
+
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows))
+        self.rows.append(MaterialRow(materialName))
+        self.endInsertRows()
+
+    def removeMaterialRow(self, rowIndex):
+        self.beginRemoveRows(QtCore.QModelIndex(), rowIndex, rowIndex)
+        self.rows.pop(rowIndex)
+        self.endRemoveRows()
+
+    def thumbnailLoaded(self, imageFile):
+        for rowIndex, row in enumerate(self.rows):
+            for column in FILE_COLUMNS:
+                if self.fileValue(row, column) == imageFile:
+                    index = self.index(rowIndex, column)
+                    self.dataChanged.emit(index, index)
+
+    def release(self):
+        '''The thumbnail store is shared. So the model has to disconnect when the panel is closed.'''
+        self.thumbnailStore.thumbnailLoaded.disconnect(self.thumbnailLoaded)
+
+class MaterialDelegate(QtWidgets.QStyledItemDelegate):
+    '''Creates the editors only when a cell is edited. Double clicking a file cell opens a file dialog.'''
+
+    def createEditor(self, parent, option, index):
+        column = index.column()
+
+        if column == COLUMN_MATERIAL:
+            editor = QtWidgets.QComboBox(parent)
+
+            for materialName, label in index.model().materials:
+                editor.addItem(label, materialName)
+
+            return editor
+        elif column == COLUMN_MAPPING:
+            editor = QtWidgets.QComboBox(parent)
+
+            for mapping in MAPPINGS:
+                editor.addItem(mapping.capitalize(), mapping)
+
+            return editor
+        elif column in SIZE_COLUMNS:
+            editor = QtWidgets.QDoubleSpinBox(parent)
+            editor.setSuffix('mm')
+            editor.setMinimum(0)
+            editor.setMaximum(MAXIMUM_SIZE)
+
+            return editor
+
+        return QtWidgets.QLineEdit(parent)
+
+    def setEditorData(self, editor, index):
+        value = index.model().data(index, QtCore.Qt.EditRole)
+        column = index.column()
+
+        if column in (COLUMN_MATERIAL, COLUMN_MAPPING):
+            editor.setCurrentIndex(max(0, editor.findData(value)))
+        elif column in SIZE_COLUMNS:
+            editor.setValue(value)
+        else:
+            editor.setText(value)
+
+    def setModelData(self, editor, model, index):
+        column = index.column()
+
+        if column in (COLUMN_MATERIAL, COLUMN_MAPPING):
+            model.setData(index, editor.itemData(editor.currentIndex()))
+        elif column in SIZE_COLUMNS:
+            model.setData(index, editor.value())
+        else:
+            model.setData(index, editor.text())
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.MouseButtonDblClick and index.column() in FILE_COLUMNS:
+            selectedFile = userSelectedFile('Select texture', IMAGE_FILES)
+
+            if selectedFile is not None:
+                model.setData(index, selectedFile)
+
+            return True
+
+        return super(MaterialDelegate, self).editorEvent(event, model, option, index)
+
+def setupMaterialTable(tableView, model):
+    tableView.setModel(model)
+    tableView.setItemDelegate(MaterialDelegate(tableView))
+
+    tableView.setIconSize(QtCore.QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    tableView.verticalHeader().setDefaultSectionSize(THUMBNAIL_SIZE + 4)
+    tableView.horizontalHeader().setStretchLastSection(True)
+    tableView.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+    tableView.setEditTriggers(QtWidgets.QAbstractItemView.DoubleClicked | QtWidgets.QAbstractItemView.EditKeyPressed)
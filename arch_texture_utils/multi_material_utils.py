@@ -0,0 +1,45 @@
+def isMultiMaterial(material):
+    return material is not None and hasattr(material, 'Materials') and hasattr(material, 'Thicknesses')
+
+def findLayerMaterials(multiMaterial, layerCount):
+    '''
+    Returns the material of every layer solid. Arch skips layers with a negative thickness, they only
+    leave a gap. When the number of remaining layers does not match the solids, the materials are used as they are.
+    '''
+    materials = list(multiMaterial.Materials)
+    thicknesses = list(multiMaterial.Thicknesses)
+
+    if len(thicknesses) == len(materials):
+        solidMaterials = [material for material, thickness in zip(materials, thicknesses) if thickness >= 0]
+
+        if len(solidMaterials) == layerCount:
+            return solidMaterials
+
+    return materials
+
+def findFaceMaterials(shape, multiMaterial):
+    '''
+    Returns the material of every face of the shape, in the order of shape.Faces, which is the order of
+    the faces in the SoBrepFaceSet. Objects with a MultiMaterial consist of one solid per layer.
+    Faces that can't be assigned to a layer get None.
+    '''
+    solids = shape.Solids
+    layerMaterials = findLayerMaterials(multiMaterial, len(solids))
+
+    layerByFace = {}
+
+    for layerIndex, solid in enumerate(solids):
+        for face in solid.Faces:
+            layerByFace[face.hashCode()] = layerIndex
+
+    faceMaterials = []
+
+    for face in shape.Faces:
+        layerIndex = layerByFace.get(face.hashCode(), None)
+
+        if layerIndex is None or layerIndex >= len(layerMaterials):
+            faceMaterials.append(None)
+        else:
+            faceMaterials.append(layerMaterials[layerIndex])
+
+    return faceMaterials
@@ -0,0 +1,78 @@
+import os
+import zlib
+import struct
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPE_RGB = 2
+FILTER_NONE = b'\x00'
+
+# Compressed data is written as soon as this many bytes are available
+CHUNK_SIZE = 1024 * 1024
+
+class PngStreamWriter():
+    '''
+    Writes a RGB PNG file row by row. Only the compressed data of the current chunk is held in memory,
+    so images larger than the available memory can be written.
+    '''
+
+    def __init__(self, fileName, width, height):
+        self.width = width
+        self.height = height
+        self.rowsWritten = 0
+
+        self.file = open(fileName, 'wb')
+        self.compressor = zlib.compressobj(6)
+        self.pending = []
+        self.pendingSize = 0
+
+        self.file.write(PNG_SIGNATURE)
+        self.writeChunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, COLOR_TYPE_RGB, 0, 0, 0))
+
+    def writeChunk(self, chunkType, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunkType)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(chunkType + data) & 0xffffffff))
+
+    def writeRow(self, row):
+        '''Writes one row of width * 3 bytes'''
+        if self.rowsWritten >= self.height:
+            raise ValueError('All rows have already been written')
+
+        self.addCompressedData(self.compressor.compress(FILTER_NONE + bytes(row)))
+        self.rowsWritten += 1
+
+    def addCompressedData(self, data):
+        if len(data) == 0:
+            return
+
+        self.pending.append(data)
+        self.pendingSize += len(data)
+
+        if self.pendingSize >= CHUNK_SIZE:
+            self.flushPending()
+
+    def flushPending(self):
+        if self.pendingSize > 0:
+            self.writeChunk(b'IDAT', b''.join(self.pending))
+
+        self.pending = []
+        self.pendingSize = 0
+
+    def abort(self):
+        '''Closes and removes the incomplete file, e.g. after rendering failed or was cancelled'''
+        self.file.close()
+
+        if os.path.exists(self.file.name):
+            os.remove(self.file.name)
+
+    def close(self):
+        try:
+            if self.rowsWritten != self.height:
+                raise ValueError('Expected %s rows but got %s' % (self.height, self.rowsWritten))
+
+            self.addCompressedData(self.compressor.flush())
+            self.flushPending()
+            self.writeChunk(b'IEND', b'')
+        finally:
+            self.file.close()
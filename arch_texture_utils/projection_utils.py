@@ -0,0 +1,250 @@
+import numpy as np
+from pivy import coin
+
+MAPPING_FACE = 'face'
+MAPPING_BOX = 'box'
+MAPPING_PLANAR = 'planar'
+MAPPING_CYLINDRICAL = 'cylindrical'
+MAPPING_SURFACE = 'surface'
+
+PROJECTION_MAPPINGS = [MAPPING_BOX, MAPPING_PLANAR, MAPPING_CYLINDRICAL]
+MAPPINGS = [MAPPING_FACE] + PROJECTION_MAPPINGS + [MAPPING_SURFACE]
+
+# Used when no realSize is set. Projected coordinates have no face to stretch the texture to
+DEFAULT_REAL_SIZE = 1000.0
+
+DEFAULT_PLANAR_AXIS = (0.0, 1.0, 0.0)
+DEFAULT_CYLINDRICAL_AXIS = (0.0, 0.0, 1.0)
+
+def findMapping(textureConfig):
+    return textureConfig.get('mapping', MAPPING_FACE)
+
+def isProjectionMapping(textureConfig):
+    return findMapping(textureConfig) in PROJECTION_MAPPINGS
+
+def findScale(realSize):
+    '''The size in mm of one repetition of the texture in s and t'''
+    if realSize is None:
+        return (DEFAULT_REAL_SIZE, DEFAULT_REAL_SIZE)
+
+    s = realSize['s'] if realSize['s'] > 0 else DEFAULT_REAL_SIZE
+    t = realSize['t'] if realSize['t'] > 0 else DEFAULT_REAL_SIZE
+
+    return (s, t)
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    length = np.linalg.norm(vector)
+
+    return vector / length if length > 0 else vector
+
+def planeAxes(axis):
+    '''
+    Returns the unit vectors u and v of the plane perpendicular to axis. v points up as far as possible,
+    so brick courses run horizontally on walls.
+    '''
+    axis = normalize(axis)
+    up = np.array([0.0, 0.0, 1.0])
+
+    if abs(np.dot(axis, up)) > 0.999:
+        return (np.array([1.0, 0.0, 0.0]), np.array([0.0, 1.0, 0.0]))
+
+    u = normalize(np.cross(axis, up))
+    v = np.cross(u, axis)
+
+    return (u, v)
+
+def findWorldMatrix(o, transform):
+    '''
+    The matrix from the coordinates of the scene graph into world coordinates. The transform node contains the
+    placement of the object. Objects inside of parts are additionally moved by the placement of the part.
+    '''
+    matrix = np.identity(4)
+
+    if transform is not None:
+        sbMatrix = coin.SbMatrix()
+        sbMatrix.setTransform(transform.translation.getValue(), transform.rotation.getValue(), transform.scaleFactor.getValue())
+
+        # Coin uses row vectors. So the matrix has to be transposed for column vectors
+        matrix = np.array(sbMatrix.getValue(), dtype=np.float64).T
+
+    parent = o.getParentGeoFeatureGroup() if hasattr(o, 'getParentGeoFeatureGroup') else None
+
+    if parent is not None:
+        parentMatrix = parent.getGlobalPlacement().toMatrix()
+        matrix = np.array(parentMatrix.A, dtype=np.float64).reshape(4, 4).dot(matrix)
+
+    return matrix
+
+def findWorldVertices(o, vertexCoordinates, transform):
+    vertices = np.array([v.getValue() for v in vertexCoordinates.point.getValues()], dtype=np.float64).reshape(-1, 3)
+    matrix = findWorldMatrix(o, transform)
+
+    return vertices.dot(matrix[:3, :3].T) + matrix[:3, 3]
+
+def findTriangles(brep):
+    '''All triangles of the brep faceset as array of vertex indices'''
+    coordIndex = np.array(brep.coordIndex.getValues(), dtype=np.int64)
+    partIndex = brep.partIndex.getValues()
+
+    if 4 * sum(partIndex) == len(coordIndex):
+        return coordIndex.reshape(-1, 4)[:, :3]
+
+    triangles = []
+    start = 0
+
+    for end in np.flatnonzero(coordIndex == -1).tolist() + [len(coordIndex)]:
+        if end - start == 3:
+            triangles.append(coordIndex[start:end])
+
+        start = end + 1
+
+    return np.array(triangles, dtype=np.int64).reshape(-1, 3)
+
+def findVertexNormals(vertices, triangles):
+    '''
+    FreeCAD does not share vertices between faces. So the normal of a vertex is the sum of the normals of its triangles.
+    The triangle normals are weighted by area, which is the length of the cross product.
+    '''
+    triangleNormals = np.cross(vertices[triangles[:, 1]] - vertices[triangles[:, 0]], vertices[triangles[:, 2]] - vertices[triangles[:, 0]])
+
+    normals = np.zeros(vertices.shape)
+
+    for corner in range(3):
+        np.add.at(normals, triangles[:, corner], triangleNormals)
+
+    return normals
+
+def boxCoordinates(vertices, normals):
+    '''
+    Projects every vertex along the global axis its normal is closest to. s runs to the right when looking
+    at the side, so the texture is not mirrored on back sides.
+    '''
+    dominantAxis = np.argmax(np.abs(normals), axis=1)
+    sign = np.where(normals[np.arange(len(normals)), dominantAxis] < 0, -1.0, 1.0)
+
+    x = vertices[:, 0]
+    y = vertices[:, 1]
+    z = vertices[:, 2]
+
+    s = np.where(dominantAxis == 0, sign * y, np.where(dominantAxis == 1, -sign * x, sign * x))
+    t = np.where(dominantAxis == 2, y, z)
+
+    return (s, t)
+
+def planarCoordinates(vertices, axis):
+    u, v = planeAxes(axis)
+
+    return (vertices.dot(u), vertices.dot(v))
+
+def findFaceSeeds(brep, triangles):
+    '''The first vertex of every face. partIndex holds the number of triangles of each face.'''
+    partIndex = np.array(brep.partIndex.getValues(), dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(partIndex)[:-1])).astype(np.int64)
+    starts = starts[(partIndex > 0) & (starts < len(triangles))]
+
+    return triangles[starts, 0]
+
+def unwrapAngles(angles, triangles, seeds):
+    '''
+    arctan2 jumps from pi to -pi. A triangle across this jump would interpolate s around the whole circumference.
+    So the angles are unwrapped along the edges of the triangles, starting at the seeds, which makes them continuous
+    inside every face. Faces around a whole cylinder get their seam where the triangulation has one, as OCC
+    duplicates the nodes along the seam edge of closed faces.
+    '''
+    edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))
+    edges = np.concatenate((edges, edges[:, ::-1]))
+
+    unwrapped = angles.copy()
+    assigned = np.ones(len(angles), dtype=bool)
+    assigned[triangles.ravel()] = False
+
+    seeds = np.asarray(seeds, dtype=np.int64)
+
+    while not assigned.all():
+        seeds = seeds[~assigned[seeds]]
+
+        if len(seeds) == 0:
+            # Parts of faces not connected to their seed
+            seeds = np.flatnonzero(~assigned)[:1]
+
+        assigned[seeds] = True
+
+        # Every pass assigns the neighbours of the assigned vertices, so all faces are unwrapped at the same time
+        while True:
+            front = assigned[edges[:, 0]] & ~assigned[edges[:, 1]]
+
+            if not front.any():
+                break
+
+            targets, first = np.unique(edges[front, 1], return_index=True)
+            sources = edges[front, 0][first]
+
+            delta = angles[targets] - unwrapped[sources]
+            unwrapped[targets] = unwrapped[sources] + (delta + np.pi) % (2 * np.pi) - np.pi
+            assigned[targets] = True
+
+        seeds = np.zeros(0, dtype=np.int64)
+
+    return unwrapped
+
+def cylindricalCoordinates(vertices, axis, origin, triangles=None, seeds=None):
+    '''
+    s is the arc length around the axis, t the height along it. With the triangles, the angles are unwrapped
+    inside every face, see unwrapAngles.
+    '''
+    axis = normalize(axis)
+    u, v = planeAxes(axis)
+
+    relative = vertices - origin
+    height = relative.dot(axis)
+    radial = relative - np.outer(height, axis)
+
+    angle = np.arctan2(radial.dot(v), radial.dot(u))
+    radius = np.linalg.norm(radial, axis=1)
+
+    if triangles is not None and len(triangles) > 0:
+        angle = unwrapAngles(angle, triangles, seeds if seeds is not None else triangles[:1, 0])
+
+    return (angle * radius, height)
+
+def findCylinderOrigin(vertices):
+    '''Without an origin the axis runs through the center of the object'''
+    return (vertices.min(axis=0) + vertices.max(axis=0)) / 2.0
+
+def projectVertices(vertices, triangles, textureConfig, seeds=None):
+    '''Returns the (s, t) of every vertex for the projection mapping of the material. seeds see unwrapAngles.'''
+    mapping = findMapping(textureConfig)
+
+    if mapping == MAPPING_BOX:
+        s, t = boxCoordinates(vertices, findVertexNormals(vertices, triangles))
+    elif mapping == MAPPING_PLANAR:
+        s, t = planarCoordinates(vertices, textureConfig.get('axis', DEFAULT_PLANAR_AXIS))
+    elif mapping == MAPPING_CYLINDRICAL:
+        axis = textureConfig.get('axis', DEFAULT_CYLINDRICAL_AXIS)
+        origin = textureConfig.get('origin', None)
+
+        if origin is None:
+            origin = findCylinderOrigin(vertices)
+
+        s, t = cylindricalCoordinates(vertices, axis, np.asarray(origin, dtype=np.float64), triangles, seeds)
+    else:
+        raise ValueError('Unknown projection mapping %s' % (mapping, ))
+
+    scaleS, scaleT = findScale(textureConfig['realSize'])
+
+    return np.column_stack((s / scaleS, t / scaleT))
+
+def calculateTextureCoordinates(o, brep, vertexCoordinates, transform, textureConfig):
+    '''
+    Calculates the texture coordinates of all vertices at once from their world position. No per face frame is
+    needed, and neighbouring faces and objects share the same projection, so the texture runs across them without seams.
+    '''
+    vertices = findWorldVertices(o, vertexCoordinates, transform)
+    triangles = findTriangles(brep)
+    coordinates = projectVertices(vertices, triangles, textureConfig, findFaceSeeds(brep, triangles))
+
+    textureCoords = coin.SoTextureCoordinate2()
+    textureCoords.point.setValues(0, len(coordinates), coordinates.tolist())
+
+    return textureCoords
@@ -18,6 +18,7 @@ QDialogButtonBox = QtWidgets.QDialogButtonBox
 # File patterns
 IMAGE_FILES = "Image Files (*.png *.jpg *.bmp *.tif)"
 JSON_FILES = "JSON Files (*.json)"
+PNG_FILES = "PNG Files (*.png)"
 
 # methods
 def activeWindow():
@@ -26,6 +27,11 @@ def activeWindow():
 def showInfo(title, message):
     QtWidgets.QMessageBox.information(activeWindow(), title, message)
 
+def userConfirmed(title, message):
+    answer = QtWidgets.QMessageBox.question(activeWindow(), title, message, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+
+    return answer == QtWidgets.QMessageBox.Yes
+
 def userSelectedFile(title, filePattern, mustExist=True):
     if mustExist:
         fileName = QtWidgets.QFileDialog.getOpenFileName(activeWindow(), title, '', filePattern)[0]
@@ -35,4 +41,12 @@ def userSelectedFile(title, filePattern, mustExist=True):
     if fileName == '':
         return None
 
-    return fileName
\ No newline at end of file
+    return fileName
+
+def userInputInteger(title, label, value, minimum, maximum):
+    number, accepted = QtWidgets.QInputDialog.getInt(activeWindow(), title, label, value, minimum, maximum)
+
+    if not accepted:
+        return None
+
+    return number
\ No newline at end of file
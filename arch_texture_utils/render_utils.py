@@ -0,0 +1,155 @@
+import math
+import FreeCAD
+from pivy import coin
+from arch_texture_utils.qtutils import QtGui
+
+DEFAULT_FIELD_OF_VIEW = 45
+DEFAULT_UP = (0, 0, 1)
+
+def isTextureConfig(o):
+    return hasattr(o, 'Proxy') and getattr(o.Proxy, 'isTextureConfig', False)
+
+def isEnvironmentConfig(o):
+    return hasattr(o, 'Proxy') and getattr(o.Proxy, 'isEnvironmentConfig', False)
+
+def isLight(o):
+    return o.ViewObject is not None and hasattr(o.ViewObject.Proxy, 'coinLight')
+
+def showTextures(document, textureConfigNames=None):
+    '''
+    Textures all objects with the given TextureConfigs. When no names are given all TextureConfigs are used.
+    Without a 3D view there is no event loop. So everything the GUI does later with timers is done right away:
+    all objects are textured, even with lazy texturing, and environment tiles are split and loaded in full resolution.
+    '''
+    FreeCAD.setActiveDocument(document.Name)
+
+    for o in document.Objects:
+        if isEnvironmentConfig(o) and o.ViewObject is not None:
+            o.ViewObject.Proxy.loadTiles()
+
+        if not isTextureConfig(o):
+            continue
+
+        if textureConfigNames is None or o.Name in textureConfigNames or o.Label in textureConfigNames:
+            o.Proxy.showTextures = True
+            o.Proxy.updateTextures(o, lazy=False)
+
+def buildScene(document, headlight=True):
+    '''
+    Builds a scene graph containing all visible objects of the document, the environment and the lights.
+    The camera is inserted later with setCamera.
+    '''
+    root = coin.SoSeparator()
+
+    # A directional light shines along -z by default. setCamera points it in the view direction
+    headlightNode = coin.SoDirectionalLight()
+    headlightNode.on.setValue(headlight)
+    root.addChild(headlightNode)
+
+    cameraGroup = coin.SoGroup()
+    root.addChild(cameraGroup)
+
+    for o in document.Objects:
+        vobj = o.ViewObject
+
+        if vobj is None or isTextureConfig(o):
+            continue
+
+        if isLight(o):
+            root.insertChild(vobj.Proxy.coinLight, 2)
+            continue
+
+        if not vobj.Visibility:
+            continue
+
+        # Children of parts are already part of the scene graph of their parent
+        if hasattr(o, 'getParentGeoFeatureGroup') and o.getParentGeoFeatureGroup() is not None:
+            continue
+
+        root.addChild(vobj.RootNode)
+
+    return root
+
+def createCamera(cameraSpec):
+    '''
+    Creates a camera from a dict with the keys
+      position: (x, y, z)
+      target: (x, y, z) the point the camera looks at
+      up: (x, y, z) optional, defaults to the z axis
+      fieldOfView: optional vertical field of view in degrees
+      orthographic: optional, when True the field of view is ignored and height is used
+      height: optional height of the visible area of orthographic cameras
+    '''
+    if cameraSpec.get('orthographic', False):
+        camera = coin.SoOrthographicCamera()
+        camera.height.setValue(cameraSpec.get('height', 10000))
+    else:
+        camera = coin.SoPerspectiveCamera()
+        camera.heightAngle.setValue(math.radians(cameraSpec.get('fieldOfView', DEFAULT_FIELD_OF_VIEW)))
+
+    camera.position.setValue(coin.SbVec3f(*cameraSpec['position']))
+    camera.pointAt(coin.SbVec3f(*cameraSpec['target']), coin.SbVec3f(*cameraSpec.get('up', DEFAULT_UP)))
+
+    return camera
+
+def turntableCameras(center, radius, height, frames, fieldOfView=DEFAULT_FIELD_OF_VIEW):
+    '''Returns a camera path circling around center at the given radius and height above it'''
+    cameras = []
+
+    for frame in range(frames):
+        angle = 2 * math.pi * frame / frames
+
+        cameras.append({
+            'position': (center[0] + math.sin(angle) * radius, center[1] - math.cos(angle) * radius, center[2] + height),
+            'target': tuple(center),
+            'fieldOfView': fieldOfView
+        })
+
+    return cameras
+
+def setCamera(root, camera, viewport):
+    '''
+    Replaces the camera of the scene, points the head light in the view direction and adjusts the clipping planes
+    to enclose the whole scene
+    '''
+    cameraGroup = root.getChild(1)
+    cameraGroup.removeAllChildren()
+    cameraGroup.addChild(camera)
+
+    headlightNode = root.getChild(0)
+    headlightNode.direction.setValue(camera.orientation.getValue().multVec(coin.SbVec3f(0, 0, -1)))
+
+    boundingBoxAction = coin.SoGetBoundingBoxAction(viewport)
+    boundingBoxAction.apply(root)
+    boundingBox = boundingBoxAction.getBoundingBox()
+
+    if boundingBox.isEmpty():
+        return
+
+    center = boundingBox.getCenter()
+    xSize, ySize, zSize = boundingBox.getSize().getValue()
+    sceneRadius = math.sqrt(xSize ** 2 + ySize ** 2 + zSize ** 2) / 2
+    distance = (center - camera.position.getValue()).length()
+
+    camera.nearDistance.setValue(max(1.0, distance - sceneRadius))
+    camera.farDistance.setValue(distance + sceneRadius)
+
+def bufferToImage(renderer, width, height):
+    '''Converts the RGB buffer of the offscreen renderer to a QImage. OpenGL starts with the bottom row.'''
+    buffer = renderer.getBuffer()
+    image = QtGui.QImage(buffer, width, height, width * 3, QtGui.QImage.Format_RGB888)
+
+    return image.mirrored(False, True)
+
+def createRenderer(width, height, background=(1.0, 1.0, 1.0)):
+    renderer = coin.SoOffscreenRenderer(coin.SbViewportRegion(width, height))
+    renderer.setComponents(coin.SoOffscreenRenderer.RGB)
+    renderer.setBackgroundColor(coin.SbColor(*background))
+
+    return renderer
+
+def renderImage(renderer, root, width, height):
+    if not renderer.render(root):
+        raise RuntimeError('Offscreen rendering failed. Is an OpenGL implementation (e.g. Mesa) available?')
+
+    return bufferToImage(renderer, width, height)
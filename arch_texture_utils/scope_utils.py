@@ -0,0 +1,84 @@
+import FreeCAD
+
+# Objects with one of these properties contain other objects, e.g. groups, BuildingParts, levels and parts
+CONTAINER_PROPERTIES = ['Group']
+
+def findChildren(o):
+    children = []
+
+    for prop in CONTAINER_PROPERTIES:
+        children.extend(getattr(o, prop, None) or [])
+
+    return children
+
+def collectMembers(scopeObjects):
+    '''
+    Returns the names of the scope objects and all their members, resolved recursively,
+    and the names of all containers visited on the way.
+    '''
+    members = set()
+    containers = set()
+    pending = list(scopeObjects)
+
+    while len(pending) > 0:
+        o = pending.pop()
+
+        if o is None or o.Name in members:
+            continue
+
+        members.add(o.Name)
+        children = findChildren(o)
+
+        if len(children) > 0 or any(prop in o.PropertiesList for prop in CONTAINER_PROPERTIES):
+            containers.add(o.Name)
+
+        pending.extend(children)
+
+    return (members, containers)
+
+class Scope():
+    '''
+    Limits texturing to the members of some groups, BuildingParts or levels.
+    The members are resolved once and cached. A document observer updates them when the content of one of the
+    containers changes and reports added and removed members to onMembersChanged(added, removed).
+    '''
+
+    def __init__(self, document, scopeObjects, onMembersChanged=None):
+        self.documentName = document.Name
+        self.scopeNames = [o.Name for o in scopeObjects]
+        self.onMembersChanged = onMembersChanged
+
+        self.members, self.containers = collectMembers(scopeObjects)
+
+    def contains(self, objectName):
+        return objectName in self.members
+
+    def start(self):
+        FreeCAD.addDocumentObserver(self)
+
+    def stop(self):
+        FreeCAD.removeDocumentObserver(self)
+
+    def update(self):
+        document = FreeCAD.getDocument(self.documentName)
+        scopeObjects = [document.getObject(name) for name in self.scopeNames]
+
+        oldMembers = self.members
+        self.members, self.containers = collectMembers(scopeObjects)
+
+        added = self.members - oldMembers
+        removed = oldMembers - self.members
+
+        if self.onMembersChanged is not None and (len(added) > 0 or len(removed) > 0):
+            self.onMembersChanged(sorted(added), sorted(removed))
+
+    def slotChangedObject(self, o, prop):
+        if prop in CONTAINER_PROPERTIES and o.Document.Name == self.documentName and o.Name in self.containers:
+            self.update()
+
+    def slotDeletedObject(self, o):
+        if o.Document.Name == self.documentName and o.Name in self.members:
+            self.members.discard(o.Name)
+
+            if o.Name in self.containers:
+                self.update()
@@ -1,4 +1,7 @@
 import FreeCAD, FreeCADGui
+import re
+
+FACE_NAME_REGEX = re.compile(r'^Face\d+$')
 
 def findSelectedTextureConfig(returnFreeCadObject=False):
     selection = FreeCADGui.Selection.getSelection()
@@ -33,6 +36,42 @@ def findSelectedFaces():
     
     return selectedFaces
 
+def findSelectedFacesWithIndices():
+    '''
+    Returns (objectName, faceIndex, vectors) for every selected face. The index is zero based, Face1 has the index 0.
+    faceIndex is None when the face was not selected directly on the object, e.g. through a link.
+    '''
+    selection = FreeCADGui.Selection.getSelectionEx()
+
+    selectedFaces = []
+
+    for selectedObject in selection:
+        for subElementName, subObject in zip(selectedObject.SubElementNames, selectedObject.SubObjects):
+            if subObject.ShapeType == "Face":
+                faceIndex = None
+
+                if FACE_NAME_REGEX.match(subElementName):
+                    faceIndex = int(subElementName[len('Face'):]) - 1
+
+                vectors = [vertex.Point for vertex in subObject.Vertexes]
+
+                selectedFaces.append((selectedObject.Object.Name, faceIndex, vectors))
+
+    return selectedFaces
+
+def findSelectedFacesWithNames():
+    '''Returns (object, subElementName, face) for every selected face, e.g. (<Wall>, 'Face3', <Face>)'''
+    selection = FreeCADGui.Selection.getSelectionEx()
+
+    selectedFaces = []
+
+    for selectedObject in selection:
+        for subElementName, subObject in zip(selectedObject.SubElementNames, selectedObject.SubObjects):
+            if subObject.ShapeType == "Face":
+                selectedFaces.append((selectedObject.Object, subElementName, subObject))
+
+    return selectedFaces
+
 def findSelectedFacesAsVectors():
     selectedFaces = findSelectedFaces()
     selectedFacesAsVectors = []
@@ -0,0 +1,116 @@
+import math
+import datetime
+import numpy as np
+from functools import lru_cache
+
+# Resolution of the precomputed tables
+DEFAULT_STEP_MINUTES = 5
+MINUTES_PER_DAY = 24 * 60
+
+class SunTable():
+    '''
+    Precomputed light directions for a site. directions has the shape (days, steps, 3) and contains the
+    direction the light travels in model coordinates. elevations has the shape (days, steps) and contains
+    the elevation of the sun in radians. Negative elevations mean the sun is below the horizon.
+    '''
+
+    def __init__(self, firstDay, stepMinutes, directions, elevations):
+        self.firstDay = firstDay
+        self.stepMinutes = stepMinutes
+        self.directions = directions
+        self.elevations = elevations
+
+    def dayCount(self):
+        return self.directions.shape[0]
+
+    def stepCount(self):
+        return self.directions.shape[1]
+
+    def lookup(self, dayIndex, minutes):
+        '''Returns the direction and the elevation for the given day and time. The time is interpolated linearly.'''
+        position = (minutes % MINUTES_PER_DAY) / self.stepMinutes
+        step = int(math.floor(position))
+        fraction = position - step
+        nextStep = (step + 1) % self.stepCount()
+
+        direction = self.directions[dayIndex, step] * (1 - fraction) + self.directions[dayIndex, nextStep] * fraction
+        elevation = self.elevations[dayIndex, step] * (1 - fraction) + self.elevations[dayIndex, nextStep] * fraction
+
+        return (direction / np.linalg.norm(direction), elevation)
+
+def parseDate(dateString):
+    '''Dates are stored as YYYY-MM-DD. Invalid dates fall back to the current day.'''
+    try:
+        return datetime.datetime.strptime(dateString.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return datetime.date.today()
+
+def calculateSunVectors(latitude, longitude, timeZone, dayOfYear, hours, daysInYear=365):
+    '''
+    Calculates the unit vectors pointing from the site to the sun as east, north and up components.
+    dayOfYear and hours are numpy arrays of the same shape. Based on the NOAA general solar position calculations:
+    https://gml.noaa.gov/grad/solcalc/solareqns.PDF
+    '''
+    gamma = 2 * math.pi / daysInYear * (dayOfYear - 1 + (hours - 12) / 24)
+
+    equationOfTime = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                               - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+
+    declination = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+                   - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+                   - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+
+    timeOffset = equationOfTime + 4 * longitude - 60 * timeZone
+    trueSolarTime = hours * 60 + timeOffset
+    hourAngle = np.radians(trueSolarTime / 4 - 180)
+
+    latitude = math.radians(latitude)
+
+    east = -np.cos(declination) * np.sin(hourAngle)
+    north = math.cos(latitude) * np.sin(declination) - math.sin(latitude) * np.cos(declination) * np.cos(hourAngle)
+    up = math.sin(latitude) * np.sin(declination) + math.cos(latitude) * np.cos(declination) * np.cos(hourAngle)
+
+    return (east, north, up)
+
+def toModelDirections(east, north, up, northAngle):
+    '''
+    Converts sun vectors to light directions in model coordinates. The light travels away from the sun.
+    northAngle is the angle of true north measured counter clockwise from the positive y axis.
+    '''
+    angle = math.radians(northAngle)
+
+    x = east * math.cos(angle) - north * math.sin(angle)
+    y = east * math.sin(angle) + north * math.cos(angle)
+
+    return -np.stack((x, y, up), axis=-1)
+
+@lru_cache(maxsize=32)
+def buildSunTable(latitude, longitude, timeZone, northAngle, firstDay, days=1, stepMinutes=DEFAULT_STEP_MINUTES):
+    '''
+    Builds the table of light directions for the given number of days starting at firstDay (a datetime.date).
+    All days and times are calculated at once. The tables are cached, so switching back and forth between dates is free.
+    '''
+    dates = [firstDay + datetime.timedelta(days=day) for day in range(days)]
+    dayOfYear = np.array([date.timetuple().tm_yday for date in dates], dtype=float)
+    daysInYear = np.array([366 if isLeapYear(date.year) else 365 for date in dates], dtype=float)
+
+    hours = np.arange(0, MINUTES_PER_DAY, stepMinutes, dtype=float) / 60
+
+    dayGrid, hourGrid = np.meshgrid(dayOfYear, hours, indexing='ij')
+    daysInYearGrid = np.broadcast_to(daysInYear[:, np.newaxis], dayGrid.shape)
+
+    east, north, up = calculateSunVectors(latitude, longitude, timeZone, dayGrid, hourGrid, daysInYearGrid)
+
+    directions = toModelDirections(east, north, up, northAngle)
+    elevations = np.arcsin(np.clip(up, -1, 1))
+
+    return SunTable(firstDay, stepMinutes, directions, elevations)
+
+def buildYearTable(latitude, longitude, timeZone, northAngle, year, stepMinutes=DEFAULT_STEP_MINUTES):
+    firstDay = datetime.date(year, 1, 1)
+    days = 366 if isLeapYear(year) else 365
+
+    return buildSunTable(latitude, longitude, timeZone, northAngle, firstDay, days, stepMinutes)
+
+def isLeapYear(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
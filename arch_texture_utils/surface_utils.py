@@ -0,0 +1,128 @@
+from collections import OrderedDict
+import numpy as np
+import FreeCAD
+from pivy import coin
+from arch_texture_utils.projection_utils import MAPPING_SURFACE, findMapping
+
+# Number of faces whose arc lengths are kept in memory
+CACHE_SIZE = 20000
+
+def isSurfaceMapping(textureConfig):
+    return findMapping(textureConfig) == MAPPING_SURFACE
+
+def findArcLengths(face):
+    '''The length of the face along u and v, measured on the iso curves through the middle of the face'''
+    uMin, uMax, vMin, vMax = face.ParameterRange
+    surface = face.Surface
+
+    try:
+        length = surface.vIso((vMin + vMax) / 2.0).length(uMin, uMax)
+        height = surface.uIso((uMin + uMax) / 2.0).length(vMin, vMax)
+    except Exception:
+        # Some surfaces have no iso curves. The bounding box is a rough estimate
+        length = face.BoundBox.DiagonalLength
+        height = length
+
+    return (length, height)
+
+def findGeometryKey(face):
+    '''
+    Identifies the geometry of a face. The hash code alone is not enough: it comes from the address of the shape,
+    which is reused for other shapes after a recompute freed the old one.
+    '''
+    boundBox = face.BoundBox
+
+    return (face.hashCode(), tuple(face.ParameterRange), face.Area,
+            (boundBox.XMin, boundBox.YMin, boundBox.ZMin, boundBox.XMax, boundBox.YMax, boundBox.ZMax))
+
+def calculateFaceCoordinates(face, arcLengths):
+    '''
+    Returns the (s, t) in mm of every node of the face triangulation. They are calculated from the (u, v) of the nodes
+    on the surface of the face. So textures follow curved walls, columns and domes without distortion.
+    '''
+    uvNodes = np.array(face.getUVNodes(), dtype=np.float64).reshape(-1, 2)
+    uMin, uMax, vMin, vMax = face.ParameterRange
+    length, height = arcLengths
+
+    s = (uvNodes[:, 0] - uMin) / max(uMax - uMin, 1e-12) * length
+    t = (uvNodes[:, 1] - vMin) / max(vMax - vMin, 1e-12) * height
+
+    return (s, t, length, height)
+
+class SurfaceCoordinateCache():
+    '''
+    Keeps the arc lengths of faces by their geometry, see findGeometryKey. So retexturing an unchanged object,
+    e.g. when showing it again, does not evaluate its iso curves again. The nodes are always read from the current
+    triangulation, because a face keeps its geometry when it is meshed again with another deviation.
+    '''
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.arcLengths = OrderedDict()
+
+    def findFaceCoordinates(self, face):
+        key = findGeometryKey(face)
+
+        if key in self.arcLengths:
+            # Move the face to the end, so the least recently used faces are dropped first
+            self.arcLengths[key] = self.arcLengths.pop(key)
+        else:
+            self.arcLengths[key] = findArcLengths(face)
+
+            while len(self.arcLengths) > self.size:
+                self.arcLengths.popitem(last=False)
+
+        return calculateFaceCoordinates(face, self.arcLengths[key])
+
+    def clear(self):
+        self.arcLengths.clear()
+
+surfaceCoordinateCache = None
+
+def getSurfaceCoordinateCache():
+    global surfaceCoordinateCache
+
+    if surfaceCoordinateCache is None:
+        surfaceCoordinateCache = SurfaceCoordinateCache()
+
+    return surfaceCoordinateCache
+
+def findFacesCoordinates(faces, realSize, cache):
+    '''The texture coordinates of the nodes of all faces, one face after the other'''
+    sValues = []
+    tValues = []
+
+    for face in faces:
+        s, t, length, height = cache.findFaceCoordinates(face)
+
+        # Without a real size the texture is stretched to the face, like with the face mapping
+        scaleS = realSize['s'] if realSize is not None and realSize['s'] > 0 else max(length, 1e-12)
+        scaleT = realSize['t'] if realSize is not None and realSize['t'] > 0 else max(height, 1e-12)
+
+        sValues.append(s / scaleS)
+        tValues.append(t / scaleT)
+
+    return np.column_stack((np.concatenate(sValues), np.concatenate(tValues)))
+
+def calculateTextureCoordinates(o, vertexCoordinates, textureConfig):
+    '''
+    Calculates the texture coordinates from the surface parameters of the faces of the shape. FreeCAD writes the nodes
+    of the face triangulations one face after the other into the coordinates of the scene graph, so the nodes of every
+    face are a consecutive range of vertices. Returns None when the triangulation does not match the scene graph.
+    '''
+    faces = o.Shape.Faces
+
+    if len(faces) == 0 or not hasattr(faces[0], 'getUVNodes'):
+        FreeCAD.Console.PrintWarning('Surface mapping needs FreeCAD 0.20 or newer. Using face mapping for %s\n' % (o.Label, ))
+        return None
+
+    coordinates = findFacesCoordinates(faces, textureConfig['realSize'], getSurfaceCoordinateCache())
+
+    if len(coordinates) != vertexCoordinates.point.getNum():
+        FreeCAD.Console.PrintWarning('The triangulation of %s does not match its 3D view. Using face mapping\n' % (o.Label, ))
+        return None
+
+    textureCoords = coin.SoTextureCoordinate2()
+    textureCoords.point.setValues(0, len(coordinates), coordinates.tolist())
+
+    return textureCoords
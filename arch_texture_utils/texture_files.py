@@ -0,0 +1,92 @@
+import os
+import hashlib
+import FreeCAD
+
+PREFERENCES = 'User parameter:BaseApp/Preferences/Mod/ArchTextures'
+# Directories to look for textures with relative paths, separated by ';'
+SEARCH_PATHS_PARAMETER = 'TextureSearchPaths'
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def normalizePath(path):
+    '''Resolves symlinks, '..' and the case of the drive letter, so the same file always gets the same path'''
+    return os.path.normcase(os.path.realpath(os.path.abspath(path)))
+
+def findSearchRoots(document=None):
+    '''The directory of the document first, then the directories from the preferences'''
+    roots = []
+
+    if document is not None and document.FileName:
+        roots.append(os.path.dirname(document.FileName))
+
+    searchPaths = FreeCAD.ParamGet(PREFERENCES).GetString(SEARCH_PATHS_PARAMETER, '')
+    roots.extend(path.strip() for path in searchPaths.split(';') if path.strip() != '')
+
+    return [normalizePath(root) for root in roots]
+
+def resolveTextureFile(path, searchRoots=()):
+    '''Returns the normalized path of the texture file, or the path as it is, when the file can't be found'''
+    if path is None or path == '':
+        return path
+
+    path = os.path.expanduser(path)
+
+    if os.path.isabs(path):
+        return normalizePath(path) if os.path.isfile(path) else path
+
+    for root in searchRoots:
+        candidate = os.path.join(root, path)
+
+        if os.path.isfile(candidate):
+            return normalizePath(candidate)
+
+    return path
+
+class ContentHashCache():
+    '''
+    The hash of the content of every texture file. Copies of the same image in different folders get the same hash,
+    so their textures are only decoded once. A hash is calculated once and reused while size and mtime stay the same.
+    '''
+
+    def __init__(self):
+        self.hashes = {
+            # (<normalized_path>, <size>, <mtime>): '<content_hash>'
+        }
+
+    def contentHash(self, fileName):
+        stat = os.stat(fileName)
+        key = (fileName, stat.st_size, stat.st_mtime)
+
+        if key not in self.hashes:
+            contentHash = hashlib.sha1()
+
+            with open(fileName, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    contentHash.update(block)
+
+            self.hashes[key] = contentHash.hexdigest()
+
+        return self.hashes[key]
+
+    def forget(self, fileName):
+        '''The file changed. Entries of its previous versions are removed'''
+        for key in [key for key in self.hashes.keys() if key[0] == fileName]:
+            del self.hashes[key]
+
+contentHashCache = None
+
+def getContentHashCache():
+    '''The hashes are shared by all documents of the session'''
+    global contentHashCache
+
+    if contentHashCache is None:
+        contentHashCache = ContentHashCache()
+
+    return contentHashCache
+
+def textureKey(resolvedFile):
+    '''The key of a texture node. Files that don't exist are keyed by their path, so coin reports them as usual.'''
+    if resolvedFile is None or not os.path.isfile(resolvedFile):
+        return 'path:%s' % (resolvedFile, )
+
+    return 'sha1:%s' % (getContentHashCache().contentHash(resolvedFile), )
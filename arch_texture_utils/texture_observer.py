@@ -0,0 +1,74 @@
+import FreeCAD, FreeCADGui
+from arch_texture_utils.qtutils import QtCore
+
+# Changes to these properties invalidate the texture coordinates of an object
+OBJECT_PROPERTIES = ['Shape', 'Placement']
+VIEW_PROPERTIES = ['Visibility', 'Deviation', 'AngularDeflection']
+
+# Changes within this window are collected and processed together
+DEBOUNCE_INTERVAL = 250
+
+class TextureObserver():
+    '''
+    Observes textured objects and re-maps them when their geometry, placement, visibility or tessellation changes.
+    Recomputing an object triggers a burst of property changes. So changed objects are collected and re-mapped
+    together once no further change arrived for DEBOUNCE_INTERVAL milliseconds.
+    '''
+
+    def __init__(self, textureManager):
+        self.textureManager = textureManager
+        self.pendingObjects = set()
+
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_INTERVAL)
+        self.timer.timeout.connect(self.retexturePendingObjects)
+
+        self.guiObserver = ViewObjectObserver(self)
+
+    def start(self):
+        FreeCAD.addDocumentObserver(self)
+        FreeCADGui.addDocumentObserver(self.guiObserver)
+
+    def stop(self):
+        self.timer.stop()
+        self.pendingObjects.clear()
+
+        FreeCAD.removeDocumentObserver(self)
+        FreeCADGui.removeDocumentObserver(self.guiObserver)
+
+    def objectChanged(self, o):
+        if o.Document != self.textureManager.document:
+            return
+
+        if not self.textureManager.isObserved(o):
+            return
+
+        self.pendingObjects.add(o.Name)
+
+        # restart the timer so a burst of changes is handled at once
+        self.timer.start()
+
+    def retexturePendingObjects(self):
+        objectNames = sorted(self.pendingObjects)
+        self.pendingObjects.clear()
+
+        self.textureManager.retextureObjects(objectNames)
+
+    def slotChangedObject(self, o, prop):
+        if prop in OBJECT_PROPERTIES:
+            self.objectChanged(o)
+
+    def slotDeletedObject(self, o):
+        self.pendingObjects.discard(o.Name)
+        self.textureManager.forgetObject(o.Name)
+
+class ViewObjectObserver():
+    '''Gui document observer that forwards view property changes to the TextureObserver'''
+
+    def __init__(self, textureObserver):
+        self.textureObserver = textureObserver
+
+    def slotChangedObject(self, vobj, prop):
+        if prop in VIEW_PROPERTIES:
+            self.textureObserver.objectChanged(vobj.Object)
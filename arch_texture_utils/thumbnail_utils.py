@@ -0,0 +1,118 @@
+import os
+from arch_texture_utils.cache_utils import cacheRoot, fileCacheKey
+from arch_texture_utils.qtutils import QtCore, QtGui
+
+THUMBNAIL_SIZE = 40
+
+def loadThumbnail(imageFile, size=THUMBNAIL_SIZE):
+    '''
+    Returns a small version of the image. Thumbnails are stored in the cache directory, so every image is decoded
+    only once. Safe to call from a worker thread, as only QImage is used.
+    '''
+    if not os.path.isfile(imageFile):
+        return QtGui.QImage()
+
+    cacheFile = os.path.join(cacheRoot('thumbnails'), fileCacheKey(imageFile, size) + '.png')
+
+    if os.path.exists(cacheFile):
+        return QtGui.QImage(cacheFile)
+
+    reader = QtGui.QImageReader(imageFile)
+    imageSize = reader.size()
+
+    if imageSize.isValid():
+        # Readers supporting scaled decoding, like jpeg, never decode the full image
+        reader.setScaledSize(imageSize.scaled(size, size, QtCore.Qt.KeepAspectRatio))
+
+    image = reader.read()
+
+    if image.isNull():
+        return image
+
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    cacheDirectory = os.path.dirname(cacheFile)
+
+    if not os.path.isdir(cacheDirectory):
+        os.makedirs(cacheDirectory)
+
+    image.save(cacheFile)
+
+    return image
+
+class ThumbnailSignals(QtCore.QObject):
+    loaded = QtCore.Signal(str, QtGui.QImage)
+
+class ThumbnailLoader(QtCore.QRunnable):
+    def __init__(self, imageFile, signals):
+        super(ThumbnailLoader, self).__init__()
+
+        self.imageFile = imageFile
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = loadThumbnail(self.imageFile)
+        except Exception:
+            image = QtGui.QImage()
+
+        self.signals.loaded.emit(self.imageFile, image)
+
+class ThumbnailStore(QtCore.QObject):
+    '''
+    Keeps the thumbnails of texture files in memory. Missing thumbnails are decoded in a worker thread.
+    thumbnailLoaded is emitted in the GUI thread once a thumbnail is available.
+    '''
+    thumbnailLoaded = QtCore.Signal(str)
+
+    def __init__(self):
+        super(ThumbnailStore, self).__init__()
+
+        self.thumbnails = {
+            # '<image_file>': QPixmap or None when the file is not an image
+        }
+        self.pending = set()
+
+        self.signals = ThumbnailSignals()
+        self.signals.loaded.connect(self.thumbnailDecoded)
+
+        self.threadPool = QtCore.QThreadPool()
+        self.threadPool.setMaxThreadCount(2)
+
+    def thumbnail(self, imageFile):
+        '''Returns the thumbnail or None, when it is not loaded yet'''
+        if imageFile is None or imageFile == '':
+            return None
+
+        if imageFile in self.thumbnails:
+            return self.thumbnails[imageFile]
+
+        if imageFile not in self.pending:
+            self.pending.add(imageFile)
+            self.threadPool.start(ThumbnailLoader(imageFile, self.signals))
+
+        return None
+
+    def thumbnailDecoded(self, imageFile, image):
+        self.pending.discard(imageFile)
+
+        # Pixmaps may only be created in the GUI thread
+        self.thumbnails[imageFile] = None if image.isNull() else QtGui.QPixmap.fromImage(image)
+
+        self.thumbnailLoaded.emit(imageFile)
+
+    def forget(self, imageFile):
+        '''The file was changed, so its thumbnail has to be loaded again'''
+        self.thumbnails.pop(imageFile, None)
+
+thumbnailStore = None
+
+def getThumbnailStore():
+    '''The store is shared, so reopening a panel shows the thumbnails right away'''
+    global thumbnailStore
+
+    if thumbnailStore is None:
+        thumbnailStore = ThumbnailStore()
+
+    return thumbnailStore
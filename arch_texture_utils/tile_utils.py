@@ -0,0 +1,246 @@
+import os
+import json
+import math
+import FreeCAD
+from arch_texture_utils.cache_utils import cacheRoot, fileCacheKey
+from arch_texture_utils.qtutils import QtCore, QtGui
+
+DEFAULT_TILE_SIZE = 2048
+PROXY_SIZE = 128
+MANIFEST_FILE = 'tiles.json'
+
+class TileGrid():
+    '''
+    A large image split into tiles of at most tileSize x tileSize pixels.
+    Every tile is stored at full resolution and as low resolution proxy in the cache directory.
+    Row 0 is the top row of the image.
+    '''
+
+    def __init__(self, directory, width, height, tileSize):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.tileSize = tileSize
+
+        self.columns = int(math.ceil(width / tileSize))
+        self.rows = int(math.ceil(height / tileSize))
+
+    def tiles(self):
+        for row in range(self.rows):
+            for column in range(self.columns):
+                yield (row, column)
+
+    def tileRect(self, row, column):
+        x = column * self.tileSize
+        y = row * self.tileSize
+
+        return QtCore.QRect(x, y, min(self.tileSize, self.width - x), min(self.tileSize, self.height - y))
+
+    def bandRect(self, row):
+        '''All tiles of one row'''
+        y = row * self.tileSize
+
+        return QtCore.QRect(0, y, self.width, min(self.tileSize, self.height - y))
+
+    def tileFile(self, row, column):
+        return os.path.join(self.directory, 'tile_%s_%s.png' % (row, column))
+
+    def proxyFile(self, row, column):
+        return os.path.join(self.directory, 'proxy_%s_%s.png' % (row, column))
+
+    def uRange(self, column):
+        '''The range of the texture coordinate s covered by the tiles in this column'''
+        x = column * self.tileSize
+
+        return (x / self.width, min(x + self.tileSize, self.width) / self.width)
+
+    def vRange(self, row):
+        '''The range of the texture coordinate t covered by the tiles in this row. t starts at the bottom of the image.'''
+        y = row * self.tileSize
+
+        return (1 - min(y + self.tileSize, self.height) / self.height, 1 - y / self.height)
+
+def cacheDirectory(imageFile, tileSize):
+    '''The cache directory changes whenever the image file or the tile size changes'''
+    return os.path.join(cacheRoot('tiles'), fileCacheKey(imageFile, tileSize))
+
+def readTileGrid(directory):
+    '''Returns the grid of an image split before, or None'''
+    manifestFile = os.path.join(directory, MANIFEST_FILE)
+
+    if not os.path.exists(manifestFile):
+        return None
+
+    with open(manifestFile, 'r') as manifest:
+        data = json.load(manifest)
+
+    return TileGrid(directory, data['width'], data['height'], data['tileSize'])
+
+def loadTileGrid(imageFile, tileSize=DEFAULT_TILE_SIZE):
+    '''
+    Returns the tile grid of the image. The image is split only once, later calls use the cached tiles.
+    Splitting blocks the calling thread, see TileSplitter for the 3D view.
+    '''
+    directory = cacheDirectory(imageFile, tileSize)
+    grid = readTileGrid(directory)
+
+    if grid is not None:
+        return grid
+
+    FreeCAD.Console.PrintMessage('Splitting %s into tiles\n' % (imageFile, ))
+
+    return splitImage(imageFile, tileSize, directory)
+
+def createReader(imageFile):
+    reader = QtGui.QImageReader(imageFile)
+
+    if not reader.canRead():
+        raise ValueError('Unable to read image %s: %s' % (imageFile, reader.errorString()))
+
+    return reader
+
+def readImage(reader, imageFile, clipRect):
+    '''
+    Decodes the clip rect of the image. Qt 5.15 and newer refuse images above an allocation limit, 256 MB by default.
+    The limit is raised to the memory the clip rect needs, so the error below names the real cause.
+    '''
+    megabytes = int(math.ceil(clipRect.width() * clipRect.height() * 4 / (1024.0 * 1024.0)))
+
+    if hasattr(reader, 'setAllocationLimit'):
+        reader.setAllocationLimit(max(reader.allocationLimit(), megabytes + 1))
+
+    reader.setClipRect(clipRect)
+    image = reader.read()
+
+    if image.isNull():
+        raise ValueError('Unable to read %s x %s pixels of image %s, about %s MB: %s' %
+                         (clipRect.width(), clipRect.height(), imageFile, megabytes, reader.errorString()))
+
+    return image
+
+def iterImageBands(imageFile, grid):
+    '''
+    Yields (row, band), one band of the image per row of tiles. Formats that can clip while decoding, like jpeg,
+    only hold one band in memory. All other formats are decoded once as a whole and the bands are copied from it.
+    '''
+    reader = createReader(imageFile)
+
+    if not reader.supportsOption(QtGui.QImageIOHandler.ClipRect):
+        image = readImage(reader, imageFile, QtCore.QRect(0, 0, grid.width, grid.height))
+
+        for row in range(grid.rows):
+            yield (row, image.copy(grid.bandRect(row)))
+
+        return
+
+    for row in range(grid.rows):
+        # A reader can only read once
+        yield (row, readImage(createReader(imageFile), imageFile, grid.bandRect(row)))
+
+def splitImage(imageFile, tileSize, directory):
+    '''
+    Splits the image into tiles. The image is decoded in bands of one row of tiles, see iterImageBands, and the
+    tiles are cut from the bands. Safe to call from a worker thread, as only QImage is used.
+    '''
+    size = createReader(imageFile).size()
+
+    if not size.isValid():
+        raise ValueError('Unable to read the size of image %s' % (imageFile, ))
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    grid = TileGrid(directory, size.width(), size.height(), tileSize)
+
+    for row, band in iterImageBands(imageFile, grid):
+        for column in range(grid.columns):
+            rect = grid.tileRect(row, column)
+            tile = band.copy(QtCore.QRect(rect.x(), 0, rect.width(), rect.height()))
+
+            tile.save(grid.tileFile(row, column))
+
+            proxy = tile.scaled(PROXY_SIZE, PROXY_SIZE, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+            proxy.save(grid.proxyFile(row, column))
+
+    # The manifest is written last. So an interrupted split is simply repeated
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as manifest:
+        json.dump({
+            'width': grid.width,
+            'height': grid.height,
+            'tileSize': tileSize
+        }, manifest)
+
+    return grid
+
+class TileSignals(QtCore.QObject):
+    # The cache directory of the image and the error message, which is empty when the tiles are ready
+    finished = QtCore.Signal(str, str)
+
+class SplitTask(QtCore.QRunnable):
+    def __init__(self, imageFile, tileSize, directory, signals):
+        super(SplitTask, self).__init__()
+
+        self.imageFile = imageFile
+        self.tileSize = tileSize
+        self.directory = directory
+        self.signals = signals
+
+    def run(self):
+        error = ''
+
+        try:
+            splitImage(self.imageFile, self.tileSize, self.directory)
+        except Exception as e:
+            error = str(e) or repr(e)
+
+        self.signals.finished.emit(self.directory, error)
+
+class TileSplitter(QtCore.QObject):
+    '''
+    Splits images into tiles in a worker thread, so splitting a large panorama does not block the 3D view.
+    tilesReady is emitted in the GUI thread once an image is split.
+    '''
+    tilesReady = QtCore.Signal()
+
+    def __init__(self):
+        super(TileSplitter, self).__init__()
+
+        self.pending = set()
+        self.errors = {
+            # '<cache_directory>': '<error_message>'
+        }
+
+        self.signals = TileSignals()
+        self.signals.finished.connect(self.splitFinished)
+
+        # One image at a time, a split may hold a full decoded image in memory
+        self.threadPool = QtCore.QThreadPool()
+        self.threadPool.setMaxThreadCount(1)
+
+    def findTileGrid(self, imageFile, tileSize):
+        '''Returns the tile grid, or None while the image is split. Raises ValueError when splitting failed.'''
+        directory = cacheDirectory(imageFile, tileSize)
+
+        if directory in self.errors:
+            raise ValueError(self.errors[directory])
+
+        grid = readTileGrid(directory)
+
+        if grid is not None:
+            return grid
+
+        if directory not in self.pending:
+            FreeCAD.Console.PrintMessage('Splitting %s into tiles\n' % (imageFile, ))
+
+            self.pending.add(directory)
+            self.threadPool.start(SplitTask(imageFile, tileSize, directory, self.signals))
+
+        return None
+
+    def splitFinished(self, directory, error):
+        self.pending.discard(directory)
+
+        if error != '':
+            self.errors[directory] = error
+
+        self.tilesReady.emit()
@@ -0,0 +1,211 @@
+import math
+import numpy as np
+from pivy import coin
+
+import arch_texture_utils.render_utils as render_utils
+from arch_texture_utils.png_utils import PngStreamWriter
+
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_OVERLAP = 16
+
+class ExportCancelled(Exception):
+    pass
+
+def blendWeights(start, end, coreStart, coreEnd, size, overlap):
+    '''
+    Returns the blend weights for the pixels between start and end. Inside the overlap with a neighbour tile the
+    weight ramps linearly. The ramps of two neighbours add up to 1, so blended pixels need no normalization.
+    '''
+    positions = np.arange(start, end, dtype=np.float32) + 0.5
+    weights = np.ones(end - start, dtype=np.float32)
+
+    if overlap == 0:
+        return weights
+
+    if coreStart > 0:
+        weights = np.minimum(weights, (positions - (coreStart - overlap)) / (2 * overlap))
+
+    if coreEnd < size:
+        weights = np.minimum(weights, ((coreEnd + overlap) - positions) / (2 * overlap))
+
+    return np.clip(weights, 0, 1)
+
+class TiledImageRenderer():
+    '''
+    Renders an image of width x height pixels as grid of tiles and streams the result row by row into a writer.
+    Only one band of tiles is held in memory. Neighbouring tiles overlap by overlap pixels on each side
+    and are blended linearly inside the overlap, so no seams are visible.
+
+    renderTile(x0, y0, x1, y1) has to return a uint8 array with the shape (y1 - y0, x1 - x0, 3), starting with the top row.
+    progress(renderedTiles, tileCount) is called after every tile. When it returns False, ExportCancelled is raised.
+    '''
+
+    def __init__(self, width, height, renderTile, tileSize=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+        if overlap * 2 >= tileSize:
+            raise ValueError('The overlap has to be less than half of the tile size')
+
+        self.width = width
+        self.height = height
+        self.renderTile = renderTile
+        self.tileSize = tileSize
+        self.overlap = overlap
+
+    def expand(self, coreStart, coreEnd, size):
+        return (max(0, coreStart - self.overlap), min(size, coreEnd + self.overlap))
+
+    def render(self, writer, progress=None):
+        width = self.width
+        height = self.height
+
+        tileCount = int(math.ceil(width / float(self.tileSize))) * int(math.ceil(height / float(self.tileSize)))
+        renderedTiles = 0
+
+        # accumulated rows that are not complete yet, starting at image row accumulatedStart
+        accumulated = np.zeros((0, width, 3), dtype=np.float32)
+        accumulatedStart = 0
+
+        for coreY0 in range(0, height, self.tileSize):
+            coreY1 = min(coreY0 + self.tileSize, height)
+            y0, y1 = self.expand(coreY0, coreY1, height)
+
+            band = np.zeros((y1 - accumulatedStart, width, 3), dtype=np.float32)
+            band[:accumulated.shape[0]] = accumulated
+
+            yWeights = blendWeights(y0, y1, coreY0, coreY1, height, self.overlap)
+
+            for coreX0 in range(0, width, self.tileSize):
+                coreX1 = min(coreX0 + self.tileSize, width)
+                x0, x1 = self.expand(coreX0, coreX1, width)
+
+                xWeights = blendWeights(x0, x1, coreX0, coreX1, width, self.overlap)
+                weights = yWeights[:, np.newaxis, np.newaxis] * xWeights[np.newaxis, :, np.newaxis]
+
+                tile = self.renderTile(x0, y0, x1, y1)
+                band[y0 - accumulatedStart:y1 - accumulatedStart, x0:x1] += tile * weights
+
+                renderedTiles += 1
+
+                if progress is not None and not progress(renderedTiles, tileCount):
+                    raise ExportCancelled()
+
+            # The rows overlapping with the next band are kept until it is rendered
+            completeEnd = height if coreY1 == height else coreY1 - self.overlap
+            completeRows = completeEnd - accumulatedStart
+
+            for row in np.clip(np.rint(band[:completeRows]), 0, 255).astype(np.uint8):
+                writer.writeRow(row.tobytes())
+
+            accumulated = band[completeRows:]
+            accumulatedStart = completeEnd
+
+class CoinTileRenderer():
+    '''Renders sub frustums of a camera with the offscreen renderer. Every tile sees exactly its part of the full image.'''
+
+    def __init__(self, sceneGraph, camera, width, height, background=(1.0, 1.0, 1.0)):
+        self.width = width
+        self.height = height
+        self.camera = camera
+        self.isPerspective = camera.isOfType(coin.SoPerspectiveCamera.getClassTypeId())
+
+        self.root = coin.SoSeparator()
+        self.root.ref()
+
+        # The head light shines in view direction like in the 3D View. The light is not below the camera,
+        # so its direction is in world space
+        headlight = coin.SoDirectionalLight()
+        headlight.direction.setValue(camera.orientation.getValue().multVec(coin.SbVec3f(0, 0, -1)))
+
+        self.root.addChild(headlight)
+        self.cameraGroup = coin.SoGroup()
+        self.root.addChild(self.cameraGroup)
+        self.root.addChild(sceneGraph)
+
+        self.renderer = render_utils.createRenderer(width, height, background)
+        self.halfWidth, self.halfHeight = self.calculateImagePlane()
+
+    def calculateImagePlane(self):
+        '''Returns half of the width and height of the full image, at the near plane for perspective cameras'''
+        aspect = self.width / self.height
+
+        if self.isPerspective:
+            halfSize = self.camera.nearDistance.getValue() * math.tan(self.camera.heightAngle.getValue() / 2)
+        else:
+            halfSize = self.camera.height.getValue() / 2
+
+        # Like Coin, the field of view applies to the shorter side of the image
+        if aspect >= 1:
+            return (halfSize * aspect, halfSize)
+
+        return (halfSize, halfSize / aspect)
+
+    def toImagePlane(self, x, y):
+        return (-self.halfWidth + 2 * self.halfWidth * x / self.width, self.halfHeight - 2 * self.halfHeight * y / self.height)
+
+    def createTileCamera(self, x0, y0, x1, y1):
+        left, top = self.toImagePlane(x0, y0)
+        right, bottom = self.toImagePlane(x1, y1)
+
+        if self.isPerspective:
+            camera = coin.SoFrustumCamera()
+            camera.left.setValue(left)
+            camera.right.setValue(right)
+            camera.top.setValue(top)
+            camera.bottom.setValue(bottom)
+            camera.position.setValue(self.camera.position.getValue())
+        else:
+            camera = coin.SoOrthographicCamera()
+            camera.height.setValue(top - bottom)
+            camera.aspectRatio.setValue((right - left) / (top - bottom))
+
+            orientation = self.camera.orientation.getValue()
+            offset = orientation.multVec(coin.SbVec3f((left + right) / 2, (top + bottom) / 2, 0))
+            camera.position.setValue(self.camera.position.getValue() + offset)
+
+        camera.orientation.setValue(self.camera.orientation.getValue())
+        camera.nearDistance.setValue(self.camera.nearDistance.getValue())
+        camera.farDistance.setValue(self.camera.farDistance.getValue())
+        camera.viewportMapping.setValue(coin.SoCamera.LEAVE_ALONE)
+
+        return camera
+
+    def __call__(self, x0, y0, x1, y1):
+        width = x1 - x0
+        height = y1 - y0
+
+        self.cameraGroup.removeAllChildren()
+        self.cameraGroup.addChild(self.createTileCamera(x0, y0, x1, y1))
+
+        self.renderer.setViewportRegion(coin.SbViewportRegion(width, height))
+
+        if not self.renderer.render(self.root):
+            raise RuntimeError('Offscreen rendering failed for tile %s/%s' % (x0, y0))
+
+        # OpenGL starts with the bottom row
+        pixels = np.frombuffer(self.renderer.getBuffer(), dtype=np.uint8).reshape(height, width, 3)
+
+        return pixels[::-1]
+
+    def close(self):
+        self.root.unref()
+
+def exportTiledImage(sceneGraph, camera, fileName, width, height, tileSize=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP, background=(1.0, 1.0, 1.0), progress=None):
+    '''
+    Renders the scene as seen by the camera into a PNG file. Memory usage depends on width and tile size only.
+    See TiledImageRenderer for progress. A cancelled export leaves no file behind.
+    '''
+    maximumWidth, maximumHeight = coin.SoOffscreenRenderer.getMaximumResolution().getValue()
+    tileSize = min(tileSize, maximumWidth - 2 * overlap, maximumHeight - 2 * overlap)
+
+    tileRenderer = CoinTileRenderer(sceneGraph, camera, width, height, background)
+    writer = PngStreamWriter(fileName, width, height)
+
+    try:
+        TiledImageRenderer(width, height, tileRenderer, tileSize, overlap).render(writer, progress)
+    except:
+        writer.abort()
+        raise
+    else:
+        writer.close()
+    finally:
+        tileRenderer.close()
+
@@ -1,5 +1,51 @@
 from collections import OrderedDict
+import importlib
+import sys
 import FreeCAD, FreeCADGui
+from arch_texture_utils.resource_utils import iconPath
+
+# Milliseconds importing this module may take before a warning is printed
+STARTUP_BUDGET = 50
+
+class LazyCommand:
+    '''
+    A command declared by its metadata only. The module implementing the command pulls in pivy, Qt and most of the
+    texturing code, so it is imported when the command is activated for the first time, not when the workbench loads.
+    '''
+
+    def __init__(self, toolbarName, commandName, moduleName, className, menuText, toolTip, icon):
+        self.toolbarName = toolbarName
+        self.commandName = commandName
+        self.moduleName = moduleName
+        self.className = className
+        self.menuText = menuText
+        self.toolTip = toolTip
+        self.icon = icon
+
+        self.command = None
+
+    def GetResources(self):
+        return {'MenuText': self.menuText,
+                'ToolTip' : self.toolTip,
+                'Pixmap': iconPath(self.icon)
+                }
+
+    def loadCommand(self):
+        if self.command is None:
+            module = importlib.import_module(self.moduleName)
+            self.command = getattr(module, self.className)()
+
+        return self.command
+
+    def Activated(self):
+        self.loadCommand().Activated()
+
+    def IsActive(self):
+        # IsActive is polled by the GUI all the time. So the command is only asked after it has been loaded
+        if self.command is None:
+            return not FreeCAD.ActiveDocument is None
+
+        return self.command.IsActive()
 
 class ArchTextureToolbarManager:
     Toolbars =  OrderedDict()
@@ -8,12 +54,33 @@ class ArchTextureToolbarManager:
         FreeCADGui.addCommand(command.commandName, command)
         self.Toolbars.setdefault(command.toolbarName, []).append(command)
 
+    def commandModules(self):
+        return sorted(set(command.moduleName for commands in self.Toolbars.values() for command in commands))
+
+    def loadedCommandModules(self):
+        '''The command modules that are already imported. Right after startup this should be empty.'''
+        return [moduleName for moduleName in self.commandModules() if moduleName in sys.modules]
+
 toolbarManager = ArchTextureToolbarManager()
 
-# import commands here
-import create_config
-import at_export_config
-import at_import_config
-import at_configure_faces
-import at_create_environment_config
-import create_light
\ No newline at end of file
+# register commands here
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Tools', 'Create_Config', 'create_config', 'CreateTextureConfigCommand',
+    "Create Texture Config", "Create a new TextureConfig object to store Textures", 'CreateConfig.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Tools', 'Export_Config', 'at_export_config', 'ExportTextureConfigCommand',
+    "Export Texture Config", "Exports the configuration stored inside a TextureConfig object to a file", 'ExportConfig.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Tools', 'Import_Config', 'at_import_config', 'ImportTextureConfigCommand',
+    "Import Texture Config", "Import a new TextureConfig object from a JSOn File", 'ImportConfig.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Tools', 'Configure_Faces', 'at_configure_faces', 'ConfigureFacesCommand',
+    "Configure Faces", "Override default mapping parameters for individual faces", 'ConfigureFaces.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Tools', 'Merge_Faces', 'at_merge_faces', 'MergeFacesCommand',
+    "Merge Faces", "Merge the selected faces into new objects that can get their own material", 'MergeFaces.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Tools', 'Extract_Faces', 'at_extract_faces', 'ExtractFacesCommand',
+    "Extract Faces", "Copy the selected faces into one object per material", 'ExtractFaces.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Environment_Tools', 'Create_Environment_Config', 'at_create_environment_config', 'CreateEnvironmentConfigCommand',
+    "Create Environment Config", "Create a new EnvironmentConfig object to store environment textures", 'CreateEnvironmentConfig.svg'))
+toolbarManager.registerCommand(LazyCommand('Light_Tools', 'Create_PointLight', 'create_light', 'CreatePointLightCommand',
+    "Create Pointlight", "Create a new point light in the scene", 'CreatePointLight.svg'))
+toolbarManager.registerCommand(LazyCommand('Light_Tools', 'Create_DirectionalLight', 'create_light', 'CreateDirectionalLightCommand',
+    "Create Directionallight", "Create a new Directional light in the scene", 'CreateDirectionalLight.svg'))
+toolbarManager.registerCommand(LazyCommand('ArchTexture_Environment_Tools', 'Export_Tiled_Image', 'at_export_image', 'ExportTiledImageCommand',
+    "Export High Resolution Image", "Render the current view in tiles and export it as image of any size", 'ExportImage.svg'))
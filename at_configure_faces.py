@@ -1,35 +1,118 @@
 import FreeCAD, FreeCADGui
 
-from arch_texture_utils.resource_utils import iconPath, uiPath
+from arch_texture_utils.resource_utils import uiPath
 import arch_texture_utils.qtutils as qtutils
-from arch_texture_utils.selection_utils import findSelectedTextureConfig, findSelectedFacesAsVectors
+from arch_texture_utils.selection_utils import findSelectedTextureConfig, findSelectedFacesWithIndices
 from arch_texture_utils.faceset_utils import vectorListEquals
+from arch_texture_utils.extract_utils import findSourceFace, resolveSourceFace
 
 class FaceConfigPanel():
     def __init__(self, textureConfig, freecadObject):
         self.textureConfig = textureConfig
         self.freecadObject = freecadObject
-        self.faceOverrides = textureConfig.textureManager.ensureFaceOverrides()
+        self.textureManager = textureConfig.textureManager
+        self.faceOverrides = self.textureManager.ensureFaceOverrides()
+
+        self.previewedFaces = {
+            # '<object_name>': set([<face_index>])
+        }
 
         self.form = FreeCADGui.PySideUic.loadUi(uiPath('face_config.ui'))
         self.rotationBox = self.form.RotationBox
+        self.livePreviewBox = self.form.LivePreviewBox
 
         self.form.ApplyButton.clicked.connect(self.apply)
+        self.rotationBox.valueChanged.connect(self.preview)
 
     def apply(self):
-        selectedFaces = findSelectedFacesAsVectors()
+        selectedFaces = findSelectedFacesWithIndices()
 
         if len(selectedFaces) == 0:
             qtutils.showInfo("No Face selected", "Select at least one face to apply the configuration")
+
+            return
+
+        changedFaces = self.previewedFaces
+        self.previewedFaces = {}
+
+        for objectName, faceIndex, vectors in selectedFaces + self.findSourceFaces(selectedFaces):
+            faceOverride = self.ensureOverrideForFace(objectName, vectors)
+
+            faceOverride['rotation'] = self.rotationBox.value()
+
+            changedFaces.setdefault(objectName, set()).add(faceIndex)
+
+        self.textureManager.markChanged(faceOverrides=True)
+        self.updateFaces(changedFaces)
+
+    def findSourceFaces(self, selectedFaces):
+        '''The faces extracted faces were copied from. They get the same override, so it is kept with the source face.'''
+        document = self.freecadObject.Document
+        sourceFaces = []
+
+        for objectName, faceIndex, vectors in selectedFaces:
+            if faceIndex is None:
+                continue
+
+            name = findSourceFace(document.getObject(objectName), faceIndex)
+            sourceFace = resolveSourceFace(document, name) if name is not None else None
+
+            if sourceFace is not None:
+                sourceFaces.append(sourceFace)
+
+        return sourceFaces
+
+    def preview(self, value):
+        '''Shows the rotation on the selected faces without storing it. Only the selected faces are recalculated.'''
+        if not self.livePreviewBox.isChecked():
+            return
+
+        previewOverrides = []
+        previewFaces = {}
+
+        for objectName, faceIndex, vectors in findSelectedFacesWithIndices():
+            if faceIndex is None:
+                continue
+
+            # Overrides are matched in order. So the preview overrides win over the stored ones
+            previewOverrides.append({
+                'vertices': vectors,
+                'objectName': objectName,
+                'rotation': value
+            })
+
+            previewFaces.setdefault(objectName, set()).add(faceIndex)
+
+        for objectName, faceIndices in previewFaces.items():
+            if self.textureManager.updateFaces(objectName, faceIndices, previewOverrides + self.faceOverrides):
+                self.previewedFaces.setdefault(objectName, set()).update(faceIndices)
+
+    def updateFaces(self, facesByObject):
+        '''
+        Recalculates the given faces with the stored overrides. Objects that are not textured yet or faces
+        that can't be located in the scene graph fall back to retexturing the whole object.
+        '''
+        retextureObjectNames = []
+
+        for objectName, faceIndices in facesByObject.items():
+            if None in faceIndices or not self.textureManager.updateFaces(objectName, faceIndices):
+                retextureObjectNames.append(objectName)
+
+        if len(retextureObjectNames) == 0 or not self.textureConfig.showTextures:
+            return
+
+        if self.textureManager.document is None:
+            self.textureConfig.execute(self.freecadObject)
         else:
-            for objectName, vectors in selectedFaces:
-                faceOverride = self.ensureOverrideForFace(objectName, vectors)
-                
-                faceOverride['rotation'] = self.rotationBox.value()
-        
-        self.textureConfig.execute(self.freecadObject)
+            self.textureManager.retextureObjects(retextureObjectNames)
     
     def reject(self):
+        # Remove the previews that were not applied
+        previewedFaces = self.previewedFaces
+        self.previewedFaces = {}
+
+        self.updateFaces(previewedFaces)
+
         FreeCADGui.Control.closeDialog()
     
     def getStandardButtons(self):
@@ -55,15 +138,6 @@ class FaceConfigPanel():
         return existingOverride
 
 class ConfigureFacesCommand:
-    toolbarName = 'ArchTexture_Tools'
-    commandName = 'Configure_Faces'
-
-    def GetResources(self):
-        return {'MenuText': "Configure Faces",
-                'ToolTip' : "Override default mapping parameters for individual faces",
-                'Pixmap': iconPath('ConfigureFaces.svg')
-                }
-
     def Activated(self):
         textureConfig = findSelectedTextureConfig(returnFreeCadObject=True)
 
@@ -86,6 +160,3 @@ if __name__ == "__main__":
         command.Activated()
     else:
         qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(ConfigureFacesCommand()) 
\ No newline at end of file
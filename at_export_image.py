@@ -0,0 +1,63 @@
+import FreeCAD, FreeCADGui
+
+import arch_texture_utils.qtutils as qtutils
+from arch_texture_utils.tiled_render_utils import exportTiledImage, ExportCancelled
+
+class ExportTiledImageCommand:
+    def Activated(self):
+        view = FreeCADGui.ActiveDocument.ActiveView
+
+        if not hasattr(view, 'getCameraNode'):
+            qtutils.showInfo("No 3D View", "Activate a 3D View to export an image")
+
+            return
+
+        viewWidth, viewHeight = view.getSize()
+
+        width = qtutils.userInputInteger('Image Size', 'Width in pixels', 16000, 1, 1000000)
+
+        if width is None:
+            return
+
+        height = qtutils.userInputInteger('Image Size', 'Height in pixels', int(width * viewHeight / viewWidth), 1, 1000000)
+
+        if height is None:
+            return
+
+        fileName = qtutils.userSelectedFile('Export Location', qtutils.PNG_FILES, False)
+
+        if fileName is None:
+            return
+
+        progressDialog = qtutils.QtWidgets.QProgressDialog('Rendering %s' % (fileName, ), 'Cancel', 0, 1, qtutils.activeWindow())
+        progressDialog.setWindowTitle('Export Image')
+        progressDialog.setWindowModality(qtutils.QtCore.Qt.WindowModal)
+        progressDialog.setMinimumDuration(0)
+
+        def progress(renderedTiles, tileCount):
+            progressDialog.setMaximum(tileCount)
+            progressDialog.setValue(renderedTiles)
+
+            # Keeps the dialog responsive, so the export can be cancelled between tiles
+            qtutils.QtWidgets.QApplication.processEvents()
+
+            return not progressDialog.wasCanceled()
+
+        try:
+            exportTiledImage(view.getSceneGraph(), view.getCameraNode(), fileName, width, height, progress=progress)
+        except ExportCancelled:
+            FreeCAD.Console.PrintMessage('Export of %s cancelled\n' % (fileName, ))
+        finally:
+            progressDialog.close()
+
+    def IsActive(self):
+        """If there is no active document we can't do anything."""
+        return not FreeCAD.ActiveDocument is None
+
+if __name__ == "__main__":
+    command = ExportTiledImageCommand();
+
+    if command.IsActive():
+        command.Activated()
+    else:
+        qtutils.showInfo("No open Document", "There is no open document")
@@ -0,0 +1,35 @@
+import FreeCAD, FreeCADGui
+
+import arch_texture_utils.qtutils as qtutils
+from arch_texture_utils.selection_utils import findSelectedFacesWithNames
+from arch_texture_utils.extract_utils import extractFaces
+
+class ExtractFacesCommand:
+    def Activated(self):
+        selectedFaces = findSelectedFacesWithNames()
+
+        if len(selectedFaces) == 0:
+            qtutils.showInfo("No faces selected", "Select the faces you want to extract")
+
+            return
+
+        document = FreeCAD.ActiveDocument
+
+        document.openTransaction('Extract Faces')
+        extractFaces(document, selectedFaces)
+        document.commitTransaction()
+
+        # One recompute for all faces, no matter how many are extracted
+        document.recompute()
+
+    def IsActive(self):
+        """If there is no active document we can't do anything."""
+        return not FreeCAD.ActiveDocument is None
+
+if __name__ == "__main__":
+    command = ExtractFacesCommand()
+
+    if command.IsActive():
+        command.Activated()
+    else:
+        qtutils.showInfo("No open Document", "There is no open document")
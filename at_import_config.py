@@ -1,24 +1,20 @@
 import FreeCAD, FreeCADGui
 
 import texture_config
-from arch_texture_utils.resource_utils import iconPath
 import arch_texture_utils.qtutils as qtutils
 
 class ImportTextureConfigCommand:
-    toolbarName = 'ArchTexture_Tools'
-    commandName = 'Import_Config'
-
-    def GetResources(self):
-        return {'MenuText': "Import Texture Config",
-                'ToolTip' : "Import a new TextureConfig object from a JSOn File",
-                'Pixmap': iconPath('ImportConfig.svg')
-                }
-
     def Activated(self):
         selectedFile = qtutils.userSelectedFile('Config File', qtutils.JSON_FILES)
 
         if selectedFile is None:
             return
+
+        if qtutils.userConfirmed('Link Config', 'Link the config file instead of copying it into the document?\n\n'
+                                 'Linked materials are read from the file, so changes of the file are used by all documents linking it.'):
+            texture_config.createTextureConfig(linkedConfigFile=selectedFile)
+
+            return
         
         fileObject = open(selectedFile, 'r')
 
@@ -35,6 +31,3 @@ if __name__ == "__main__":
         command.Activated()
     else:
         qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(ImportTextureConfigCommand()) 
\ No newline at end of file
@@ -0,0 +1,69 @@
+import FreeCAD, FreeCADGui
+
+import arch_texture_utils.qtutils as qtutils
+from arch_texture_utils.selection_utils import findSelectedFaces
+from arch_texture_utils.face_merge_utils import groupCoplanarFaces, mergeFaceGroups, extrudeFaces
+
+def createMergedObject(document, owner, shape):
+    '''
+    Creates an object for the merged faces. It gets the material of the object the faces belong to,
+    so it is textured right away and the material can be changed to texture the area differently.
+    The faces are extruded along their normal, so they are drawn in front of the faces of the owner.
+    '''
+    o = document.addObject('Part::Feature', 'MergedFaces')
+    o.Shape = extrudeFaces(shape)
+    o.addProperty('App::PropertyLink', 'Material', 'Base', 'Material for the object')
+
+    if owner is not None:
+        o.Label = '%s_MergedFaces' % (owner.Label, )
+        o.Material = getattr(owner, 'Material', None)
+
+        # Shapes of objects inside of parts are relative to the part. So the copy has to be in the same part
+        parent = owner.getParentGeoFeatureGroup() if hasattr(owner, 'getParentGeoFeatureGroup') else None
+
+        if parent is not None:
+            parent.addObject(o)
+
+    return o
+
+class MergeFacesCommand:
+    def Activated(self):
+        selectedFaces = findSelectedFaces()
+
+        if len(selectedFaces) == 0:
+            qtutils.showInfo("No faces selected", "Select the faces you want to merge")
+
+            return
+
+        document = FreeCAD.ActiveDocument
+        groups = groupCoplanarFaces(selectedFaces)
+
+        qtutils.QtWidgets.QApplication.setOverrideCursor(qtutils.QtCore.Qt.WaitCursor)
+
+        try:
+            mergedGroups = mergeFaceGroups(groups)
+        finally:
+            qtutils.QtWidgets.QApplication.restoreOverrideCursor()
+
+        document.openTransaction('Merge Faces')
+
+        for (objectName, plane), shape, error in mergedGroups:
+            if error is not None:
+                FreeCAD.Console.PrintWarning('Could not merge faces of %s: %s\n' % (objectName, error))
+
+            createMergedObject(document, document.getObject(objectName), shape)
+
+        document.commitTransaction()
+        document.recompute()
+
+    def IsActive(self):
+        """If there is no active document we can't do anything."""
+        return not FreeCAD.ActiveDocument is None
+
+if __name__ == "__main__":
+    command = MergeFacesCommand()
+
+    if command.IsActive():
+        command.Activated()
+    else:
+        qtutils.showInfo("No open Document", "There is no open document")
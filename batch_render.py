@@ -0,0 +1,160 @@
+'''
+Renders frames of a textured FreeCAD document without a GPU and without a 3D View.
+
+Every worker process opens its own copy of the document once, textures it and renders the frames
+assigned to it with Coin's SoOffscreenRenderer. Use a software OpenGL implementation like Mesa (llvmpipe or OSMesa)
+on build servers without graphics hardware.
+
+Example:
+    python batch_render.py House.FCStd --output frames --turntable 72 --radius 20000 --height 8000 --workers 4 \
+        --freecad-lib /usr/lib/freecad/lib
+'''
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+
+SOFTWARE_RENDERING_ENVIRONMENT = {
+    'LIBGL_ALWAYS_SOFTWARE': '1',
+    'GALLIUM_DRIVER': 'llvmpipe',
+    'QT_QPA_PLATFORM': 'offscreen'
+}
+
+FRAME_FILE_PATTERN = 'frame_%04d.png'
+
+# Per process state of the workers. Each worker loads the scene once and renders many frames.
+workerScene = None
+
+class RenderSettings():
+    def __init__(self, documentPath, outputDirectory, width=1920, height=1080, background=(1.0, 1.0, 1.0),
+                 textureConfigNames=None, freecadLibrary=None):
+        self.documentPath = os.path.abspath(documentPath)
+        self.outputDirectory = os.path.abspath(outputDirectory)
+        self.width = width
+        self.height = height
+        self.background = background
+        self.textureConfigNames = textureConfigNames
+        self.freecadLibrary = freecadLibrary
+
+class WorkerScene():
+    def __init__(self, settings):
+        import FreeCAD
+        import FreeCADGui
+
+        # Creates the view providers and thus the scene graphs of all objects, but no main window
+        FreeCADGui.setupWithoutGUI()
+
+        import arch_texture_utils.render_utils as render_utils
+
+        self.settings = settings
+        self.document = FreeCAD.openDocument(settings.documentPath)
+
+        render_utils.showTextures(self.document, settings.textureConfigNames)
+
+        self.root = render_utils.buildScene(self.document)
+        self.root.ref()
+
+        self.renderer = render_utils.createRenderer(settings.width, settings.height, settings.background)
+
+    def render(self, frameNumber, cameraSpec):
+        from pivy import coin
+        import arch_texture_utils.render_utils as render_utils
+
+        settings = self.settings
+        viewport = coin.SbViewportRegion(settings.width, settings.height)
+
+        render_utils.setCamera(self.root, render_utils.createCamera(cameraSpec), viewport)
+        image = render_utils.renderImage(self.renderer, self.root, settings.width, settings.height)
+
+        fileName = os.path.join(settings.outputDirectory, FRAME_FILE_PATTERN % (frameNumber, ))
+
+        if not image.save(fileName):
+            raise IOError('Unable to write ' + fileName)
+
+        return fileName
+
+def setupEnvironment(freecadLibrary=None):
+    '''Selects software OpenGL and makes FreeCAD and this workbench importable'''
+    for key, value in SOFTWARE_RENDERING_ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+
+    workbenchPath = os.path.dirname(os.path.realpath(__file__))
+
+    for path in [freecadLibrary, workbenchPath]:
+        if path is not None and path not in sys.path:
+            sys.path.append(path)
+
+def initWorker(settings):
+    global workerScene
+
+    setupEnvironment(settings.freecadLibrary)
+    workerScene = WorkerScene(settings)
+
+def renderFrame(frame):
+    frameNumber, cameraSpec = frame
+
+    return workerScene.render(frameNumber, cameraSpec)
+
+def renderFrames(settings, cameras, workers=None):
+    '''
+    Renders one frame per camera into the output directory and returns the written file names.
+    The frames are distributed across worker processes. Each worker holds one loaded copy of the scene.
+    '''
+    if not os.path.isdir(settings.outputDirectory):
+        os.makedirs(settings.outputDirectory)
+
+    workers = min(workers or multiprocessing.cpu_count(), len(cameras))
+
+    # spawn instead of fork: every worker needs its own FreeCAD and OpenGL context
+    context = multiprocessing.get_context('spawn')
+
+    with context.Pool(workers, initializer=initWorker, initargs=(settings, )) as pool:
+        return sorted(pool.imap_unordered(renderFrame, enumerate(cameras, 1)))
+
+def loadCameras(cameraFile):
+    '''Loads a list of cameras from a JSON file. See render_utils.createCamera for the keys of each camera.'''
+    with open(cameraFile, 'r') as f:
+        return json.load(f)
+
+def parseArguments(arguments):
+    parser = argparse.ArgumentParser(description='Render textured views of a FreeCAD document offscreen')
+    parser.add_argument('document', help='The FreeCAD document to render')
+    parser.add_argument('--output', required=True, help='The directory for the rendered frames')
+    parser.add_argument('--cameras', help='JSON file with a list of cameras')
+    parser.add_argument('--turntable', type=int, help='Render the given number of frames circling the model')
+    parser.add_argument('--center', type=float, nargs=3, default=[0, 0, 0], help='Center of the turntable')
+    parser.add_argument('--radius', type=float, default=20000, help='Radius of the turntable')
+    parser.add_argument('--height', type=float, default=5000, help='Height of the turntable camera above the center')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--image-height', type=int, default=1080)
+    parser.add_argument('--background', type=float, nargs=3, default=[1.0, 1.0, 1.0])
+    parser.add_argument('--texture-config', action='append', help='Name or label of a TextureConfig to use. Defaults to all')
+    parser.add_argument('--workers', type=int, help='Number of worker processes. Defaults to the number of CPUs')
+    parser.add_argument('--freecad-lib', help='Directory containing FreeCAD.so / FreeCAD.pyd')
+
+    return parser.parse_args(arguments)
+
+def main(arguments):
+    args = parseArguments(arguments)
+
+    if args.cameras is None and args.turntable is None:
+        raise SystemExit('Either --cameras or --turntable is required')
+
+    setupEnvironment(args.freecad_lib)
+
+    import arch_texture_utils.render_utils as render_utils
+
+    if args.cameras is not None:
+        cameras = loadCameras(args.cameras)
+    else:
+        cameras = render_utils.turntableCameras(args.center, args.radius, args.height, args.turntable)
+
+    settings = RenderSettings(args.document, args.output, args.width, args.image_height, tuple(args.background),
+                              args.texture_config, args.freecad_lib)
+
+    for fileName in renderFrames(settings, cameras, args.workers):
+        print(fileName)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,19 +1,9 @@
 import FreeCAD, FreeCADGui
 
 import texture_config
-from arch_texture_utils.resource_utils import iconPath
 import arch_texture_utils.qtutils as qtutils
 
 class CreateTextureConfigCommand:
-    toolbarName = 'ArchTexture_Tools'
-    commandName = 'Create_Config'
-
-    def GetResources(self):
-        return {'MenuText': "Create Texture Config",
-                'ToolTip' : "Create a new TextureConfig object to store Textures",
-                'Pixmap': iconPath('CreateConfig.svg')
-                }
-
     def Activated(self):
         texture_config.createTextureConfig()
 
@@ -28,6 +18,3 @@ if __name__ == "__main__":
         command.Activated()
     else:
         qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(CreateTextureConfigCommand()) 
\ No newline at end of file
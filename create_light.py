@@ -1,21 +1,11 @@
 import FreeCAD, FreeCADGui
 
 import texture_config
-from arch_texture_utils.resource_utils import iconPath
 
 import point_light
 import directional_light
 
 class CreatePointLightCommand:
-    toolbarName = 'Light_Tools'
-    commandName = 'Create_PointLight'
-
-    def GetResources(self):
-        return {'MenuText': "Create Pointlight",
-                'ToolTip' : "Create a new point light in the scene",
-                'Pixmap': iconPath('CreatePointLight.svg')
-                }
-
     def Activated(self):
         point_light.createPointLight()
 
@@ -24,15 +14,6 @@ class CreatePointLightCommand:
         return not FreeCAD.ActiveDocument is None
 
 class CreateDirectionalLightCommand:
-    toolbarName = 'Light_Tools'
-    commandName = 'Create_DirectionalLight'
-
-    def GetResources(self):
-        return {'MenuText': "Create Directionallight",
-                'ToolTip' : "Create a new Directional light in the scene",
-                'Pixmap': iconPath('CreateDirectionalLight.svg')
-                }
-
     def Activated(self):
         directional_light.createDirectionalLight()
 
@@ -49,7 +30,3 @@ if __name__ == "__main__":
     else:
         import arch_texture_utils.qtutils as qtutils
         qtutils.showInfo("No open Document", "There is no open document")
-else:
-    import archtexture_toolbars
-    archtexture_toolbars.toolbarManager.registerCommand(CreatePointLightCommand())
-    archtexture_toolbars.toolbarManager.registerCommand(CreateDirectionalLightCommand())
\ No newline at end of file
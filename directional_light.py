@@ -1,10 +1,20 @@
 import FreeCAD
 import FreeCADGui
+import datetime
 from pivy import coin
 
 import light
+import arch_texture_utils.solar_utils as solar_utils
 from arch_texture_utils.resource_utils import iconPath
 
+SUN_PROPERTIES = ['SunPosition', 'Latitude', 'Longitude', 'TimeZone', 'NorthAngle', 'Date', 'Time']
+
+PLAYBACK_MODE_DAY = 'Day'
+PLAYBACK_MODE_YEAR = 'Year'
+
+# Frames per second of the sun animation
+PLAYBACK_FRAME_RATE = 30
+
 class DirectionalLight(light.Light):
     def __init__(self, obj):
         super().__init__(obj)
@@ -21,13 +31,152 @@ class DirectionalLight(light.Light):
         if not 'VerticalRotation' in pl:
             obj.addProperty("App::PropertyAngle", "VerticalRotation", "Light", 
                             "The up and downward rotation").VerticalRotation = 45
-                            
+
+        if not 'SunPosition' in pl:
+            obj.addProperty("App::PropertyBool", "SunPosition", "Sun",
+                            "Calculate the direction from the position of the sun at the given site, date and time instead of the rotations").SunPosition = False
+
+        if not 'Latitude' in pl:
+            obj.addProperty("App::PropertyAngle", "Latitude", "Sun",
+                            "The latitude of the site. Positive values are north of the equator").Latitude = 48.0
+
+        if not 'Longitude' in pl:
+            obj.addProperty("App::PropertyAngle", "Longitude", "Sun",
+                            "The longitude of the site. Positive values are east of Greenwich").Longitude = 11.0
+
+        if not 'TimeZone' in pl:
+            obj.addProperty("App::PropertyFloat", "TimeZone", "Sun",
+                            "The offset of the local time from UTC in hours").TimeZone = 1.0
+
+        if not 'NorthAngle' in pl:
+            obj.addProperty("App::PropertyAngle", "NorthAngle", "Sun",
+                            "The angle of true north, measured counter clockwise from the positive Y axis").NorthAngle = 0
+
+        if not 'Date' in pl:
+            obj.addProperty("App::PropertyString", "Date", "Sun",
+                            "The date in the format YYYY-MM-DD").Date = datetime.date.today().isoformat()
+
+        if not 'Time' in pl:
+            obj.addProperty("App::PropertyFloatConstraint", "Time", "Sun",
+                            "The local time of day in hours").Time = (12.0, 0.0, 24.0, 0.25)
+
+        if not 'Animate' in pl:
+            obj.addProperty("App::PropertyBool", "Animate", "Sun Animation",
+                            "Play the sun path in the 3D View").Animate = False
+
+        if not 'PlaybackMode' in pl:
+            obj.addProperty("App::PropertyEnumeration", "PlaybackMode", "Sun Animation",
+                            "Day plays the hours of the date. Year plays all days of the year at the given time")
+            obj.PlaybackMode = [PLAYBACK_MODE_DAY, PLAYBACK_MODE_YEAR]
+            obj.PlaybackMode = PLAYBACK_MODE_DAY
+
+        if not 'PlaybackSpeed' in pl:
+            obj.addProperty("App::PropertyFloat", "PlaybackSpeed", "Sun Animation",
+                            "Simulated hours per second in Day mode and simulated days per second in Year mode").PlaybackSpeed = 1.0
+
         self.type = 'DirectionalLight'
     
 class ViewProviderDirectionalLight(light.ViewProviderLight):
     def __init__(self, vobj):
         super().__init__(vobj)
 
+    def attach(self, vobj):
+        self.timerSensor = None
+        self.playbackPosition = 0
+
+        super().attach(vobj)
+
+    def updateData(self, fp, prop):
+        if prop in SUN_PROPERTIES:
+            self.updateDirection()
+
+            if self.timerSensor is not None:
+                # The playing animation would overwrite the change with its old table on the next frame
+                self.updateAnimation()
+        elif prop in ['Animate', 'PlaybackMode']:
+            self.updateAnimation()
+        else:
+            super().updateData(fp, prop)
+
+    def useSunPosition(self):
+        return getattr(self.Object, 'SunPosition', False)
+
+    def getSunTable(self, year=False):
+        o = self.Object
+        date = solar_utils.parseDate(o.Date)
+        site = (o.Latitude.Value, o.Longitude.Value, o.TimeZone, o.NorthAngle.Value)
+
+        if year:
+            return (solar_utils.buildYearTable(*site, year=date.year), date.timetuple().tm_yday - 1)
+
+        return (solar_utils.buildSunTable(*site, firstDay=date), 0)
+
+    def updateDirection(self):
+        if not self.useSunPosition():
+            super().updateDirection()
+
+            return
+
+        table, dayIndex = self.getSunTable()
+        direction, elevation = table.lookup(dayIndex, self.Object.Time * 60)
+
+        self.applySunDirection(direction, elevation)
+
+        lightDirection = FreeCAD.Vector(direction[0], direction[1], direction[2])
+        self.updateGeometryDirection(FreeCAD.Rotation(FreeCAD.Vector(0, 1, 0), lightDirection))
+
+    def applySunDirection(self, direction, elevation):
+        '''Sets the light direction directly on the coin node. The light is switched off when the sun is below the horizon.'''
+        self.coinLight.direction.setValue(coin.SbVec3f(direction[0], direction[1], direction[2]))
+        self.coinLight.on.setValue(bool(self.ViewObject.Visibility and elevation > 0))
+
+    def updateLightVisibility(self):
+        super().updateLightVisibility()
+
+        if self.useSunPosition():
+            self.updateDirection()
+
+    def updateAnimation(self):
+        animate = self.useSunPosition() and self.Object.Animate
+
+        if not animate:
+            if self.timerSensor is not None:
+                self.timerSensor.unschedule()
+                self.timerSensor = None
+
+                # show the light and the geometry at the time set in the properties again
+                self.updateDirection()
+
+            return
+
+        if self.Object.PlaybackMode == PLAYBACK_MODE_YEAR:
+            self.playbackTable, self.playbackPosition = self.getSunTable(year=True)
+        else:
+            self.playbackTable = self.getSunTable()[0]
+            self.playbackPosition = self.Object.Time * 60
+
+        if self.timerSensor is None:
+            self.timerSensor = coin.SoTimerSensor(self.playbackStep, None)
+            self.timerSensor.setInterval(1.0 / PLAYBACK_FRAME_RATE)
+            self.timerSensor.schedule()
+
+    def playbackStep(self, data, sensor):
+        '''
+        Advances the animation by one frame. The directions come from the precomputed tables
+        and are set on the coin light only. No FreeCAD property is touched while playing.
+        '''
+        table = self.playbackTable
+        speed = self.Object.PlaybackSpeed / PLAYBACK_FRAME_RATE
+
+        if self.Object.PlaybackMode == PLAYBACK_MODE_YEAR:
+            self.playbackPosition = (self.playbackPosition + speed) % table.dayCount()
+            direction, elevation = table.lookup(int(self.playbackPosition), self.Object.Time * 60)
+        else:
+            self.playbackPosition = (self.playbackPosition + speed * 60) % solar_utils.MINUTES_PER_DAY
+            direction, elevation = table.lookup(0, self.playbackPosition)
+
+        self.applySunDirection(direction, elevation)
+
     def createLightInstance(self):
         return coin.SoDirectionalLight()
     
@@ -3,6 +3,11 @@ import FreeCADGui
 from pivy import coin
 import math
 import arch_texture_utils.py2_utils as py2_utils
+import arch_texture_utils.dome_utils as dome_utils
+import arch_texture_utils.tile_utils as tile_utils
+from arch_texture_utils.qtutils import QtCore
+from arch_texture_utils.texture_files import normalizePath
+from arch_texture_utils.file_watcher import TextureFileWatcher, reloadTextureNode
 
 GEOMETRY_COORDINATES = ['Radius', 'Length', 'Height']
 TRANSFORM_PARAMETERS = ['ZOffset', 'Rotation']
@@ -10,6 +15,15 @@ ROTATION_VECTOR = coin.SbVec3f(0, 0, -1)
 
 PANORAMA_TYPE_THIRDS = 'Thirds'
 PANORAMA_TYPE_360 = '360'
+PANORAMA_TYPE_DOME = 'Dome'
+PANORAMA_TYPES = [PANORAMA_TYPE_THIRDS, PANORAMA_TYPE_360, PANORAMA_TYPE_DOME]
+DEFAULT_SEGMENTS = 64
+TILE_PROPERTIES = ['TiledTextures', 'TileSize']
+
+# Full resolution tiles are loaded when the camera stopped moving for this amount of milliseconds
+TILE_UPDATE_INTERVAL = 200
+# Tiles slightly outside of the vertical field of view are loaded too. This covers wide viewports
+VIEW_ASPECT_MARGIN = 2
 
 
 def noTexture(image):
@@ -35,6 +49,125 @@ def removeNode(parent, node):
         parent.removeChild(node)
 
 
+def setTextureFile(texture, imageFile):
+    '''Only touch the filename when it changes. Otherwise the image is read again.'''
+    imageFile = py2_utils.textureFileString(imageFile)
+
+    if texture.filename.getValue() != imageFile:
+        texture.filename = imageFile
+
+
+def updateQuadMesh(tessellation, coordinates, textureCoordinates, mesh):
+    vertexCount = len(tessellation.vertices)
+
+    coordinates.point.setValues(0, vertexCount, tessellation.vertices)
+    coordinates.point.setNum(vertexCount)
+
+    textureCoordinates.point.setValues(0, vertexCount, tessellation.textureCoordinates)
+    textureCoordinates.point.setNum(vertexCount)
+
+    mesh.verticesPerRow.setValue(tessellation.columns)
+    mesh.verticesPerColumn.setValue(tessellation.rows)
+
+
+class Tile():
+    def __init__(self, row, column, texture, center, radius):
+        self.row = row
+        self.column = column
+        self.texture = texture
+        self.center = center
+        self.radius = radius
+
+
+class TiledTexture():
+    '''
+    Displays a large equirectangular image as a grid of tiles. Every tile gets its own part of the dome mesh and its own texture.
+    So no single texture exceeds the maximum texture size. Tiles inside the view use the full resolution image,
+    all other tiles use a low resolution proxy.
+    '''
+
+    def __init__(self, buildMesh, splitter):
+        self.buildMesh = buildMesh
+        self.splitter = splitter
+        self.node = coin.SoGroup()
+        self.grid = None
+        self.tiles = []
+        self.key = None
+
+    def reload(self):
+        '''The image changed on disk. The next update splits it again'''
+        self.key = None
+
+    def update(self, imageFile, tileSize, segments, synchronous=False):
+        '''
+        Builds the tiles of the image. Images are split in the background, the tiles are built by the update
+        after the splitter reported them. With synchronous the image is split right away, e.g. without an event loop.
+        '''
+        key = (imageFile, tileSize, segments)
+
+        if key == self.key:
+            return
+
+        self.node.removeAllChildren()
+        self.grid = None
+        self.tiles = []
+
+        if noTexture(imageFile):
+            self.key = key
+            return
+
+        try:
+            if synchronous:
+                grid = tile_utils.loadTileGrid(imageFile, tileSize)
+            else:
+                grid = self.splitter.findTileGrid(imageFile, tileSize)
+        except (OSError, ValueError) as e:
+            FreeCAD.Console.PrintError('Unable to split %s into tiles: %s\n' % (imageFile, e))
+
+            self.key = key
+            return
+
+        if grid is None:
+            # Still splitting
+            return
+
+        self.key = key
+        self.grid = grid
+
+        for row, column in self.grid.tiles():
+            u0, u1 = self.grid.uRange(column)
+            v0, v1 = self.grid.vRange(row)
+            tessellation = self.buildMesh(segments, u0, u1, v0, v1)
+
+            coordinates = coin.SoCoordinate3()
+            textureCoordinates = coin.SoTextureCoordinate2()
+            mesh = coin.SoQuadMesh()
+            updateQuadMesh(tessellation, coordinates, textureCoordinates, mesh)
+
+            texture = coin.SoTexture2()
+            texture.model = coin.SoMultiTextureImageElement.REPLACE
+            setTextureFile(texture, self.grid.proxyFile(row, column))
+
+            tileNode = coin.SoSeparator()
+            tileNode.addChild(coordinates)
+            tileNode.addChild(textureCoordinates)
+            tileNode.addChild(texture)
+            tileNode.addChild(mesh)
+
+            self.node.addChild(tileNode)
+
+            center, radius = tessellation.boundingSphere()
+            self.tiles.append(Tile(row, column, texture, center, radius))
+
+    def updateResolution(self, isInView):
+        '''Loads the full resolution image for tiles in view and switches all others back to their proxy'''
+        for tile in self.tiles:
+            if isInView(tile):
+                setTextureFile(tile.texture, self.grid.tileFile(tile.row, tile.column))
+            else:
+                setTextureFile(tile.texture, self.grid.proxyFile(tile.row, tile.column))
+
+
 class EnvironmentConfig():
     def __init__(self, obj):
         obj.Proxy = self
@@ -70,8 +203,22 @@ class EnvironmentConfig():
         if not 'PanoramaType' in pl:
             obj.addProperty("App::PropertyEnumeration", "PanoramaType",
                             "Geometry", "The type of panorama to display")
-            obj.PanoramaType = [PANORAMA_TYPE_THIRDS, PANORAMA_TYPE_360]
+            obj.PanoramaType = PANORAMA_TYPES
             obj.PanoramaType = PANORAMA_TYPE_THIRDS
+        elif len(obj.getEnumerationsOfProperty('PanoramaType')) != len(PANORAMA_TYPES):
+            # older versions did not know all panorama types
+            panoramaType = obj.PanoramaType
+            obj.PanoramaType = PANORAMA_TYPES
+            obj.PanoramaType = panoramaType
+        if not 'Segments' in pl:
+            obj.addProperty("App::PropertyIntegerConstraint", "Segments", "Geometry",
+                            "The number of segments around the dome. Higher values give a smoother dome").Segments = (DEFAULT_SEGMENTS, 8, 512, 8)
+        if not 'TiledTextures' in pl:
+            obj.addProperty("App::PropertyBool", "TiledTextures", "Texture",
+                            "Split large panorama and sky images of a dome into tiles. Only tiles in view are loaded in full resolution").TiledTextures = False
+        if not 'TileSize' in pl:
+            obj.addProperty("App::PropertyIntegerConstraint", "TileSize", "Texture",
+                            "The maximum width and height of a tile in pixels").TileSize = (tile_utils.DEFAULT_TILE_SIZE, 256, 16384, 256)
 
         if not 'SkyImage' in pl:
             obj.addProperty("App::PropertyFile", "SkyImage", "Texture",
@@ -103,27 +250,63 @@ class ViewProviderEnvironmentConfig():
         self.panoramaNode = self.setupPanoramaNode()
         self.skyNode = self.setupSkyNode()
         self.groundNode = self.setupGroundNode()
+        self.panoramaDomeNode, self.skyDomeNode = self.setupDomeNodes()
+        self.tiledPanoramaNode, self.tiledSkyNode = self.setupTiledNodes()
 
         self.updatePanoramaCoordinates()
         self.updatePanoramaTextureCoordinates()
         self.updateSkyCoordinates()
         self.updateGroundCoordinates()
+        self.updateDomeTessellation()
+        self.updateDomeTransforms()
 
         self.updateTransformNode()
+        self.updateTextureFiles()
         self.updateNodeVisibility()
 
         vobj.addDisplayMode(self.coinNode, "Standard")
 
+        self.fileWatcher = TextureFileWatcher(self.imageFilesChanged)
+        self.watchImageFiles()
+
+        # Finding the camera has to wait until the 3D view exists
+        QtCore.QTimer.singleShot(0, self.updateTiles)
+
+    def isDome(self):
+        return self.Object.PanoramaType == PANORAMA_TYPE_DOME
+
+    def useTiles(self):
+        return self.isDome() and getattr(self.Object, 'TiledTextures', False)
+
+    def selectEnvironmentNodes(self):
+        if not self.isDome():
+            return (self.panoramaNode, self.skyNode)
+
+        if self.useTiles():
+            return (self.tiledPanoramaNode, self.tiledSkyNode)
+
+        return (self.panoramaDomeNode, self.skyDomeNode)
+
     def updateNodeVisibility(self):
+        panoramaNode, skyNode = self.selectEnvironmentNodes()
+
+        for node in [self.panoramaNode, self.panoramaDomeNode, self.tiledPanoramaNode]:
+            if node != panoramaNode:
+                removeNode(self.coinNode, node)
+
+        for node in [self.skyNode, self.skyDomeNode, self.tiledSkyNode]:
+            if node != skyNode:
+                removeNode(self.coinNode, node)
+
         if noTexture(self.Object.PanoramaImage):
-            removeNode(self.coinNode, self.panoramaNode)
+            removeNode(self.coinNode, panoramaNode)
         else:
-            addNode(self.coinNode, self.panoramaNode)
+            addNode(self.coinNode, panoramaNode)
 
         if noTexture(self.Object.SkyImage):
-            removeNode(self.coinNode, self.skyNode)
+            removeNode(self.coinNode, skyNode)
         else:
-            addNode(self.coinNode, self.skyNode)
+            addNode(self.coinNode, skyNode)
 
         if noTexture(self.Object.GroundImage):
             removeNode(self.coinNode, self.groundNode)
@@ -146,8 +329,6 @@ class ViewProviderEnvironmentConfig():
         self.panoramaTextureCoordinates = coin.SoTextureCoordinate2()
 
         self.panoramaTexture = coin.SoTexture2()
-        self.panoramaTexture.filename = py2_utils.textureFileString(
-            self.Object.PanoramaImage)
         self.panoramaTexture.model = coin.SoMultiTextureImageElement.REPLACE
 
         faceset = coin.SoFaceSet()
@@ -168,8 +349,6 @@ class ViewProviderEnvironmentConfig():
         self.skyCoordinates = coin.SoCoordinate3()
 
         self.skyTexture = coin.SoTexture2()
-        self.skyTexture.filename = py2_utils.textureFileString(
-            self.Object.SkyImage)
         self.skyTexture.model = coin.SoMultiTextureImageElement.REPLACE
 
         self.skyTextureCoordinates = coin.SoTextureCoordinate2()
@@ -215,6 +394,247 @@ class ViewProviderEnvironmentConfig():
 
         return groundNode
 
+    def setupDomeNodes(self):
+        '''
+        The dome consists of an open cylinder showing the panorama and a hemisphere on top of it showing the sky.
+        Both are unit meshes scaled by their own transform. So changing the radius or height only touches the transforms.
+        '''
+        self.panoramaDomeTransform = coin.SoTransform()
+        self.panoramaDomeCoordinates = coin.SoCoordinate3()
+        self.panoramaDomeTextureCoordinates = coin.SoTextureCoordinate2()
+        self.panoramaDomeMesh = coin.SoQuadMesh()
+
+        panoramaDomeNode = coin.SoSeparator()
+        panoramaDomeNode.addChild(self.panoramaDomeTransform)
+        panoramaDomeNode.addChild(self.panoramaDomeCoordinates)
+        panoramaDomeNode.addChild(self.panoramaDomeTextureCoordinates)
+        panoramaDomeNode.addChild(self.panoramaTexture)
+        panoramaDomeNode.addChild(self.panoramaDomeMesh)
+
+        self.skyDomeTransform = coin.SoTransform()
+        self.skyDomeCoordinates = coin.SoCoordinate3()
+        self.skyDomeTextureCoordinates = coin.SoTextureCoordinate2()
+        self.skyDomeMesh = coin.SoQuadMesh()
+
+        skyDomeNode = coin.SoSeparator()
+        skyDomeNode.addChild(self.skyDomeTransform)
+        skyDomeNode.addChild(self.skyDomeCoordinates)
+        skyDomeNode.addChild(self.skyDomeTextureCoordinates)
+        skyDomeNode.addChild(self.skyTexture)
+        skyDomeNode.addChild(self.skyDomeMesh)
+
+        self.domeSegments = None
+
+        return (panoramaDomeNode, skyDomeNode)
+
+    def updateDomeTessellation(self):
+        # Documents of older versions get the property only after the view provider is attached
+        segments = getattr(self.Object, 'Segments', DEFAULT_SEGMENTS)
+
+        if segments == self.domeSegments:
+            return
+
+        self.domeSegments = segments
+
+        updateQuadMesh(dome_utils.buildCylinder(segments), self.panoramaDomeCoordinates,
+                       self.panoramaDomeTextureCoordinates, self.panoramaDomeMesh)
+        updateQuadMesh(dome_utils.buildHemisphere(segments), self.skyDomeCoordinates,
+                       self.skyDomeTextureCoordinates, self.skyDomeMesh)
+
+    def setupTiledNodes(self):
+        '''The tiled nodes share the transforms of the dome. Only the meshes and textures are split into tiles'''
+        # Splits the images in the background and updates the tiles when done
+        self.tileSplitter = tile_utils.TileSplitter()
+        self.tileSplitter.tilesReady.connect(self.updateTiles)
+
+        self.panoramaTiles = TiledTexture(dome_utils.buildCylinder, self.tileSplitter)
+        self.skyTiles = TiledTexture(dome_utils.buildHemisphere, self.tileSplitter)
+
+        tiledPanoramaNode = coin.SoSeparator()
+        tiledPanoramaNode.addChild(self.panoramaDomeTransform)
+        tiledPanoramaNode.addChild(self.panoramaTiles.node)
+
+        tiledSkyNode = coin.SoSeparator()
+        tiledSkyNode.addChild(self.skyDomeTransform)
+        tiledSkyNode.addChild(self.skyTiles.node)
+
+        self.camera = None
+        self.cameraSensor = coin.SoNodeSensor(self.cameraChanged, None)
+
+        self.tileTimer = QtCore.QTimer()
+        self.tileTimer.setSingleShot(True)
+        self.tileTimer.setInterval(TILE_UPDATE_INTERVAL)
+        self.tileTimer.timeout.connect(self.updateTileResolution)
+
+        return (tiledPanoramaNode, tiledSkyNode)
+
+    def updateTextureFiles(self):
+        '''When tiles are used, the single textures stay empty. Otherwise they would load the full image again.'''
+        if self.useTiles():
+            setTextureFile(self.panoramaTexture, '')
+            setTextureFile(self.skyTexture, '')
+        else:
+            setTextureFile(self.panoramaTexture, self.Object.PanoramaImage)
+            setTextureFile(self.skyTexture, self.Object.SkyImage)
+
+    def watchImageFiles(self):
+        self.fileWatcher.watch([self.Object.PanoramaImage, self.Object.SkyImage, self.Object.GroundImage])
+
+    def imageFilesChanged(self, fileNames):
+        '''Reloads the textures of changed images. Coordinates and nodes are kept'''
+        fileNames = set(fileNames)
+
+        def isChanged(imageFile):
+            return not noTexture(imageFile) and normalizePath(imageFile) in fileNames
+
+        if isChanged(self.Object.PanoramaImage):
+            self.panoramaTiles.reload()
+            reloadTextureNode(self.panoramaTexture)
+
+        if isChanged(self.Object.SkyImage):
+            self.skyTiles.reload()
+            reloadTextureNode(self.skyTexture)
+
+        if isChanged(self.Object.GroundImage):
+            reloadTextureNode(self.groundTexture)
+
+        self.updateTextureFiles()
+        self.updateTiles()
+
+    def loadTiles(self):
+        '''
+        Splits the images and loads all tiles in full resolution right away. Used without a 3D view and
+        without an event loop, e.g. by batch_render, where the splitter and the camera sensor never report.
+        '''
+        if not self.useTiles():
+            return
+
+        segments = getattr(self.Object, 'Segments', DEFAULT_SEGMENTS)
+        tileSize = self.Object.TileSize
+
+        self.panoramaTiles.update(self.Object.PanoramaImage, tileSize, segments, synchronous=True)
+        self.skyTiles.update(self.Object.SkyImage, tileSize, segments, synchronous=True)
+
+        self.panoramaTiles.updateResolution(lambda tile: True)
+        self.skyTiles.updateResolution(lambda tile: True)
+
+    def updateTiles(self):
+        if not self.useTiles():
+            self.stopCameraSensor()
+
+            return
+
+        segments = getattr(self.Object, 'Segments', DEFAULT_SEGMENTS)
+        tileSize = self.Object.TileSize
+
+        self.panoramaTiles.update(self.Object.PanoramaImage, tileSize, segments)
+        self.skyTiles.update(self.Object.SkyImage, tileSize, segments)
+
+        self.startCameraSensor()
+        self.updateTileResolution()
+
+    def findCamera(self):
+        guiDocument = FreeCADGui.getDocument(self.Object.Document.Name)
+
+        if guiDocument is None or guiDocument.ActiveView is None or not hasattr(guiDocument.ActiveView, 'getCameraNode'):
+            return None
+
+        return guiDocument.ActiveView.getCameraNode()
+
+    def startCameraSensor(self):
+        camera = self.findCamera()
+
+        if camera is None or camera == self.camera:
+            return
+
+        self.stopCameraSensor()
+
+        self.camera = camera
+        self.cameraSensor.attach(camera)
+
+    def stopCameraSensor(self):
+        self.tileTimer.stop()
+
+        if self.camera is not None:
+            self.cameraSensor.detach()
+            self.camera = None
+
+    def cameraChanged(self, data, sensor):
+        # Wait until the camera stops moving before loading full resolution tiles
+        self.tileTimer.start()
+
+    def updateTileResolution(self):
+        if not self.useTiles():
+            return
+
+        if not self.ViewObject.Visibility:
+            self.panoramaTiles.updateResolution(lambda tile: False)
+            self.skyTiles.updateResolution(lambda tile: False)
+
+            return
+
+        # The camera gets replaced when switching between perspective and orthographic view
+        self.startCameraSensor()
+
+        if self.camera is None:
+            return
+
+        self.panoramaTiles.updateResolution(self.createViewTest(self.panoramaDomeTransform))
+        self.skyTiles.updateResolution(self.createViewTest(self.skyDomeTransform))
+
+    def createViewTest(self, domeTransform):
+        '''Returns a function that checks whether the bounding sphere of a tile intersects the viewing cone of the camera'''
+        camera = self.camera
+        position = camera.position.getValue()
+        direction = camera.orientation.getValue().multVec(coin.SbVec3f(0, 0, -1))
+
+        if camera.isOfType(coin.SoPerspectiveCamera.getClassTypeId()):
+            halfAngle = math.atan(math.tan(camera.heightAngle.getValue() / 2) * VIEW_ASPECT_MARGIN)
+        else:
+            # Orthographic cameras see everything in front of them
+            halfAngle = math.pi / 2
+
+        matrix = self.calculateDomeMatrix(domeTransform)
+        scale = max(domeTransform.scaleFactor.getValue().getValue())
+
+        def isInView(tile):
+            center = matrix.multVecMatrix(coin.SbVec3f(tile.center[0], tile.center[1], tile.center[2]))
+            radius = tile.radius * scale
+
+            toTile = center - position
+            distance = toTile.length()
+
+            if distance <= radius:
+                return True
+
+            cosine = max(-1.0, min(1.0, toTile.dot(direction) / distance))
+            angle = math.acos(cosine) - math.asin(radius / distance)
+
+            return angle < halfAngle
+
+        return isInView
+
+    def calculateDomeMatrix(self, domeTransform):
+        '''The matrix to transform the unit dome into world coordinates. Equals the transform nodes in the scene graph'''
+        matrix = coin.SbMatrix()
+        matrix.setTransform(domeTransform.translation.getValue(), domeTransform.rotation.getValue(), domeTransform.scaleFactor.getValue())
+
+        environmentMatrix = coin.SbMatrix()
+        environmentMatrix.setTransform(self.transformNode.translation.getValue(), self.transformNode.rotation.getValue(), coin.SbVec3f(1, 1, 1))
+
+        matrix.multRight(environmentMatrix)
+
+        return matrix
+
+    def updateDomeTransforms(self):
+        radius = self.Object.Radius.Value
+        height = self.Object.Height.Value
+
+        self.panoramaDomeTransform.scaleFactor.setValue(coin.SbVec3f(radius, radius, height))
+
+        self.skyDomeTransform.translation.setValue(coin.SbVec3f(0, 0, height))
+        self.skyDomeTransform.scaleFactor.setValue(coin.SbVec3f(radius, radius, radius))
+
     def calculateCoordinateBounds(self, radius, length):
         lengthThirds = length / 3  # the panorama consists of 3 planes
 
@@ -267,6 +687,9 @@ class ViewProviderEnvironmentConfig():
             self.updateThirdsPanoramaTextureCoordinates()
         elif panoramaType == PANORAMA_TYPE_360:
             self.update360PanoramaTextureCoordinates()
+        elif panoramaType == PANORAMA_TYPE_DOME:
+            # The dome uses fixed equirectangular texture coordinates
+            pass
         else:
             raise ValueError('Unkown panorama type ' + panoramaType)
 
@@ -447,8 +870,12 @@ class ViewProviderEnvironmentConfig():
 
         groundCoordinates = self.groundCoordinates
 
-        leftX, middleX, rightX, backY, middleY, frontY = self.calculateCoordinateBounds(
-            radius, length)
+        if self.isDome():
+            # The ground plane encloses the cylinder of the dome
+            leftX, frontY, rightX, backY = -radius, -radius, radius, radius
+        else:
+            leftX, middleX, rightX, backY, middleY, frontY = self.calculateCoordinateBounds(
+                radius, length)
 
         groundCoordinates.point.set1Value(0, leftX, frontY, 0)
         groundCoordinates.point.set1Value(1, rightX, frontY, 0)
@@ -520,7 +947,9 @@ class ViewProviderEnvironmentConfig():
         return 1 / (self.fullSkyLength / self.Object.SkyOverlap.Value)
 
     def onChanged(self, vp, prop):
-        pass
+        if prop == 'Visibility' and hasattr(self, 'tileTimer'):
+            # Free full resolution tiles while hidden and load them again when shown
+            self.updateTileResolution()
 
     def doubleClicked(self, vobj):
         pass
@@ -537,25 +966,33 @@ class ViewProviderEnvironmentConfig():
             self.updateSkyCoordinates()
             self.updateGroundCoordinates()
             self.updatePanoramaTextureCoordinates()
+            self.updateDomeTransforms()
+            self.updateTileResolution()
         elif prop == 'SkyOverlap':
             self.updateSkyCoordinates()
-        elif prop == 'PanoramaType':
+        elif prop == 'Segments':
+            self.updateDomeTessellation()
+            self.updateTiles()
+        elif prop == 'PanoramaType' or prop in TILE_PROPERTIES:
             self.updatePanoramaTextureCoordinates()
+            self.updateGroundCoordinates()
+            self.updateTextureFiles()
+            self.updateNodeVisibility()
+            self.updateTiles()
         elif prop in TRANSFORM_PARAMETERS:
             self.updateTransformNode()
             self.updatePanoramaTextureCoordinates()
-        elif prop == 'PanoramaImage':
-            self.panoramaTexture.filename = py2_utils.textureFileString(
-                self.Object.PanoramaImage)
-            self.updateNodeVisibility()
-        elif prop == 'SkyImage':
-            self.skyTexture.filename = py2_utils.textureFileString(
-                self.Object.SkyImage)
+            self.updateTileResolution()
+        elif prop in ['PanoramaImage', 'SkyImage']:
+            self.updateTextureFiles()
             self.updateNodeVisibility()
+            self.updateTiles()
+            self.watchImageFiles()
         elif prop == 'GroundImage':
             self.groundTexture.filename = py2_utils.textureFileString(
                 self.Object.GroundImage)
             self.updateNodeVisibility()
+            self.watchImageFiles()
 
     def __getstate__(self):
         return None
@@ -47,8 +47,6 @@ class ViewProviderLight:
 
         # Setting properties does not work here as the pl is not filled yet :/
 
-        sceneGraph = FreeCADGui.ActiveDocument.ActiveView.getSceneGraph()
-
         self.switch = coin.SoSwitch()
         self.geometryNode = coin.SoSeparator()
         self.transform = coin.SoTransform()
@@ -62,7 +60,11 @@ class ViewProviderLight:
         if actualGeometry is not None:
             self.geometryNode.addChild(actualGeometry)
         
-        sceneGraph.insertChild(self.coinLight, 1)
+        # Without a 3D View (e.g. when rendering offscreen) the renderer adds the light to its own scene
+        sceneGraph = self.findSceneGraph(vobj)
+
+        if sceneGraph is not None:
+            sceneGraph.insertChild(self.coinLight, 1)
 
         self.switch.addChild(self.geometryNode)
 
@@ -74,6 +76,14 @@ class ViewProviderLight:
         self.updateIntensity()
         # self.updateGeometryVisibility()
     
+    def findSceneGraph(self, vobj):
+        guiDocument = FreeCADGui.getDocument(vobj.Object.Document.Name)
+
+        if guiDocument is None or guiDocument.ActiveView is None or not hasattr(guiDocument.ActiveView, 'getSceneGraph'):
+            return None
+
+        return guiDocument.ActiveView.getSceneGraph()
+
     def setProperties(self, vobj):
         pl = vobj.PropertiesList
 
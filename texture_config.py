@@ -1,237 +1,253 @@
+import os
+import tempfile
 import FreeCAD, FreeCADGui
-import re
 from pivy import coin
 from texture_manager import TextureManager
 from arch_texture_utils.resource_utils import uiPath
-from arch_texture_utils.qtutils import QComboBox, QTableWidgetItem, QDoubleSpinBox, userSelectedFile, IMAGE_FILES, showInfo
+from arch_texture_utils.texture_files import resolveTextureFile, findSearchRoots
+from arch_texture_utils.qtutils import showInfo
+from arch_texture_utils.material_table import MaterialTableModel, MaterialRow, setupMaterialTable
+from arch_texture_utils.lazy_texturing import LazyTexturingSettings, DEFAULT_MINIMUM_SCREEN_SIZE, DEFAULT_RELEASE_DELAY
 
-from PySide2.QtWidgets import QGroupBox
-from PySide2.QtWidgets import QLineEdit
-from PySide2.QtWidgets import QPushButton
-from PySide2.QtWidgets import QFormLayout
-from PySide2.QtWidgets import QHBoxLayout
-from PySide2.QtWidgets import QWidget
+class TextureConfigPanel():
+    def __init__(self, textureConfig, freecadObject):
+        self.textureConfig = textureConfig
+        self.freecadObject = freecadObject
+        self.textureManager = textureConfig.textureManager
 
+        self.form = FreeCADGui.PySideUic.loadUi(uiPath('texture_config.ui'))
 
-MAT_NAME_REGEX = re.compile(r'.* \((.*)\)')
+        self.form.Title.setText('%s Config' % (freecadObject.Label))
 
-def noneWhenEmpty(value):
-    if value == None or value.strip() == '':
-        return None
-    
-    return value
+        # The materials are looked up once and shared by all rows
+        self.model = MaterialTableModel(self.findMaterials(), self.createRows())
+        setupMaterialTable(self.form.MaterialTable, self.model)
 
-    
-class MaterialConfigWidget(QGroupBox):
-    def __init__(self, panel, index, materialName, textureFile, bumpMapFile, realSize):
-        super().__init__()
+        self.form.AddMaterialButton.clicked.connect(self.addRow)
+        self.form.RemoveMaterialButton.clicked.connect(self.removeSelectedRows)
 
-        self.panel = panel
-        self.index = index
+    def findMaterials(self):
+        materials = FreeCAD.ActiveDocument.findObjects('App::MaterialObjectPython')
 
-        self.materialBox = self.createMaterialBox(materialName)
-        self.textureFileEdit, self.textureFileWidget = self.createFileSelect(textureFile)
-        self.bumpMapFileEdit, self.bumpMapFileWidget = self.createFileSelect(bumpMapFile)
-        self.lengthEdit, self.heightEdit = self.createSizeEdit(realSize)
-        self.removeButton = QPushButton('Remove')
+        return [(mat.Name, '%s (%s)' % (mat.Label, mat.Name)) for mat in materials]
 
-        self.removeButton.clicked.connect(self.remove)
+    def createRows(self):
+        return [self.createRow(materialName, entryConfig) for materialName, entryConfig in self.textureManager.getMaterials().items()]
 
-        self.initUi()
+    def createRow(self, materialName, entryConfig):
+        bumpMap = None
 
-    def initUi(self):
-        self.layout = QFormLayout()
+        if 'bumpMap' in entryConfig:
+            bumpMap = entryConfig['bumpMap']
 
-        self.layout.addRow('Material', self.materialBox)
-        self.layout.addRow('Texture', self.textureFileWidget)
-        self.layout.addRow('BumpMap', self.bumpMapFileWidget)
-        self.layout.addRow('Length', self.lengthEdit)
-        self.layout.addRow('Height', self.heightEdit)
-        self.layout.addRow(' ', self.removeButton)
+        return MaterialRow(materialName, entryConfig['file'], bumpMap, entryConfig['realSize'], entryConfig)
 
-        self.setLayout(self.layout)
+    def addRow(self):
+        self.model.addRow()
 
-    def getMaterialName(self):
-        comboBox = self.materialBox
+    def removeSelectedRows(self):
+        selectedRows = set(index.row() for index in self.form.MaterialTable.selectionModel().selectedRows())
 
-        return MAT_NAME_REGEX.findall(comboBox.currentText())[0]
+        for rowIndex in sorted(selectedRows, reverse=True):
+            self.model.removeMaterialRow(rowIndex)
 
-    def getTextureFile(self):
-        return noneWhenEmpty(self.textureFileEdit.text())
+    def accept(self):
+        self.saveIntoConfig()
+        self.model.release()
 
-    def getBumpMapFile(self):
-        return noneWhenEmpty(self.bumpMapFileEdit.text())
+        FreeCADGui.Control.closeDialog()
 
-    def getLength(self):
-        return self.lengthEdit.value()
+        self.textureConfig.execute(self.freecadObject)
 
-    def getHeight(self):
-        return self.heightEdit.value()
+    def reject(self):
+        self.model.release()
 
-    def remove(self):
-        self.panel.removeRow(self)
+        FreeCADGui.Control.closeDialog()
     
-    def createMaterialBox(self, materialName=None):
-        materialBox = QComboBox()
+    def saveIntoConfig(self):
+        '''Only materials that differ from the linked config are stored in the document'''
+        config = self.textureManager.textureData['materials']
+        linkedMaterials = self.textureManager.getLinkedMaterials()
 
-        materials = self.findMaterials()
-        materialBox.addItems(materials)
+        config.clear()
 
-        if materialName is not None:
-            boxEntry = [mat for mat in materials if mat.find('(%s)' % (materialName, )) > -1]
+        for row in self.model.rows:
+            if row.materialName is None:
+                continue
 
-            if len(boxEntry) == 1:
-                index = materialBox.findText(boxEntry[0])
-            else:
-                index = -1
+            entryConfig = row.toConfig()
+            linkedConfig = linkedMaterials.get(row.materialName, None)
 
-            if index != -1:
-                FreeCAD.Console.PrintMessage('Found Matname: %s\n' % (materialName,))
-                materialBox.setCurrentIndex(index)
+            if linkedConfig is None or self.createRow(row.materialName, linkedConfig).toConfig() != entryConfig:
+                config[row.materialName] = entryConfig
 
-        return materialBox
-    
-    def createSizeEdit(self, realSize=None):
-        lengthEdit = QDoubleSpinBox()
-        heightEdit = QDoubleSpinBox()
+        # Removed linked materials are hidden
+        for materialName in linkedMaterials.keys():
+            if not any(row.materialName == materialName for row in self.model.rows):
+                config[materialName] = None
 
-        lengthEdit.setSuffix('mm')
-        heightEdit.setSuffix('mm')
+        self.textureManager.markChanged()
 
-        lengthEdit.setMinimum(0)
-        heightEdit.setMinimum(0)
+# Configs with more face overrides store them compressed in FaceOverridesFile instead of the Document.xml
+INLINE_FACE_OVERRIDES = 100
 
-        lengthEdit.setMaximum(100000)
-        heightEdit.setMaximum(100000)
-
-        if realSize is not None:
-            lengthEdit.setValue(realSize['s'])
+class TextureConfig():
+    def __init__(self, obj, fileObject=None, linkedConfigFile=''):
+        obj.Proxy = self
         
-        if realSize is not None:
-            heightEdit.setValue(realSize['t'])
-
-        return (lengthEdit, heightEdit)
-    
-    def createFileSelect(self, file):
-        edit = QLineEdit(file)
-        button = QPushButton('...')
-        button.setMaximumWidth(30)
-
-        widget = QWidget()
-        layout = QHBoxLayout()
-
-        layout.addWidget(edit)
-        layout.addWidget(button)
-
-        widget.setLayout(layout)
+        self.textureManager = TextureManager(fileObject)
+        self.showTextures = True
 
-        button.clicked.connect(lambda: self.chooseFile(edit))
+        self.faceOverridesInFile = False
+        self.faceOverridesFileRevision = None
 
+        self.setProperties(obj)
+        obj.LinkedConfig = linkedConfigFile
 
-        return (edit, widget)
-    
-    def findMaterials(self):
-        materials = FreeCAD.ActiveDocument.findObjects('App::MaterialObjectPython')
+        self.execute(obj)
 
-        return ['%s (%s)' % (mat.Label, mat.Name) for mat in materials]
-    
-    def chooseFile(self, edit):
-        selectedFile = userSelectedFile('Select texture', IMAGE_FILES)
+        self.isTextureConfig = True
 
-        if selectedFile is None or selectedFile == '':
+    def setProperties(self, obj):
+        pl = obj.PropertiesList
+
+        if not 'LazyTexturing' in pl:
+            obj.addProperty("App::PropertyBool", "LazyTexturing", "Texturing",
+                            "Only texture objects when they become visible in the 3D view. Objects out of view are textured in the background").LazyTexturing = False
+        if not 'MinimumScreenSize' in pl:
+            obj.addProperty("App::PropertyIntegerConstraint", "MinimumScreenSize", "Texturing",
+                            "Objects smaller than this amount of pixels on screen are textured in the background").MinimumScreenSize = (DEFAULT_MINIMUM_SCREEN_SIZE, 0, 10000, 1)
+        if not 'ReleaseOffscreen' in pl:
+            obj.addProperty("App::PropertyBool", "ReleaseOffscreen", "Texturing",
+                            "Remove the textures of objects that stay out of view to save memory. Only used with lazy texturing").ReleaseOffscreen = False
+        if not 'ReleaseDelay' in pl:
+            obj.addProperty("App::PropertyIntegerConstraint", "ReleaseDelay", "Texturing",
+                            "The number of seconds an object has to be out of view before its textures are removed").ReleaseDelay = (DEFAULT_RELEASE_DELAY, 1, 86400, 1)
+        if not 'Scope' in pl:
+            obj.addProperty("App::PropertyLinkList", "Scope", "Texturing",
+                            "Only texture these objects and the members of these groups, BuildingParts or levels. Leave empty to texture the whole document")
+        if not 'FaceOverridesFile' in pl:
+            obj.addProperty("App::PropertyFileIncluded", "FaceOverridesFile", "Texturing",
+                            "The face overrides of large configs, stored compressed")
+            obj.setEditorMode('FaceOverridesFile', 2)
+
+        # Written while the document is saved. That must neither mark the config as touched nor retexture everything.
+        # Also set for documents created before
+        obj.setPropertyStatus('FaceOverridesFile', ['NoRecompute', 'Output'])
+        if not 'LinkedConfig' in pl:
+            obj.addProperty("App::PropertyFile", "LinkedConfig", "Texturing",
+                            "A texture config file shared by several documents. Materials configured in this document replace the ones of the file")
+
+    def onDocumentRestored(self, obj):
+        self.setProperties(obj)
+
+        if self.faceOverridesInFile:
+            # Parsed on first texturing, not while the document loads
+            self.textureManager.setFaceOverridesLoader(lambda: self.readFaceOverridesFile(obj))
+
+        # Documents linking the same file share the parsed materials
+        self.textureManager.linkConfig(self.findLinkedConfigFile(obj))
+
+    def findLinkedConfigFile(self, obj):
+        '''Relative paths are looked up like texture files, so the link works on every machine with the library'''
+        fileName = getattr(obj, 'LinkedConfig', '')
+
+        if not fileName:
+            return None
+
+        return resolveTextureFile(fileName, findSearchRoots(obj.Document))
+
+    def readFaceOverridesFile(self, obj):
+        fileName = obj.FaceOverridesFile
+
+        if not fileName or not os.path.isfile(fileName):
+            FreeCAD.Console.PrintWarning('The face overrides of %s are missing\n' % (obj.Label, ))
+            return []
+
+        with open(fileName, 'rb') as f:
+            return self.textureManager.deserializeFaceOverrides(f.read())
+
+    def writeFaceOverridesFile(self, obj):
+        '''Called before the document is saved. The file is only written when the face overrides changed.'''
+        if self.textureManager.hasPendingFaceOverrides():
+            # Never loaded, so the file is still up to date
             return
-        
-        edit.setText(selectedFile)
 
+        faceOverrides = self.textureManager.getFaceOverrides() or []
 
-class TextureConfigPanel():
-    def __init__(self, textureConfig, freecadObject):
-        self.textureConfig = textureConfig
-        self.freecadObject = freecadObject
-        self.textureManager = textureConfig.textureManager
-        self.entries = []
+        if len(faceOverrides) <= INLINE_FACE_OVERRIDES:
+            if self.faceOverridesInFile:
+                obj.FaceOverridesFile = ''
 
-        self.form = FreeCADGui.PySideUic.loadUi(uiPath('texture_config.ui'))
-
-        self.form.Title.setText('%s Config' % (freecadObject.Label))
-        self.scrollAreaWidget = self.form.ScrollArea.widget()
-
-        self.form.AddMaterialButton.clicked.connect(self.addRow)
-
-        self.setupRows()
+            self.faceOverridesInFile = False
 
-    def setupRows(self):
-        for materialName, entryConfig in self.textureManager.textureData['materials'].items():
-            bumpMap = None
+            return
 
-            if 'bumpMap' in entryConfig:
-                bumpMap = entryConfig['bumpMap']
+        if self.faceOverridesInFile and self.faceOverridesFileRevision == self.textureManager.faceOverridesRevision:
+            return
 
-            self.addRow(materialName, entryConfig['file'], bumpMap, entryConfig['realSize'])
+        handle, fileName = tempfile.mkstemp(suffix='.json.z')
 
-    def addRow(self, materialName = None, textureFile = None, bumpMapFile = None, realSize = None):
-        widget = MaterialConfigWidget(self, len(self.entries), materialName, textureFile, bumpMapFile, realSize)
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                f.write(self.textureManager.serializeFaceOverrides())
 
-        self.entries.append(widget)
+            # The file is copied into the document
+            obj.FaceOverridesFile = fileName
+        finally:
+            os.remove(fileName)
 
-        self.scrollAreaWidget.layout().addWidget(widget)
-    
-    def removeRow(self, widget):
-        self.entries.pop(widget.index)
-        layoutItem = self.scrollAreaWidget.layout().takeAt(widget.index)
+        self.faceOverridesInFile = True
+        self.faceOverridesFileRevision = self.textureManager.faceOverridesRevision
 
-        layoutItem.widget().deleteLater()
-
-    def accept(self):
-        self.saveIntoConfig()
+    def isFaceOverridesFileCurrent(self):
+        if not self.faceOverridesInFile:
+            return False
 
-        FreeCADGui.Control.closeDialog()
+        return self.textureManager.hasPendingFaceOverrides() or self.faceOverridesFileRevision == self.textureManager.faceOverridesRevision
 
-        self.textureConfig.execute(self.freecadObject)
+    def createLazySettings(self, fp):
+        if not getattr(fp, 'LazyTexturing', False):
+            return None
 
-    def reject(self):
-        FreeCADGui.Control.closeDialog()
+        return LazyTexturingSettings(fp.MinimumScreenSize, fp.ReleaseOffscreen, fp.ReleaseDelay)
     
-    def saveIntoConfig(self):
-        config = self.textureManager.textureData['materials']
-
-        config.clear()
-
-        for entry in self.entries:
-            materialName = entry.getMaterialName()
-
-            config[materialName] = {
-                'file': entry.getTextureFile(),
-                'bumpMap': entry.getBumpMapFile(),
-                'realSize': {
-                    's': entry.getLength(),
-                    't': entry.getHeight()
-                }
-            }
-
-class TextureConfig():
-    def __init__(self, obj, fileObject=None):
-        obj.Proxy = self
-        
-        self.textureManager = TextureManager(fileObject)
-        self.showTextures = True
+    def execute(self, fp):
+        self.updateTextures(fp)
 
-        self.execute(obj)
+    def updateTextures(self, fp, lazy=True):
+        '''Textures or untextures the objects. Without lazy, all objects are textured right away, e.g. without an event loop.'''
+        # The file is only parsed again when it changed
+        self.textureManager.linkConfig(self.findLinkedConfigFile(fp))
 
-        self.isTextureConfig = True
-    
-    def execute(self, fp):
         if self.showTextures:
-            self.textureManager.textureObjects()
+            lazySettings = self.createLazySettings(fp) if lazy else None
+
+            self.textureManager.textureObjects(lazySettings=lazySettings, scopeObjects=getattr(fp, 'Scope', None))
         else:
             self.textureManager.removeTextures()
     
+    def setTexturesVisible(self, fp, visible):
+        '''Toggles the textures. Hidden textures are kept for a while, so showing them again does not recalculate them.'''
+        self.showTextures = visible
+
+        if not visible:
+            self.textureManager.hideTextures()
+        elif not self.textureManager.showHiddenTextures():
+            self.execute(fp)
+
     def export(self, fileObject):
         self.textureManager.export(fileObject)
 
     def __getstate__(self):
-        '''Store the texture config inside the FreeCAD File'''
-        return (self.textureManager.serializeTextureData(),)
+        '''
+        Store the texture config inside the FreeCAD File. The serialized data is cached until the config changes.
+        Face overrides written to FaceOverridesFile are left out. When they changed after the file was written,
+        e.g. on autosave, they are stored inline.
+        '''
+        faceOverridesInFile = self.isFaceOverridesFileCurrent()
+
+        return (self.textureManager.serializeTextureData(includeFaceOverrides=not faceOverridesInFile), faceOverridesInFile)
     
     def __setstate__(self, state):
         '''Load the texture config from the FreeCAD File'''
@@ -247,6 +263,10 @@ class TextureConfig():
             # newer version store a json string
             self.textureManager.deserializeTextureData(textureData)
 
+        # Large face overrides are stored in FaceOverridesFile. They are loaded in onDocumentRestored
+        self.faceOverridesInFile = len(state) > 1 and state[1]
+        self.faceOverridesFileRevision = self.textureManager.faceOverridesRevision
+
         self.isTextureConfig = True
 
         return None
@@ -268,8 +288,7 @@ class ViewProviderTextureConfig():
     
     def onChanged(self, vp, prop):
         if prop == 'Visibility':
-            self.textureConfig.showTextures = vp.Visibility
-            self.textureConfig.execute(self.Object)
+            self.textureConfig.setTexturesVisible(self.Object, vp.Visibility)
     
     def doubleClicked(self, vobj):
         return self.setEdit(vobj, 0)
@@ -302,9 +321,30 @@ class ViewProviderTextureConfig():
     def __setstate__(self,state):
         return None
 
-def createTextureConfig(fileObject=None):
+class TextureConfigSaveObserver():
+    '''Writes the face overrides of the TextureConfigs into their files before a document is saved'''
+
+    def slotStartSaveDocument(self, doc, fileName):
+        for o in doc.Objects:
+            proxy = getattr(o, 'Proxy', None)
+
+            if getattr(proxy, 'isTextureConfig', False):
+                proxy.writeFaceOverridesFile(o)
+
+saveObserver = None
+
+def startSaveObserver():
+    global saveObserver
+
+    if saveObserver is None:
+        saveObserver = TextureConfigSaveObserver()
+        FreeCAD.addDocumentObserver(saveObserver)
+
+startSaveObserver()
+
+def createTextureConfig(fileObject=None, linkedConfigFile=''):
     textureConfigObject = FreeCAD.ActiveDocument.addObject("App::FeaturePython", "TextureConfig")
-    textureConfig = TextureConfig(textureConfigObject, fileObject)
+    textureConfig = TextureConfig(textureConfigObject, fileObject, linkedConfigFile)
     ViewProviderTextureConfig(textureConfigObject.ViewObject)
 
 if __name__ == "__main__":
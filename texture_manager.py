@@ -1,9 +1,26 @@
 import FreeCAD
+import os
 import math
 import json
+import zlib
 from pivy import coin
 import arch_texture_utils.faceset_utils as faceset_utils
+import arch_texture_utils.projection_utils as projection_utils
+import arch_texture_utils.surface_utils as surface_utils
+import arch_texture_utils.coordinate_cache as coordinate_cache
 import arch_texture_utils.py2_utils as py2_utils
+from arch_texture_utils.material_index import getMaterialIndex
+import arch_texture_utils.texture_files as texture_files
+from arch_texture_utils.linked_config import getLinkedConfigCache
+from arch_texture_utils.texture_observer import TextureObserver
+from arch_texture_utils.file_watcher import TextureFileWatcher
+from arch_texture_utils.lazy_texturing import LazyTexturer
+from arch_texture_utils.scope_utils import Scope
+import arch_texture_utils.multi_material_utils as multi_material_utils
+from arch_texture_utils.qtutils import QtCore
+
+# Hidden textures are kept for instant toggling. When they stay hidden for this amount of milliseconds they are removed
+RECLAIM_DELAY = 5 * 60 * 1000
 
 
 class TextureConfigEncoder(json.JSONEncoder):
@@ -29,6 +46,12 @@ class TextureConfigDecoder(json.JSONDecoder):
         return dct
 
 
+def replaceNode(group, oldNode, newNode):
+    index = group.findChild(oldNode)
+
+    if index >= 0:
+        group.replaceChild(index, newNode)
+
 class TextureManager():
     def __init__(self, fileObject=None):
         if fileObject is None:
@@ -40,8 +63,12 @@ class TextureManager():
                     #         'realSize': None | {
                     #              's': <length_in_mm>,
                     #              't': <height_in_mm>
-                    #          }
+                    #          },
+                    #         'mapping': 'face' | 'box' | 'planar' | 'cylindrical' | 'surface',
+                    #         'axis': [x, y, z], # planar and cylindrical only
+                    #         'origin': [x, y, z] # cylindrical only
                     #     }
+                    #     '<linked_mat_name>': None # hides a material of the linked config
                 },
                 'faceOverrides': [
                     #    {
@@ -59,91 +86,695 @@ class TextureManager():
                 fileObject.close()
 
         self.textureCache = {
-            # '<file_name>': texture
+            # '<texture_key>': texture, see texture_files.textureKey
         }
 
         self.bumpMapCache = {
-            # '<file_name>': bumpmap
+            # '<texture_key>': bumpmap
+        }
+
+        # The key every resolved file was loaded with. Files with the same content share one node
+        self.textureFileKeys = {
+            # '<resolved_file>': '<texture_key>'
+        }
+
+        self.bumpMapFileKeys = {
+            # '<resolved_file>': '<texture_key>'
+        }
+
+        # The groups the texture nodes of each material were inserted into. Used to swap the nodes of changed files
+        self.textureGroups = {
+            # '<object_name>': [('<material_name>', group)]
+        }
+
+        # The charts of textured objects without overrides, see faceset_utils.buildBaseCharts. Used by updateFaces
+        self.baseCharts = {
+            # '<object_name>': {<face_index>: (<face_index>, ...)}
+        }
+
+        # Texture coordinates by geometry. Survives retexturing, so moved objects don't have to be mapped again
+        self.coordinateCache = coordinate_cache.CoordinateCache()
+
+        self.texturedObjects = {
+            # '<object_name>': (object, shadedNode, (textureUnit, texture, textureCoords, bumpMap, textureSwitch), (material, originalDiffuseColor))
         }
 
-        self.texturedObjects = [
-            #(object, shadedNode, (textureUnit, texture, transform), (material, originalDiffuseColor))
-        ]
+        self.document = None
+        self.observer = None
+        self.fileWatcher = None
+        self.lazyTexturer = None
+        self.scope = None
+
+        self.texturesHidden = False
+        self.staleObjects = set()
+        self.reclaimTimer = None
+
+        # Increased on every change of the texture data. So saving an unchanged config does not serialize it again
+        self.revision = 0
+        self.faceOverridesRevision = 0
+        self.serializedKey = None
+        self.serializedData = None
+
+        # Loads face overrides stored outside of the texture data on first use
+        self.faceOverridesLoader = None
+
+        # The materials of the linked config file. Materials of textureData are layered on top
+        self.linkedConfigFile = None
+        self.linkedConfig = None
+        self.materials = None
+
+    def markChanged(self, faceOverrides=False):
+        '''Has to be called whenever textureData is changed'''
+        self.revision += 1
+        self.materials = None
+
+        if faceOverrides:
+            self.faceOverridesRevision += 1
 
     def export(self, fileObject):
+        self.loadFaceOverrides()
+
+        # The exported file contains the linked materials too, so it can be used on its own
+        textureData = dict(self.textureData)
+        textureData['materials'] = self.getMaterials()
+
         try:
-            json.dump(self.textureData, fileObject, sort_keys=True,
+            json.dump(textureData, fileObject, sort_keys=True,
                       indent=4, ensure_ascii=False, cls=TextureConfigEncoder)
         finally:
             fileObject.close()
 
-    def serializeTextureData(self):
-        return json.dumps(self.textureData, sort_keys=True, indent=4, ensure_ascii=False, cls=TextureConfigEncoder)
+    def serializeTextureData(self, includeFaceOverrides=True):
+        key = (self.revision, includeFaceOverrides)
+
+        if self.serializedKey != key:
+            textureData = self.textureData
+
+            if not includeFaceOverrides:
+                textureData = dict((k, v) for k, v in textureData.items() if k != 'faceOverrides')
+
+            self.serializedData = json.dumps(textureData, sort_keys=True, indent=4, ensure_ascii=False, cls=TextureConfigEncoder)
+            self.serializedKey = key
+
+        return self.serializedData
 
     def deserializeTextureData(self, textureDataAsString):
         self.textureData = json.loads(
             textureDataAsString, encoding='utf-8', cls=TextureConfigDecoder)
 
-    def textureObjects(self, debug=False):
+        self.markChanged(faceOverrides=True)
+
+    def serializeFaceOverrides(self):
+        '''The face overrides as compressed json'''
+        faceOverrides = json.dumps(self.getFaceOverrides() or [], ensure_ascii=False, cls=TextureConfigEncoder)
+
+        return zlib.compress(faceOverrides.encode('utf-8'))
+
+    def deserializeFaceOverrides(self, data):
+        return json.loads(zlib.decompress(data).decode('utf-8'), cls=TextureConfigDecoder)
+
+    def setFaceOverridesLoader(self, loader):
+        '''loader is called on first use of the face overrides and returns them'''
+        self.faceOverridesLoader = loader
+
+    def hasPendingFaceOverrides(self):
+        return self.faceOverridesLoader is not None
+
+    def loadFaceOverrides(self):
+        if self.faceOverridesLoader is None:
+            return
+
+        loader = self.faceOverridesLoader
+        self.faceOverridesLoader = None
+
+        # The loaded overrides match the stored ones. So this is no change
+        self.textureData['faceOverrides'] = loader()
+
+    def linkConfig(self, fileName):
+        '''
+        Uses the materials of the given config file unless this config has its own entry for them.
+        The file name has to be resolved already, see TextureConfig.findLinkedConfigFile.
+        '''
+        self.linkedConfigFile = fileName if fileName else None
+        self.refreshLinkedConfig()
+
+    def refreshLinkedConfig(self):
+        '''Picks up changes of the linked file. Returns True when its materials changed.'''
+        linkedConfig = None
+
+        if self.linkedConfigFile is not None:
+            try:
+                linkedConfig = getLinkedConfigCache().findConfig(self.linkedConfigFile)
+            except (IOError, OSError, ValueError) as e:
+                FreeCAD.Console.PrintError('Unable to read the linked config %s: %s\n' % (self.linkedConfigFile, e))
+
+        if linkedConfig is self.linkedConfig:
+            return False
+
+        self.linkedConfig = linkedConfig
+        self.materials = None
+
+        return True
+
+    def getLinkedMaterials(self):
+        if self.linkedConfig is None:
+            return {}
+
+        return self.linkedConfig.materials
+
+    def getMaterials(self):
+        '''
+        The materials of the linked config with the materials of this config on top.
+        A material set to None in this config hides the linked material.
+        '''
+        if self.materials is None:
+            materials = dict(self.getLinkedMaterials())
+            materials.update(self.textureData['materials'])
+
+            self.materials = dict((name, entry) for name, entry in materials.items() if entry is not None)
+
+        return self.materials
+
+    def textureObjects(self, debug=False, lazySettings=None, scopeObjects=None):
+        '''
+        Textures all objects with a configured material. When lazySettings are given, objects are only textured
+        once they become visible in the 3D view. See LazyTexturer for details.
+        When scopeObjects are given, only these objects and their members are textured. See Scope for details.
+        '''
         # Make sure that no old textures are left. Otherwise we could end up with duplicate textures
         self.removeTextures()
 
         FreeCAD.Console.PrintMessage('Texturing objects\n')
 
-        for o in FreeCAD.ActiveDocument.Objects:
-            if self.isTexturable(o):
-                # Test Script for bump mapping is here: https://forum.freecadweb.org/viewtopic.php?f=10&t=37255&p=319329#p319329
-                texture, bumpMap, textureConfig = self.getTextureForMaterial(
-                    o.Material)
+        self.document = FreeCAD.ActiveDocument
+
+        # Only visit objects whose material is configured. The index is maintained by a document observer
+        materialIndex = getMaterialIndex(self.document)
+        objects = materialIndex.findObjects(self.findTexturedMaterialNames(materialIndex))
+
+        if scopeObjects:
+            self.scope = Scope(self.document, scopeObjects, self.scopeChanged)
+            self.scope.start()
+
+            objects = [o for o in objects if self.scope.contains(o.Name)]
+
+        if lazySettings is None:
+            for o in objects:
+                if self.isTexturable(o):
+                    self.textureObject(o, debug)
+        else:
+            # The expensive checks are done when the object is actually textured
+            self.lazyTexturer = LazyTexturer(self, lazySettings)
+            self.lazyTexturer.start([o.Name for o in objects if o.ViewObject is not None and o.ViewObject.Visibility])
+
+        self.startObserver()
+        self.startFileWatcher()
+
+    def findTexturedMaterialNames(self, materialIndex):
+        '''The configured materials and all MultiMaterials used in the document with a configured layer material'''
+        materials = self.getMaterials()
+        materialNames = list(materials.keys())
+
+        for materialName in materialIndex.objectsByMaterial.keys():
+            if materialName not in materials and self.isConfiguredMaterial(self.document.getObject(materialName)):
+                materialNames.append(materialName)
+
+        return materialNames
+
+    def isConfiguredMaterial(self, material):
+        if material is None:
+            return False
+
+        materials = self.getMaterials()
+
+        if material.Name in materials:
+            return True
+
+        if multi_material_utils.isMultiMaterial(material):
+            return any(m is not None and m.Name in materials for m in material.Materials)
+
+        return False
+
+    def textureObject(self, o, debug=False):
+        # Test Script for bump mapping is here: https://forum.freecadweb.org/viewtopic.php?f=10&t=37255&p=319329#p319329
+        texture, bumpMap, textureConfig = self.getTextureForMaterial(
+            o.Material)
+
+        # A MultiMaterial can be configured as a whole. Otherwise its layers get their own textures
+        isMultiMaterial = texture is None and multi_material_utils.isMultiMaterial(o.Material)
+
+        if texture is None and not isMultiMaterial:
+            return
+
+        print('Texturing %s' % (o.Label,))
+
+        rootnode = o.ViewObject.RootNode
+        switch = faceset_utils.findSwitch(rootnode)
+        shadedNode = faceset_utils.findShadedNode(switch)
+
+        if shadedNode is None:
+            print('Object %s has no shaded node. Skipping...' % (o.Label,))
+            return
+
+        brep = faceset_utils.findBrepFaceset(shadedNode)
+        material = faceset_utils.findMaterial(shadedNode)
+        vertexCoordinates = faceset_utils.findVertexCoordinates(
+            rootnode)
+        transform = faceset_utils.findTransform(rootnode)
+
+        if isMultiMaterial:
+            self.textureLayers(o, shadedNode, brep, vertexCoordinates, transform)
+            return
+
+        originalDiffuseColor = self.updateMaterialColors(material)
+
+        if projection_utils.isProjectionMapping(textureConfig):
+            textureCoords = projection_utils.calculateTextureCoordinates(
+                o, brep, vertexCoordinates, transform, textureConfig)
+        else:
+            textureCoords = self.calculateLocalTextureCoordinates(
+                o, brep, vertexCoordinates, transform, textureConfig, debug)
+
+        self.setupTextureCoordinateIndex(brep)
+
+        # All texture nodes are kept below a switch. So they can be hidden and shown without recalculating them.
+        # Like a group, the switch does not isolate its children. So the texture still applies to the faceset.
+        textureSwitch = self.createTextureSwitch()
+        textureUnit = self.insertTextureNodes(textureSwitch, texture, bumpMap, textureCoords)
+
+        shadedNode.insertChild(textureSwitch, 1)
+
+        self.texturedObjects[o.Name] = (o, shadedNode, (textureUnit, texture, textureCoords, bumpMap, textureSwitch), (material, originalDiffuseColor))
+        self.textureGroups[o.Name] = [(o.Material.Name, textureSwitch)]
+
+    def textureLayers(self, o, shadedNode, brep, vertexCoordinates, transform):
+        '''
+        Textures the faces of an object with a MultiMaterial by the material of their layer.
+        The faces of each material are drawn again on top of the untextured faceset, with their own texture and
+        texture coordinates. The polygon offset pulls them in front of the original faces.
+        '''
+        faceMaterials = multi_material_utils.findFaceMaterials(o.Shape, o.Material)
+        facesByMaterial = {}
+        materials = self.getMaterials()
+
+        for faceIndex, faceMaterial in enumerate(faceMaterials):
+            if faceMaterial is not None and faceMaterial.Name in materials:
+                facesByMaterial.setdefault(faceMaterial.Name, []).append(faceIndex)
+
+        if len(facesByMaterial) == 0:
+            return
+
+        facesTriangles = faceset_utils.findFaceTriangles(brep, range(len(faceMaterials)))
+        textureSwitch = self.createTextureSwitch()
+        textureGroups = []
+
+        for materialName in sorted(facesByMaterial.keys()):
+            faceIndices = facesByMaterial[materialName]
+            texture, bumpMap, textureConfig = self.getTextureForMaterialName(materialName)
+
+            # Mapped coordinates are calculated for all vertices. Only the ones of the layer faces are used
+            textureCoords = self.calculateMappedTextureCoordinates(o, brep, vertexCoordinates, transform, textureConfig)
+
+            if textureCoords is None:
+                textureCoords = coin.SoTextureCoordinate2()
+                textureCoords.point.setNum(vertexCoordinates.point.getNum())
+
+                for face in faceset_utils.iterFacesByIndex(brep, vertexCoordinates, faceIndices, self.getFaceOverrides(), transform):
+                    face.appendTextureCoordinates(textureCoords, textureConfig['realSize'])
+
+            coordinateIndex = []
+
+            for faceIndex in faceIndices:
+                for triangle in facesTriangles.get(faceIndex, []):
+                    coordinateIndex.extend(triangle)
+                    coordinateIndex.append(-1)
+
+            layerNode = self.createLayerNode(texture, bumpMap, textureCoords, coordinateIndex)
+            textureSwitch.addChild(layerNode)
+            textureGroups.append((materialName, layerNode))
+
+        # The layers have to be drawn after the faceset
+        shadedNode.addChild(textureSwitch)
+
+        self.texturedObjects[o.Name] = (o, shadedNode, (None, None, None, None, textureSwitch), None)
+        self.textureGroups[o.Name] = textureGroups
+
+    def calculateLocalTextureCoordinates(self, o, brep, vertexCoordinates, transform, textureConfig, debug=False):
+        '''
+        The face and surface mapping only depend on the geometry in the space of the scene graph, not on the placement.
+        So the coordinates are cached by this geometry and moving, rotating or copying an object reuses them.
+        '''
+        vertices = coordinate_cache.readVertices(vertexCoordinates)
+        localOverrides = faceset_utils.toLocalOverrides(self.getFaceOverrides(), transform)
+        faceOverrides = coordinate_cache.findCandidateOverrides(vertices, localOverrides)
+        key = coordinate_cache.createKey(vertices, brep, textureConfig, faceOverrides)
+
+        textureCoords = None if debug else self.coordinateCache.findTextureCoordinates(key)
+
+        if textureCoords is not None:
+            return textureCoords
+
+        if surface_utils.isSurfaceMapping(textureConfig):
+            # Falls back to the face mapping when the surfaces can't be used
+            textureCoords = surface_utils.calculateTextureCoordinates(o, vertexCoordinates, textureConfig)
+
+        if textureCoords is None:
+            # The overrides are already in the space of the scene graph. So no transform is passed
+            faceSet = faceset_utils.buildFaceSet(
+                brep, vertexCoordinates, faceOverrides, None, debug)
+            textureCoords = faceSet.calculateTextureCoordinates(
+                textureConfig['realSize'])
+
+            if debug:
+                faceSet.printData(textureConfig['realSize'], 4)
+
+        self.coordinateCache.store(key, textureCoords)
+
+        return textureCoords
+
+    def calculateMappedTextureCoordinates(self, o, brep, vertexCoordinates, transform, textureConfig):
+        '''Calculates the coordinates of all vertices at once for mappings without face frames. Returns None for the face mapping.'''
+        if projection_utils.isProjectionMapping(textureConfig):
+            return projection_utils.calculateTextureCoordinates(o, brep, vertexCoordinates, transform, textureConfig)
+
+        if surface_utils.isSurfaceMapping(textureConfig):
+            # Falls back to the face mapping when the surfaces can't be used
+            return surface_utils.calculateTextureCoordinates(o, vertexCoordinates, textureConfig)
+
+        return None
+
+    def createLayerNode(self, texture, bumpMap, textureCoords, coordinateIndex):
+        layerNode = coin.SoSeparator()
+
+        polygonOffset = coin.SoPolygonOffset()
+        polygonOffset.factor.setValue(-1.0)
+        polygonOffset.units.setValue(-1.0)
+
+        material = coin.SoMaterial()
+        material.diffuseColor.setValue(1.0, 1.0, 1.0)
+
+        materialBinding = coin.SoMaterialBinding()
+        materialBinding.value.setValue(coin.SoMaterialBinding.OVERALL)
+
+        layerNode.addChild(polygonOffset)
+        layerNode.addChild(material)
+        layerNode.addChild(materialBinding)
+
+        self.insertTextureNodes(layerNode, texture, bumpMap, textureCoords, layerNode.getNumChildren())
+
+        # The vertices and normals of the object are inherited from its scene graph
+        faceSet = coin.SoIndexedFaceSet()
+        faceSet.coordIndex.setValues(0, len(coordinateIndex), coordinateIndex)
+        faceSet.textureCoordIndex.setValues(0, len(coordinateIndex), coordinateIndex)
+
+        layerNode.addChild(faceSet)
+
+        return layerNode
+
+    def createTextureSwitch(self):
+        textureSwitch = coin.SoSwitch()
+        textureSwitch.whichChild.setValue(coin.SO_SWITCH_ALL)
+
+        return textureSwitch
+
+    def insertTextureNodes(self, group, texture, bumpMap, textureCoords, index=0):
+        '''Inserts the texture nodes at the given index of the group and returns the texture unit, if one is needed'''
+        textureUnit = None
+
+        group.insertChild(texture, index)
+        group.insertChild(textureCoords, index)
+
+        # Only add the texture unit when the bump map is set
+        # Otherwise the default is OK
+        if bumpMap is not None:
+            textureUnit = coin.SoTextureUnit()
+            textureUnit.unit.setValue(1)
+            group.insertChild(textureUnit, index)
+
+        if bumpMap is not None:
+            # Bump map coordinates do not work, we have to use texture coordinates
+            # Skipping the coordinates also ends in an access violation
+            group.insertChild(textureCoords, index)
+            group.insertChild(bumpMap, index)
+
+        return textureUnit
+
+    def retextureObjects(self, objectNames):
+        '''Removes and recalculates the textures of the given objects only. Used when single objects change.'''
+        if self.document is None:
+            return
+
+        if self.texturesHidden:
+            # Recalculated when the textures are shown again
+            for objectName in objectNames:
+                self.removeTexture(objectName)
+                self.staleObjects.add(objectName)
+
+            return
+
+        for objectName in objectNames:
+            wasTextured = objectName in self.texturedObjects
+
+            self.removeTexture(objectName)
+
+            if self.lazyTexturer is not None:
+                self.lazyTexturer.invalidate(objectName)
+
+                if not wasTextured:
+                    # Not in view yet. The lazy texturer decides when to texture it
+                    self.lazyTexturer.queueObject(objectName)
+                    continue
+
+            self.textureObjectByName(objectName)
+
+    def textureObjectByName(self, objectName):
+        o = self.document.getObject(objectName)
+
+        if o is not None and self.isTexturable(o):
+            self.textureObject(o)
+
+    def updateFaces(self, objectName, faceIndices, faceOverrides=None):
+        '''
+        Recalculates the texture coordinates of the given faces only and writes them into the existing
+        texture coordinates of the object. faceIndices are zero based, so Face1 has the index 0.
+        Returns False when the object is not textured.
+        '''
+        if objectName not in self.texturedObjects:
+            return False
+
+        o, shadedNode, coinData, materialData = self.texturedObjects[objectName]
+        textureCoords = coinData[2]
+
+        if textureCoords is None:
+            # The layers of MultiMaterial objects have their own coordinates
+            return False
+
+        texture, bumpMap, textureConfig = self.getTextureForMaterial(o.Material)
+
+        if texture is None:
+            return False
+
+        if projection_utils.findMapping(textureConfig) != projection_utils.MAPPING_FACE:
+            # Only the face mapping knows face overrides. So there is nothing to update
+            return True
+
+        if faceOverrides is None:
+            faceOverrides = self.getFaceOverrides()
+
+        rootnode = o.ViewObject.RootNode
+        brep = faceset_utils.findBrepFaceset(shadedNode)
+        vertexCoordinates = faceset_utils.findVertexCoordinates(rootnode)
+        transform = faceset_utils.findTransform(rootnode)
+
+        # The faces may share a chart with faces that were not selected. The charts of the object are found once
+        # and only the charts of the given faces are built again
+        if objectName not in self.baseCharts:
+            self.baseCharts[objectName] = faceset_utils.buildBaseCharts(brep, vertexCoordinates)
+
+        faces = faceset_utils.iterFacesByIndex(brep, vertexCoordinates, faceIndices, faceOverrides, transform, self.baseCharts[objectName])
+
+        # Notify the scene graph once after all faces are written instead of once per vertex
+        textureCoords.point.enableNotify(False)
+
+        try:
+            for face in faces:
+                face.appendTextureCoordinates(textureCoords, textureConfig['realSize'])
+        finally:
+            textureCoords.point.enableNotify(True)
+            textureCoords.point.touch()
+
+        return True
+
+    def hideTextures(self):
+        '''
+        Hides the textures but keeps all calculated nodes. So showing them again is instant.
+        When the textures stay hidden for RECLAIM_DELAY milliseconds they are removed to free the memory.
+        '''
+        if self.texturesHidden:
+            return
+
+        self.texturesHidden = True
+
+        if self.lazyTexturer is not None:
+            self.lazyTexturer.pause()
+
+        for o, shadedNode, coinData, materialData in self.texturedObjects.values():
+            coinData[4].whichChild.setValue(coin.SO_SWITCH_NONE)
+            self.restoreMaterialColors(materialData)
+
+        if self.reclaimTimer is None:
+            self.reclaimTimer = QtCore.QTimer()
+            self.reclaimTimer.setSingleShot(True)
+            self.reclaimTimer.setInterval(RECLAIM_DELAY)
+            self.reclaimTimer.timeout.connect(self.reclaimHiddenTextures)
+
+        self.reclaimTimer.start()
+
+    def showHiddenTextures(self):
+        '''Shows the textures hidden by hideTextures. Returns False when there is nothing to show and textureObjects has to be used.'''
+        if not self.texturesHidden or self.document is None:
+            return False
+
+        self.texturesHidden = False
+        self.reclaimTimer.stop()
+
+        for o, shadedNode, coinData, materialData in self.texturedObjects.values():
+            if materialData is not None:
+                material, originalDiffuseColor = materialData
+
+                # The colors might have changed while the textures were hidden
+                originalDiffuseColor.copyFrom(material.diffuseColor)
+                material.diffuseColor.setValue(1.0, 1.0, 1.0)
+
+            coinData[4].whichChild.setValue(coin.SO_SWITCH_ALL)
 
-                if texture is not None:
-                    print('Texturing %s' % (o.Label,))
+        staleObjects = sorted(self.staleObjects)
+        self.staleObjects.clear()
 
-                    textureUnit = None
-                    rootnode = o.ViewObject.RootNode
-                    switch = faceset_utils.findSwitch(rootnode)
-                    shadedNode = faceset_utils.findShadedNode(switch)
+        self.retextureObjects(staleObjects)
 
-                    if shadedNode is None:
-                        print('Object %s has no shaded node. Skipping...' % (o.Label,))
-                        continue
+        if self.lazyTexturer is not None:
+            self.lazyTexturer.resume()
 
-                    brep = faceset_utils.findBrepFaceset(shadedNode)
-                    material = faceset_utils.findMaterial(shadedNode)
-                    vertexCoordinates = faceset_utils.findVertexCoordinates(
-                        rootnode)
-                    transform = faceset_utils.findTransform(rootnode)
+        return True
 
-                    originalDiffuseColor = self.updateMaterialColors(material)
+    def reclaimHiddenTextures(self):
+        if self.texturesHidden:
+            self.removeTextures()
 
-                    faceSet = faceset_utils.buildFaceSet(
-                        brep, vertexCoordinates, self.getFaceOverrides(), transform)
-                    textureCoords = faceSet.calculateTextureCoordinates(
-                        textureConfig['realSize'])
+    def scopeChanged(self, addedObjectNames, removedObjectNames):
+        for objectName in removedObjectNames:
+            self.removeTexture(objectName)
 
-                    if debug:
-                        faceSet.printData(textureConfig['realSize'], 4)
+            if self.lazyTexturer is not None:
+                self.lazyTexturer.forgetObject(objectName)
 
-                    self.setupTextureCoordinateIndex(brep)
+            self.staleObjects.discard(objectName)
 
-                    shadedNode.insertChild(texture, 1)
-                    shadedNode.insertChild(textureCoords, 1)
+        addedObjects = [self.document.getObject(objectName) for objectName in addedObjectNames]
 
-                    # Only add the texture unit when the bump map is set
-                    # Otherwise the default is OK
-                    if bumpMap is not None:
-                        textureUnit = coin.SoTextureUnit()
-                        textureUnit.unit.setValue(1)
-                        shadedNode.insertChild(textureUnit, 1)
+        self.retextureObjects([o.Name for o in addedObjects if o is not None and self.isObserved(o)])
 
-                    if bumpMap is not None:
-                        # Bump map coordinates do not work, we have to use texture coordinates
-                        # Skipping the coordinates also ends in an access violation
-                        shadedNode.insertChild(textureCoords, 1)
-                        shadedNode.insertChild(bumpMap, 1)
+    def isObserved(self, o):
+        '''Returns True when changes of the given object might affect its textures'''
+        if o.Name in self.texturedObjects:
+            return True
 
-                    self.texturedObjects.append(
-                        (o, shadedNode, (textureUnit, texture, textureCoords, bumpMap), (material, originalDiffuseColor)))
+        if self.scope is not None and not self.scope.contains(o.Name):
+            return False
+
+        return hasattr(o, 'Material') and self.isConfiguredMaterial(o.Material)
+
+    def startObserver(self):
+        if self.observer is None:
+            self.observer = TextureObserver(self)
+            self.observer.start()
+
+    def stopObserver(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer = None
+
+    def startFileWatcher(self):
+        if self.fileWatcher is None:
+            self.fileWatcher = TextureFileWatcher(self.reloadTextureFiles)
+
+        self.fileWatcher.watch(self.watchedFiles())
+
+    def stopFileWatcher(self):
+        if self.fileWatcher is not None:
+            self.fileWatcher.stop()
+            self.fileWatcher = None
+
+    def watchedFiles(self):
+        searchRoots = self.searchRoots()
+        fileNames = []
+
+        for materialConfig in self.getMaterials().values():
+            for fileName in (materialConfig.get('file', None), materialConfig.get('bumpMap', None)):
+                if fileName is not None:
+                    fileNames.append(texture_files.resolveTextureFile(fileName, searchRoots))
+
+        if self.linkedConfig is not None:
+            fileNames.append(self.linkedConfig.fileName)
+
+        return fileNames
+
+    def reloadTextureFiles(self, fileNames):
+        '''
+        Loads the new content of changed files. A node may be shared by several files with the same content, so it is
+        never reloaded. Instead the materials referencing a changed file get the node of its new content. The texture
+        coordinates and all other scene nodes are kept.
+        '''
+        fileNames = set(fileNames)
+
+        self.swapChangedNodes(fileNames, self.textureCache, self.textureFileKeys, 'file', self.createTexture)
+        self.swapChangedNodes(fileNames, self.bumpMapCache, self.bumpMapFileKeys, 'bumpMap', self.createBumpMap)
+
+        if self.linkedConfig is not None and self.linkedConfig.fileName in fileNames and self.refreshLinkedConfig():
+            FreeCAD.Console.PrintMessage('Linked config %s changed\n' % (self.linkedConfigFile, ))
+
+            # Objects of newly added materials are textured on the next recompute
+            self.retextureObjects(list(self.texturedObjects.keys()))
+            self.startFileWatcher()
+
+    def swapChangedNodes(self, fileNames, cache, fileKeys, configKey, createNode):
+        searchRoots = self.searchRoots()
+        materials = self.getMaterials()
+
+        for fileName in fileNames:
+            oldKey = fileKeys.get(fileName, None)
+
+            if oldKey is None or oldKey not in cache:
+                continue
+
+            newKey = texture_files.textureKey(fileName)
+
+            if newKey == oldKey:
+                continue
+
+            FreeCAD.Console.PrintMessage('Reloading texture %s\n' % (fileName, ))
+
+            oldNode = cache[oldKey]
+
+            if newKey not in cache:
+                cache[newKey] = createNode(py2_utils.textureFileString(fileName))
+
+            newNode = cache[newKey]
+            fileKeys[fileName] = newKey
+
+            if oldKey not in fileKeys.values():
+                # No other file uses the old content
+                del cache[oldKey]
+
+            materialNames = set(materialName for materialName, materialConfig in materials.items()
+                                if materialConfig.get(configKey, None) is not None
+                                and texture_files.resolveTextureFile(materialConfig[configKey], searchRoots) == fileName)
+
+            for textureGroups in self.textureGroups.values():
+                for materialName, group in textureGroups:
+                    if materialName in materialNames:
+                        replaceNode(group, oldNode, newNode)
 
     def updateMaterialColors(self, material):
         originalDiffuseColor = coin.SoMFColor()
@@ -154,12 +785,16 @@ class TextureManager():
         return originalDiffuseColor
 
     def ensureFaceOverrides(self):
+        self.loadFaceOverrides()
+
         if 'faceOverrides' not in self.textureData:
             self.textureData['faceOverrides'] = []
 
         return self.textureData['faceOverrides']
 
     def getFaceOverrides(self):
+        self.loadFaceOverrides()
+
         if 'faceOverrides' in self.textureData:
             return self.textureData['faceOverrides']
         else:
@@ -168,38 +803,75 @@ class TextureManager():
     def removeTextures(self):
         FreeCAD.Console.PrintMessage('Removing Textures\n')
 
-        for o, shadedNode, coinData, materialData in self.texturedObjects:
-            if coinData[0] is not None:
-                shadedNode.removeChild(coinData[0])
+        self.stopObserver()
+        self.stopFileWatcher()
+
+        if self.lazyTexturer is not None:
+            self.lazyTexturer.stop()
+            self.lazyTexturer = None
+
+        if self.reclaimTimer is not None:
+            self.reclaimTimer.stop()
+
+        if self.scope is not None:
+            self.scope.stop()
+            self.scope = None
+
+        for objectName in list(self.texturedObjects.keys()):
+            self.removeTexture(objectName)
+
+        self.texturedObjects = {}
+        self.textureGroups = {}
+        self.baseCharts = {}
+        self.texturesHidden = False
+        self.staleObjects.clear()
+        self.coordinateCache.clear()
 
-            if coinData[1] is not None:
-                shadedNode.removeChild(coinData[1])
+    def removeTexture(self, objectName):
+        if objectName not in self.texturedObjects:
+            return
 
-            if coinData[2] is not None:
-                shadedNode.removeChild(coinData[2])
-            
-            if coinData[3] is not None:
-                shadedNode.removeChild(coinData[3])
-                # When a bump map is set, the texture coordinate is added twice. So remove it again
-                shadedNode.removeChild(coinData[2])
+        o, shadedNode, coinData, materialData = self.texturedObjects.pop(objectName)
+        self.textureGroups.pop(objectName, None)
+        self.baseCharts.pop(objectName, None)
 
+        # All texture nodes are children of the switch
+        shadedNode.removeChild(coinData[4])
 
-            material = materialData[0]
+        self.restoreMaterialColors(materialData)
 
-            material.diffuseColor.deleteValues(0)
-            material.diffuseColor.setValues(
-                0, len(materialData[1]), materialData[1])
+    def restoreMaterialColors(self, materialData):
+        if materialData is None:
+            # The faceset of MultiMaterial objects keeps its colors
+            return
 
-        self.texturedObjects = []
+        material = materialData[0]
+
+        material.diffuseColor.deleteValues(0)
+        material.diffuseColor.setValues(
+            0, len(materialData[1]), materialData[1])
+
+    def forgetObject(self, objectName):
+        '''The object was deleted together with its scene graph. So there is nothing left to remove, only references to drop.'''
+        self.texturedObjects.pop(objectName, None)
+        self.textureGroups.pop(objectName, None)
+        self.baseCharts.pop(objectName, None)
+
+        if self.lazyTexturer is not None:
+            self.lazyTexturer.forgetObject(objectName)
 
     def isTexturable(self, o):
-        if not hasattr(o, 'Shape') or o.Shape is None or o.Shape.isNull():
-            return False
-        
+        # Check the cheap properties first. Accessing o.Shape creates a copy of the shape
         if not hasattr(o, 'Material') or o.Material is None:
             return False
 
-        return o.ViewObject.Visibility
+        if o.ViewObject is None or not o.ViewObject.Visibility:
+            return False
+
+        if not hasattr(o, 'Shape') or o.Shape is None or o.Shape.isNull():
+            return False
+
+        return True
 
     def setupTextureCoordinateIndex(self, brep):
         coordinateIndex = brep.coordIndex.getValues()
@@ -208,40 +880,60 @@ class TextureManager():
             0, len(coordinateIndex), coordinateIndex)
 
     def getTextureForMaterial(self, material):
-        materialName = material.Name
+        return self.getTextureForMaterialName(material.Name)
 
-        if materialName in self.textureData['materials']:
-            materialConfig = self.textureData['materials'][materialName]
+    def getTextureForMaterialName(self, materialName):
+        materials = self.getMaterials()
 
-            imageFile = py2_utils.textureFileString(materialConfig['file'])
-            bumpMapFile = None
+        if materialName in materials:
+            materialConfig = materials[materialName]
+
+            texture = self.findTextureNode(self.textureCache, self.textureFileKeys, materialConfig['file'], self.createTexture)
             bumpMap = None
 
-            if 'bumpMap' in materialConfig:
-                bumpMapFile = py2_utils.textureFileString(
-                    materialConfig['bumpMap'])
+            if materialConfig.get('bumpMap', None) is not None:
+                bumpMap = self.findTextureNode(self.bumpMapCache, self.bumpMapFileKeys, materialConfig['bumpMap'], self.createBumpMap)
 
-            if imageFile not in self.textureCache:
-                tex = coin.SoTexture2()
-                tex.filename = imageFile
+            return (texture, bumpMap, materialConfig)
 
-                self.textureCache[imageFile] = tex
+        return (None, None, None)
 
-            if bumpMapFile is not None:
-                if bumpMapFile not in self.bumpMapCache:
-                    bumpMap = coin.SoBumpMap()
+    def findTextureNode(self, cache, fileKeys, fileName, createNode):
+        '''
+        Texture nodes are keyed by the content of their file. The same image referenced by different paths,
+        e.g. copies in several project folders, is decoded only once.
+        '''
+        resolvedFile = texture_files.resolveTextureFile(fileName, self.searchRoots())
+        key = texture_files.textureKey(resolvedFile)
 
-                    bumpMap.filename.setValue(bumpMapFile)
+        fileKeys[resolvedFile] = key
 
-                    self.bumpMapCache[bumpMapFile] = bumpMap
+        if key not in cache:
+            cache[key] = createNode(py2_utils.textureFileString(resolvedFile))
 
-                bumpMap = self.bumpMapCache[bumpMapFile]
+        return cache[key]
 
-            texture = self.textureCache[imageFile]
+    def createTexture(self, imageFile):
+        tex = coin.SoTexture2()
+        tex.filename = imageFile
 
-            return (texture, bumpMap, materialConfig)
+        return tex
 
-        return (None, None, None)
+    def createBumpMap(self, imageFile):
+        bumpMap = coin.SoBumpMap()
+        bumpMap.filename.setValue(imageFile)
+
+        return bumpMap
+
+    def searchRoots(self):
+        '''Textures of a linked config are also looked up next to the config file'''
+        document = self.document if self.document is not None else FreeCAD.ActiveDocument
+        searchRoots = texture_files.findSearchRoots(document)
+
+        if self.linkedConfig is not None:
+            searchRoots.append(os.path.dirname(self.linkedConfig.fileName))
+
+        return searchRoots
 
 
 if __name__ == "__main__":